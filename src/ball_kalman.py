@@ -0,0 +1,167 @@
+import numpy as np
+
+class BallKalman:
+    """
+    등속 칼만 필터 공 추적기 (선택적으로 중력 반영)
+
+    상태: [x, y, vx, vy] (픽셀, 픽셀/프레임)
+    고정 max_distance 대신 예측 위치 + 공분산으로 후보를 거른다 (Mahalanobis 거리).
+    빠른 샷은 속도가 반영된 예측 위치 근처에서 찾으므로 놓치지 않고,
+    공이 안 보이는 프레임은 예측만으로 버틴다 (max_missed 프레임까지).
+
+    Args:
+        process_noise: 가속도 노이즈 (픽셀/프레임²) - 클수록 급격한 방향 전환 허용
+        measurement_noise: 검출 위치 오차 (픽셀)
+        gravity: 화면 아래 방향 가속도 (픽셀/프레임², 0이면 등속 모델)
+        gate: Mahalanobis 거리² 임계값 (9.21 = 자유도 2 카이제곱 99%)
+        max_missed: 연속으로 못 찾으면 추적 해제할 프레임 수
+        init_velocity_std: 초기 속도 불확실성 (픽셀/프레임)
+    """
+    def __init__(self, process_noise=4.0, measurement_noise=3.0, gravity=0.0,
+                 gate=9.21, max_missed=5, init_velocity_std=30.0):
+        self.gate = gate
+        self.max_missed = max_missed
+        self.init_velocity_std = init_velocity_std
+
+        # 상태 전이 (dt = 1 프레임)
+        self.F = np.array([[1, 0, 1, 0],
+                           [0, 1, 0, 1],
+                           [0, 0, 1, 0],
+                           [0, 0, 0, 1]], dtype=np.float64)
+        self.H = np.array([[1, 0, 0, 0],
+                           [0, 1, 0, 0]], dtype=np.float64)
+
+        # 중력 (제어 입력)
+        self.u = np.array([0, 0.5 * gravity, 0, gravity], dtype=np.float64)
+
+        # 프로세스 노이즈: 이산 백색 가속도 모델
+        q = process_noise ** 2
+        block = np.array([[0.25, 0.5], [0.5, 1.0]]) * q
+        self.Q = np.zeros((4, 4))
+        self.Q[np.ix_([0, 2], [0, 2])] = block
+        self.Q[np.ix_([1, 3], [1, 3])] = block
+
+        self.R = np.eye(2) * measurement_noise ** 2
+
+        self.reset()
+
+    def reset(self):
+        """추적 해제"""
+        self.x = None
+        self.P = None
+        self.hits = 0
+        self.missed = 0
+
+    @property
+    def initialized(self):
+        return self.x is not None
+
+    def state(self):
+        """체크포인트용 상태 (추적 해제면 x, P는 None)"""
+        return {
+            'x': None if self.x is None else self.x.copy(),
+            'P': None if self.P is None else self.P.copy(),
+            'hits': self.hits,
+            'missed': self.missed,
+        }
+
+    def restore(self, state):
+        """state() 결과로 되돌리기"""
+        self.x = None if state['x'] is None else np.array(state['x'], dtype=np.float64)
+        self.P = None if state['P'] is None else np.array(state['P'], dtype=np.float64)
+        self.hits = int(state['hits'])
+        self.missed = int(state['missed'])
+
+    def init(self, point):
+        """첫 검출 위치로 초기화 (속도 0, 큰 불확실성)"""
+        self.x = np.array([point[0], point[1], 0.0, 0.0])
+        r = self.R[0, 0]
+        v = self.init_velocity_std ** 2
+        self.P = np.diag([r, r, v, v])
+        self.hits = 1
+        self.missed = 0
+
+    def predict(self):
+        """
+        다음 프레임 예측 (프레임마다 1번)
+
+        Returns:
+            (predicted_xy, S) - 예측 위치, 측정 공간 공분산 (2x2)
+        """
+        self.x = self.F @ self.x + self.u
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.x[:2].copy(), self.innovation_cov()
+
+    def innovation_cov(self):
+        """S = H P H^T + R"""
+        return self.H @ self.P @ self.H.T + self.R
+
+    def mahalanobis(self, xs, ys):
+        """
+        후보들의 예측 위치까지 Mahalanobis 거리² (배열)
+        """
+        S_inv = np.linalg.inv(self.innovation_cov())
+        dx = np.asarray(xs, dtype=np.float64) - self.x[0]
+        dy = np.asarray(ys, dtype=np.float64) - self.x[1]
+        return (S_inv[0, 0] * dx * dx + 2 * S_inv[0, 1] * dx * dy
+                + S_inv[1, 1] * dy * dy)
+
+    def update(self, point):
+        """검출 위치로 보정"""
+        z = np.array(point, dtype=np.float64)
+        S = self.innovation_cov()
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self.H @ self.x)
+        self.P = (np.eye(4) - K @ self.H) @ self.P
+        self.hits += 1
+        self.missed = 0
+
+    def miss(self):
+        """
+        이번 프레임 검출 실패 (예측만 유지)
+
+        Returns:
+            True면 max_missed 초과로 추적 해제됨
+        """
+        self.missed += 1
+        if self.missed > self.max_missed:
+            self.reset()
+            return True
+        return False
+
+    @property
+    def position(self):
+        """현재 추정 위치 (정수 좌표)"""
+        return int(round(self.x[0])), int(round(self.x[1]))
+
+    def search_window(self, frame_shape, n_sigma=3.0, margin=20, min_half=24):
+        """
+        예측 위치 주변 검색 창 (프레임 좌표)
+
+        속도가 추정된 뒤(2번 이상 보정)에만 창을 돌려준다.
+        그 전이나 추적 해제 상태면 None → 전체 ROI에서 검색.
+
+        Args:
+            n_sigma: 예측 표준편차의 몇 배까지 볼지
+            margin: 공/블러 크기 여유 (픽셀)
+            min_half: 창 절반 크기 최솟값
+
+        Returns:
+            (x1, y1, x2, y2) 또는 None
+        """
+        if not self.initialized or self.hits < 2:
+            return None
+
+        S = self.innovation_cov()
+        half_w = max(min_half, int(n_sigma * np.sqrt(S[0, 0])) + margin)
+        half_h = max(min_half, int(n_sigma * np.sqrt(S[1, 1])) + margin)
+        cx, cy = self.position
+
+        height, width = frame_shape[:2]
+        x1 = max(0, cx - half_w)
+        y1 = max(0, cy - half_h)
+        x2 = min(width, cx + half_w)
+        y2 = min(height, cy + half_h)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
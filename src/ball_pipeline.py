@@ -0,0 +1,297 @@
+import cv2
+import numpy as np
+
+from roi_crop import get_court_roi_mask, crop_to_roi, get_net_band, intersect_rect
+from candidates import extract_candidates, best_by_circularity, distances_to
+from ball_kalman import BallKalman
+from stage_timer import StageTimer
+from proxy_video import scale_params
+from motion_mask import create_motion_engine, engine_delay
+
+# 필터 상수 (test_ball_tracking_v3 기준)
+DEFAULT_PARAMS = {
+    'min_area': 10,            # 크기: v1 수준
+    'max_area': 400,
+    'min_aspect': 0.3,         # 종횡비: 완화 - 타원형 허용 (모션 블러)
+    'max_aspect': 2.5,
+    'min_circularity': 0.25,   # 원형도: 완화 - 타원 허용
+    'y_min_ratio': 0.15,       # 높이 필터 (너무 위/아래 제외)
+    'y_max_ratio': 0.90,
+    'player_min_area': 500,    # 이보다 크면 선수
+    'player_margin': 15,       # 선수 마스크 팽창 커널 (머리까지 커버)
+    'max_distance': 60,        # 고정 거리 게이팅 (use_kalman=False)
+}
+
+def create_bg_subtractor(motion='knn'):
+    """공 검출용 움직임 마스크 엔진 (기본 KNN, 'mog2', 'diff3')"""
+    return create_motion_engine(motion)
+
+class BallPipeline:
+    """
+    선수 제외 공 추적 파이프라인 (track_ball_exclude_players의 핵심 로직)
+
+    화면 표시 / 파일 저장 없이 프레임 → 공 위치만 계산하므로
+    시각화 스크립트, 병렬 샤드 실행, 배치 처리에서 같이 쓴다.
+
+    Args:
+        frame_shape: 프레임 shape (ROI 계산용)
+        crop_roi: True면 ROI 사각형만 잘라서 처리
+        use_kalman: True면 칼만 예측 게이팅 + 예측 창 검색
+        params: DEFAULT_PARAMS 덮어쓸 값
+        timer: StageTimer (단계별 시간 측정, None이면 측정 안 함)
+        scale: 영상 / 원본 해상도 비율 (프록시면 < 1, proxy_scale()) -
+               params는 원본 해상도 기준으로 주고 여기서 축소 해상도에 맞춘다
+        motion: 움직임 마스크 엔진 ('knn', 'mog2', 'diff3' - motion_mask.py)
+                diff3는 결과가 한 프레임 늦다 (self.delay = 1)
+        schedule: BackgroundSchedule (배경 갱신 간격 / 워밍업 감쇠 / 랠리 중 동결),
+                  None이면 매 프레임 기본 학습률
+    """
+    def __init__(self, frame_shape, crop_roi=True, use_kalman=True, params=None, timer=None,
+                 scale=1.0, motion='knn', schedule=None):
+        self.frame_shape = frame_shape
+        self.crop_roi = crop_roi
+        self.use_kalman = use_kalman
+        self.scale = scale
+        self.params = scale_params(dict(DEFAULT_PARAMS, **(params or {})), scale)
+        self.timer = timer if timer is not None else StageTimer(enabled=False)
+
+        self.roi_mask, self.roi_coords = get_court_roi_mask(frame_shape)
+        self.bg_subtractor = create_bg_subtractor(motion)
+        self.delay = engine_delay(self.bg_subtractor)  # 결과가 몇 프레임 전 것인지
+        self.schedule = schedule.bind(self.bg_subtractor) if schedule is not None else None
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        height = frame_shape[0]
+        self.y_range = (height * self.params['y_min_ratio'], height * self.params['y_max_ratio'])
+        self.net_band = get_net_band(frame_shape)
+
+        # 추적 상태
+        self.kalman = BallKalman()
+        self.last_ball_position = None
+        self.windowed_frames = 0
+
+    def prepare(self, frame):
+        """배경 모델에 넣을 입력 (ROI crop 또는 마스킹)"""
+        if self.crop_roi:
+            return crop_to_roi(frame, self.roi_coords)
+        return cv2.bitwise_and(frame, frame, mask=self.roi_mask)
+
+    @property
+    def tracking(self):
+        """공을 추적 중인지 (랠리 진행 중)"""
+        if self.use_kalman:
+            return self.kalman.initialized
+        return self.last_ball_position is not None
+
+    def state(self):
+        """
+        추적 상태 (체크포인트용, 배경 모델 제외 - checkpoint.py가 따로 저장)
+
+        Returns:
+            dict - kalman (BallKalman.state), last_ball_position, windowed_frames,
+                   schedule (BackgroundSchedule.state 또는 None)
+        """
+        return {
+            'kalman': self.kalman.state(),
+            'last_ball_position': self.last_ball_position,
+            'windowed_frames': self.windowed_frames,
+            'schedule': self.schedule.state() if self.schedule is not None else None,
+        }
+
+    def restore_state(self, state):
+        """state() 결과로 추적 상태 되돌리기"""
+        self.kalman.restore(state['kalman'])
+        position = state['last_ball_position']
+        self.last_ball_position = None if position is None else (int(position[0]),
+                                                                 int(position[1]))
+        self.windowed_frames = int(state['windowed_frames'])
+        if self.schedule is not None and state['schedule'] is not None:
+            self.schedule.restore(state['schedule'])
+
+    def learn(self, frame):
+        """배경 학습만 (워밍업)"""
+        if self.schedule is None:
+            self.bg_subtractor.apply(self.prepare(frame))
+            return
+        rate = self.schedule.warmup_rate()
+        if rate is not None:
+            self.bg_subtractor.apply(self.prepare(frame), learningRate=rate)
+
+    def foreground(self, frame):
+        """
+        Background Subtraction
+
+        Returns:
+            (fg_mask, mask_origin) - 마스크와 그 좌상단의 프레임 좌표
+        """
+        if self.schedule is None:
+            fg_mask = self.bg_subtractor.apply(self.prepare(frame))
+        else:
+            rate = self.schedule.rate(self.tracking)
+            fg_mask = self.bg_subtractor.apply(self.prepare(frame), learningRate=rate)
+        if self.crop_roi:
+            x1, y1 = self.roi_coords[:2]
+            return fg_mask, (x1, y1)
+        return cv2.bitwise_and(fg_mask, fg_mask, mask=self.roi_mask), (0, 0)
+
+    def process(self, frame):
+        """
+        프레임 1장 처리
+
+        Returns:
+            dict - ball (후보 1행 또는 None), candidates, fg_mask, players_mask,
+                   mask_origin (마스크 좌상단 프레임 좌표), window (칼만 검색 창 또는 None)
+        """
+        timer = self.timer
+        with timer.stage('knn'):
+            fg_mask, mask_origin = self.foreground(frame)
+
+        # ⭐ 칼만 예측 → 추적 중이면 예측 창 안만 검사
+        # (배경 모델은 위에서 ROI 전체로 계속 갱신됨)
+        window = self.predict_window()
+        if window is not None:
+            fg_mask, mask_origin = self.crop_window(fg_mask, mask_origin, window)
+
+        # 노이즈 제거
+        with timer.stage('morphology'):
+            fg_mask = self.clean(fg_mask)
+
+        return self.detect(fg_mask, mask_origin, window)
+
+    def process_mask(self, fg_mask, mask_origin):
+        """
+        노이즈 제거까지 끝난 마스크로 후보 + 선택 (배경 모델 안 씀)
+
+        파라미터 스윕처럼 같은 마스크를 여러 설정이 공유할 때 사용.
+        칼만 예측 창은 정리된 마스크에서 잘라낸다.
+
+        Returns:
+            process()와 같음
+        """
+        window = self.predict_window()
+        if window is not None:
+            fg_mask, mask_origin = self.crop_window(fg_mask, mask_origin, window)
+        return self.detect(fg_mask, mask_origin, window)
+
+    def predict_window(self):
+        """칼만 예측 → 검색 창 (추적 중이 아니면 None)"""
+        if not (self.use_kalman and self.kalman.initialized):
+            return None
+        self.kalman.predict()
+        window = self.kalman.search_window(self.frame_shape)
+        if window is not None:
+            window = intersect_rect(window, self.roi_coords)
+        return window
+
+    def crop_window(self, fg_mask, mask_origin, window):
+        """마스크에서 검색 창만 잘라낸 뷰 + 새 원점"""
+        wx1, wy1, wx2, wy2 = window
+        ox, oy = mask_origin
+        self.windowed_frames += 1
+        return fg_mask[wy1-oy:wy2-oy, wx1-ox:wx2-ox], (wx1, wy1)
+
+    def clean(self, fg_mask):
+        """모폴로지 노이즈 제거 (열기 2회 + 닫기)"""
+        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self.kernel, iterations=2)
+        return cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, self.kernel)
+
+    def detect(self, fg_mask, mask_origin, window=None):
+        """선수 제거 + 윤곽선 필터링 (connected components 1회) → 궤적 기반 선택"""
+        timer = self.timer
+        with timer.stage('candidates'):
+            candidates, players_mask = self.find_candidates(fg_mask, mask_origin)
+        with timer.stage('select'):
+            ball = self.select(candidates)
+
+        return {
+            'ball': ball,
+            'candidates': candidates,
+            'fg_mask': fg_mask,
+            'players_mask': players_mask,
+            'mask_origin': mask_origin,
+            'window': window,
+        }
+
+    def find_candidates(self, fg_mask, mask_origin):
+        """선수 제거 + 후보 필터링 (connected components 1회)"""
+        p = self.params
+        return extract_candidates(
+            fg_mask,
+            min_area=p['min_area'], max_area=p['max_area'],
+            min_aspect=p['min_aspect'], max_aspect=p['max_aspect'],
+            min_circularity=p['min_circularity'],
+            y_range=self.y_range,
+            exclude_rows=self.net_band,            # 네트 제외
+            player_min_area=p['player_min_area'],
+            player_margin=p['player_margin'],
+            offset=mask_origin
+        )
+
+    def select(self, candidates):
+        """
+        궤적 기반 선택 (추적 상태 갱신)
+
+        Returns:
+            선택된 후보 1행 또는 None
+        """
+        selected_ball = None
+
+        if self.use_kalman:
+            kalman = self.kalman
+            if kalman.initialized:
+                # ⭐ 예측 위치 기준 Mahalanobis 게이팅
+                if len(candidates) > 0:
+                    d2 = kalman.mahalanobis(candidates['cx'], candidates['cy'])
+                    gated = d2 <= kalman.gate
+                    if gated.any():
+                        # 예측에 가까우면서 둥근 것
+                        scores = np.where(gated, candidates['circularity'] / (np.sqrt(d2) + 1), -1)
+                        selected_ball = candidates[np.argmax(scores)]
+
+                if selected_ball is not None:
+                    kalman.update((selected_ball['cx'], selected_ball['cy']))
+                else:
+                    # 못 찾으면 예측만 유지, max_missed 넘으면 해제 → 다음 프레임 재초기화
+                    kalman.miss()
+            else:
+                # 첫 프레임 or 추적 해제: 원형도 최고
+                best = best_by_circularity(candidates)
+                if best is not None:
+                    selected_ball = candidates[best]
+                    kalman.init((selected_ball['cx'], selected_ball['cy']))
+        elif self.last_ball_position is None:
+            # 첫 프레임
+            best = best_by_circularity(candidates)
+            if best is not None:
+                selected_ball = candidates[best]
+        elif len(candidates) > 0:
+            # 가장 가까운 것
+            dists = distances_to(candidates, self.last_ball_position)
+            nearby = dists <= self.params['max_distance']
+
+            if nearby.any():
+                # 거리와 원형도 조합 - 가까우면서 둥근 것
+                scores = np.where(nearby, candidates['circularity'] / (dists + 1), -1)
+                selected_ball = candidates[np.argmax(scores)]
+            else:
+                # 근처에 없으면 원형도로
+                selected_ball = candidates[best_by_circularity(candidates)]
+
+        if selected_ball is not None:
+            self.last_ball_position = (int(selected_ball['cx']), int(selected_ball['cy']))
+
+        return selected_ball
+
+def trajectory_point(frame_index, ball, scale=1.0):
+    """
+    궤적 1행 (test_ball_tracking_v3 CSV 형식)
+
+    scale: 프록시 영상이면 BallPipeline.scale - 위치/크기/면적을 원본 해상도로 변환
+    """
+    return {
+        'frame': frame_index,
+        'position': (int(round(ball['cx'] / scale)), int(round(ball['cy'] / scale))),
+        'size': (int(round(ball['w'] / scale)), int(round(ball['h'] / scale))),
+        'area': float(ball['area']) / (scale * scale),
+        'circularity': float(ball['circularity'])
+    }
@@ -0,0 +1,217 @@
+import cv2
+import glob
+import os
+import sys
+import time
+import traceback
+from multiprocessing import Pool
+
+from shard_runner import run_shard, save_trajectory
+from proxy_video import build_proxy, proxy_scale
+from synthetic_video import load_ground_truth, truth_path_for
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi', '.m4v')
+
+def find_videos(source):
+    """
+    분석할 영상 목록
+
+    Args:
+        source: 디렉토리 (영상 확장자 파일 전부) 또는 목록 파일
+                목록 파일은 한 줄에 '경로[,시작,끝]' - 상대 경로는 목록 파일 기준, #은 주석
+
+    Returns:
+        [(video_path, start_frame, end_frame 또는 None), ...]
+    """
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, '*'))
+                       if p.lower().endswith(VIDEO_EXTENSIONS) and '_proxy' not in p)
+        return [(p, 0, None) for p in paths]
+
+    base = os.path.dirname(os.path.abspath(source))
+    videos = []
+    with open(source) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = [field.strip() for field in line.split(',')]
+            path = fields[0] if os.path.isabs(fields[0]) else os.path.join(base, fields[0])
+            start = int(fields[1]) if len(fields) > 1 and fields[1] else 0
+            end = int(fields[2]) if len(fields) > 2 and fields[2] else None
+            videos.append((path, start, end))
+    return videos
+
+def output_dir_for(output_root, video_path):
+    """영상별 결과 디렉토리 (영상 이름)"""
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_root, name)
+
+def process_video(task):
+    """
+    영상 1개 처리 (워커 프로세스, 화면 출력 없음)
+
+    앞쪽 warmup 프레임으로 배경 학습 후 끝까지 공 추적 → 영상별 ball_trajectory.npz
+    원본 옆에 합성 정답(_truth.npz)이 있으면 원본 좌표로 정답과 비교 (프록시 좌표 확인용)
+
+    Returns:
+        dict - video, status, frames, elapsed, fps, detections, recall, output, error
+               (recall은 정답 없으면 nan)
+    """
+    video_path = task['video_path']
+    result = {'video': video_path, 'status': 'ok', 'frames': 0, 'elapsed': 0.0,
+              'fps': 0.0, 'detections': 0, 'recall': float('nan'), 'output': '', 'error': ''}
+    t0 = time.perf_counter()
+    try:
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(video_path)
+
+        source = video_path
+        if task.get('proxy'):
+            source = build_proxy(video_path, scale=task['proxy'], verbose=False)
+
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise IOError(f"영상을 열 수 없음: {source}")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        end = min(task['end'], total) if task.get('end') else total
+        start = min(task.get('start', 0) + task['warmup'], end)
+        shard = run_shard({
+            'video_path': source,
+            'start': start,
+            'end': end,
+            'overlap': task['warmup'],
+            'track_overlap': 0,
+            'params': task.get('params'),
+            'scale': proxy_scale(source),  # 프록시면 파라미터 축소 + 좌표는 원본 기준
+            'motion': task.get('motion', 'knn'),
+        })
+
+        output_dir = output_dir_for(task['output_root'], video_path)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        store_path = os.path.join(output_dir, 'ball_trajectory.npz')
+        save_trajectory(shard['trajectory'], store_path)
+
+        result['frames'] = shard['frames']  # 실제로 처리한 프레임 (요청한 구간 아님)
+        result['detections'] = len(shard['trajectory'])
+
+        # 정답은 원본 해상도 - 프록시 좌표가 원본으로 변환됐는지 같이 확인된다
+        truth_path = truth_path_for(video_path)
+        if os.path.exists(truth_path):
+            from benchmark import score
+            points = [(p['frame'], *p['position']) for p in shard['trajectory']]
+            tolerance = 10 / min(1.0, proxy_scale(source))
+            result['recall'] = score(points, load_ground_truth(truth_path), start, end,
+                                     tolerance=tolerance)['recall']
+        result['output'] = store_path
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+
+    result['elapsed'] = time.perf_counter() - t0
+    if result['elapsed'] > 0:
+        result['fps'] = result['frames'] / result['elapsed']
+    return result
+
+def run_batch(videos, output_root, workers=None, warmup=60, proxy=None, motion='knn',
+              params=None):
+    """
+    영상 여러 개를 프로세스 풀에서 처리 (영상 1개 = 작업 1개)
+
+    Args:
+        videos: find_videos() 결과
+        output_root: 결과 루트 (영상별 하위 디렉토리)
+        workers: 프로세스 수 (기본: CPU 코어 수)
+        warmup: 영상마다 배경 학습 프레임 수
+        proxy: 축소 비율 (주면 프록시로 분석, 좌표는 원본 기준)
+        motion: 움직임 마스크 엔진 ('knn', 'mog2', 'diff3')
+        params: BallPipeline 파라미터
+
+    Returns:
+        결과 dict 리스트 (끝난 순서)
+    """
+    tasks = [{
+        'video_path': path, 'start': start, 'end': end, 'warmup': warmup,
+        'output_root': output_root, 'proxy': proxy, 'motion': motion, 'params': params,
+    } for path, start, end in videos]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+
+    results = []
+    with Pool(processes=workers, initializer=cv2.setNumThreads, initargs=(1,)) as pool:
+        for result in pool.imap_unordered(process_video, tasks):
+            results.append(result)
+            name = os.path.basename(result['video'])
+            if result['status'] == 'ok':
+                recall = (f", 정답 재현율 {result['recall']*100:.1f}%"
+                          if result['recall'] == result['recall'] else "")
+                print(f"  ✓ [{len(results)}/{len(tasks)}] {name}: {result['frames']} 프레임, "
+                      f"{result['fps']:.1f} fps, 검출 {result['detections']}{recall}", flush=True)
+            else:
+                print(f"  ✗ [{len(results)}/{len(tasks)}] {name}: {result['error']}", flush=True)
+    return results
+
+def save_summary(results, csv_path):
+    """영상별 요약 CSV"""
+    with open(csv_path, 'w') as f:
+        f.write("video,status,frames,elapsed,fps,detections,recall,output,error\n")
+        for r in sorted(results, key=lambda r: r['video']):
+            f.write(f"{r['video']},{r['status']},{r['frames']},{r['elapsed']:.2f},"
+                    f"{r['fps']:.2f},{r['detections']},{r['recall']:.3f},{r['output']},"
+                    f"{r['error'].replace(',', ';')}\n")
+
+def print_summary(results, elapsed):
+    """전체 요약"""
+    ok = [r for r in results if r['status'] == 'ok']
+    failed = [r for r in results if r['status'] != 'ok']
+    frames = sum(r['frames'] for r in ok)
+
+    print("=" * 50)
+    print(f"영상: {len(results)} | 성공 {len(ok)} | 실패 {len(failed)}")
+    print(f"프레임: {frames} | 전체 {elapsed:.1f}s ({frames / elapsed if elapsed > 0 else 0:.1f} fps)")
+    if ok:
+        print(f"영상별 fps: 최소 {min(r['fps'] for r in ok):.1f} / "
+              f"최대 {max(r['fps'] for r in ok):.1f}")
+    for r in failed:
+        print(f"  ✗ {r['video']}: {r['error']}")
+    print("=" * 50)
+
+def main(argv=None):
+    import argparse
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description="여러 경기 영상 일괄 공 추적 (화면 없음)")
+    parser.add_argument('source', help="영상 디렉토리 또는 목록 파일 (경로[,시작,끝])")
+    parser.add_argument('--output', default=os.path.join(project_root, 'data', 'batch'),
+                        help="결과 루트 (기본: data/batch)")
+    parser.add_argument('--workers', type=int, default=None, help="프로세스 수 (기본: 코어 수)")
+    parser.add_argument('--warmup', type=int, default=60, help="배경 학습 프레임 수")
+    parser.add_argument('--proxy', type=float, default=None, help="프록시 축소 비율 (예: 0.5)")
+    parser.add_argument('--motion', default='knn', choices=['knn', 'mog2', 'diff3'])
+    args = parser.parse_args(argv)
+
+    videos = find_videos(args.source)
+    if not videos:
+        print(f"✗ 영상 없음: {args.source}")
+        return 1
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    print(f"일괄 처리: 영상 {len(videos)}개 → {args.output}")
+    t0 = time.perf_counter()
+    results = run_batch(videos, args.output, workers=args.workers, warmup=args.warmup,
+                        proxy=args.proxy, motion=args.motion)
+    print_summary(results, time.perf_counter() - t0)
+
+    csv_path = os.path.join(args.output, 'summary.csv')
+    save_summary(results, csv_path)
+    print(f"✓ 요약: {csv_path}")
+    return 0 if all(r['status'] == 'ok' for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
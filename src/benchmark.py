@@ -0,0 +1,274 @@
+import importlib
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+
+from synthetic_video import generate_synthetic_video, load_ground_truth, truth_path_for
+from shard_runner import run_sharded
+from proxy_video import build_proxy, load_proxy_info
+from bg_schedule import BackgroundSchedule
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+TESTS_DIR = os.path.join(PROJECT_ROOT, 'tests')
+
+def _script(name):
+    """tests/ 스크립트 모듈 불러오기"""
+    if TESTS_DIR not in sys.path:
+        sys.path.append(TESTS_DIR)
+    return importlib.import_module(name)
+
+def _points(trajectory):
+    """궤적 dict 리스트 → [(frame, x, y), ...]"""
+    return [(p['frame'], p['position'][0], p['position'][1]) for p in trajectory]
+
+# 벤치마크 대상: (video_path, start_frame, num_frames) → [(frame, x, y), ...]
+def detection_v2(video_path, start_frame, num_frames):
+    stats = _script('test_ball_detection_v2').detect_ball_with_roi(
+        video_path, start_frame, num_frames, save_debug=False)
+    return [(s['frame'],) + tuple(s['position']) for s in stats if s['detected']]
+
+def tracking_v1(video_path, start_frame, num_frames):
+    return _points(_script('test_ball_tracking_v1').track_ball_with_trajectory(
+        video_path, start_frame, num_frames))
+
+def tracking_v2(video_path, start_frame, num_frames):
+    return _points(_script('test_ball_tracking_v2').track_ball_with_confidence(
+        video_path, start_frame, num_frames))
+
+def tracking_v3(video_path, start_frame, num_frames):
+    return _points(_script('test_ball_tracking_v3').track_ball_exclude_players(
+        video_path, start_frame, num_frames, save_debug=False))
+
+def tracking_v3_fixed_gate(video_path, start_frame, num_frames):
+    return _points(_script('test_ball_tracking_v3').track_ball_exclude_players(
+        video_path, start_frame, num_frames, use_kalman=False, save_debug=False))
+
+def tracking_v3_mog2(video_path, start_frame, num_frames):
+    return _points(_script('test_ball_tracking_v3').track_ball_exclude_players(
+        video_path, start_frame, num_frames, save_debug=False, motion='mog2'))
+
+def tracking_v3_diff3(video_path, start_frame, num_frames):
+    return _points(_script('test_ball_tracking_v3').track_ball_exclude_players(
+        video_path, start_frame, num_frames, save_debug=False, motion='diff3'))
+
+def tracking_v3_throttled(video_path, start_frame, num_frames):
+    schedule = BackgroundSchedule(update_every=4, warmup_stride=4, warmup_decay=0.9,
+                                  freeze_in_rally=True)
+    return _points(_script('test_ball_tracking_v3').track_ball_exclude_players(
+        video_path, start_frame, num_frames, save_debug=False, schedule=schedule))
+
+def pipeline(video_path, start_frame, num_frames):
+    trajectory, _, _ = run_sharded(video_path, start_frame, start_frame + num_frames,
+                                   workers=1, overlap=start_frame)
+    return _points(trajectory)
+
+def pipeline_diff3(video_path, start_frame, num_frames):
+    # 결과가 한 프레임 늦은 엔진 - 프레임 번호 보정 확인 (recall이 pipeline과 비슷해야 함)
+    trajectory, _, _ = run_sharded(video_path, start_frame, start_frame + num_frames,
+                                   workers=1, overlap=start_frame, motion='diff3')
+    return _points(trajectory)
+
+def pipeline_sharded(video_path, start_frame, num_frames):
+    trajectory, _, _ = run_sharded(video_path, start_frame, start_frame + num_frames,
+                                   overlap=start_frame)
+    return _points(trajectory)
+
+TARGETS = {
+    'detection_v2': detection_v2,
+    'tracking_v1': tracking_v1,
+    'tracking_v2': tracking_v2,
+    'tracking_v3': tracking_v3,
+    'tracking_v3_fixed': tracking_v3_fixed_gate,
+    'tracking_v3_mog2': tracking_v3_mog2,
+    'tracking_v3_diff3': tracking_v3_diff3,
+    'tracking_v3_throttled': tracking_v3_throttled,
+    'pipeline': pipeline,
+    'pipeline_diff3': pipeline_diff3,
+    'pipeline_sharded': pipeline_sharded,
+}
+
+# 프록시 영상을 받아 원본 좌표로 돌려주는 대상 (BallPipeline 기반)
+PROXY_TARGETS = ['tracking_v3', 'tracking_v3_fixed', 'tracking_v3_mog2', 'tracking_v3_diff3',
+                 'tracking_v3_throttled',
+                 'pipeline', 'pipeline_diff3', 'pipeline_sharded']
+
+def _peak_rss_mb():
+    """프로세스 최대 RSS (MB)"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_target(task):
+    """
+    대상 1개 실행 (새 프로세스 안에서 - 메모리 최대치가 섞이지 않게)
+    """
+    name, video_path, start_frame, num_frames = task
+    result = {'name': name, 'points': [], 'elapsed': 0.0, 'error': None}
+    try:
+        with redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            result['points'] = TARGETS[name](video_path, start_frame, num_frames)
+            result['elapsed'] = time.perf_counter() - t0
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['peak_mb'] = _peak_rss_mb()
+    return result
+
+def score(points, truth, start_frame, end_frame, tolerance=10):
+    """
+    검출 정확도 (정답 궤적과 비교)
+
+    같은 프레임 정답과 tolerance 픽셀 안이면 정답 검출(TP),
+    멀면 오검출(FP), 공이 보이는데 검출 없으면 놓침(FN).
+
+    Returns:
+        dict - tp, fp, fn, recall, precision, mean_error
+    """
+    frames = truth['frame']
+    in_range = (frames >= start_frame) & (frames < end_frame) & truth['ball_visible']
+    num_truth = int(in_range.sum())
+
+    detected = {}
+    for frame, x, y in points:
+        if start_frame <= frame < end_frame:
+            detected[int(frame)] = (x, y)
+
+    errors = []
+    for frame, (x, y) in detected.items():
+        if truth['ball_visible'][frame]:
+            error = np.hypot(x - truth['ball_x'][frame], y - truth['ball_y'][frame])
+            if error <= tolerance:
+                errors.append(error)
+
+    tp = len(errors)
+    fp = len(detected) - tp
+    return {
+        'tp': tp,
+        'fp': fp,
+        'fn': num_truth - tp,
+        'recall': tp / num_truth if num_truth else 0.0,
+        'precision': tp / len(detected) if detected else 0.0,
+        'mean_error': float(np.mean(errors)) if errors else float('nan'),
+    }
+
+def run_benchmark(video_path, targets=None, start_frame=60, num_frames=None, tolerance=10):
+    """
+    대상별 속도 / 메모리 / 정확도 측정
+
+    대상마다 새 프로세스(spawn)에서 실행하고, 실행 전에 영상 옆 bg_cache/를 지워서
+    모든 대상이 같은 조건(배경 학습 포함)으로 측정되게 한다.
+    스크립트 대상은 원래처럼 data/ 아래 결과 파일도 쓴다.
+
+    Args:
+        video_path: 합성 영상 (정답 _truth.npz가 옆에 있어야 함)
+                    또는 그 프록시 (정답은 원본 것을 씀, PROXY_TARGETS만 의미 있음)
+        targets: TARGETS 이름 목록 (None이면 전체)
+        start_frame: 분석 시작 (앞부분은 배경 학습)
+        num_frames: 분석 프레임 수 (None이면 끝까지)
+        tolerance: 정답 인정 거리 (픽셀)
+
+    Returns:
+        결과 dict 리스트 (name, fps, elapsed, peak_mb, recall, precision, ...)
+    """
+    proxy_info = load_proxy_info(video_path)
+    source_path = proxy_info['source_path'] if proxy_info else video_path
+    truth = load_ground_truth(truth_path_for(source_path))
+    if num_frames is None:
+        num_frames = len(truth['frame']) - start_frame
+    end_frame = start_frame + num_frames
+    cache_dir = os.path.join(os.path.dirname(video_path), 'bg_cache')
+
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    for name in (targets or list(TARGETS)):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        with ctx.Pool(processes=1) as pool:
+            result = pool.apply(_run_target, ((name, video_path, start_frame, num_frames),))
+
+        result['num_frames'] = num_frames
+        result['fps'] = num_frames / result['elapsed'] if result['elapsed'] > 0 else 0.0
+        result.update(score(result['points'], truth, start_frame, end_frame, tolerance))
+        results.append(result)
+
+        if result['error']:
+            print(f"  {name:22s} ✗ {result['error']}")
+        else:
+            print(f"  {name:22s} {result['fps']:7.1f} fps | {result['peak_mb']:6.0f} MB | "
+                  f"recall {result['recall']:.2f} | precision {result['precision']:.2f}")
+
+    return results
+
+def print_results(results):
+    """결과 표"""
+    print("=" * 78)
+    print(f"{'대상':22s} {'fps':>7s} {'시간':>7s} {'메모리':>8s} {'recall':>7s} "
+          f"{'precision':>9s} {'오차':>6s} {'TP/FP/FN':>12s}")
+    print("-" * 78)
+    for r in results:
+        if r['error']:
+            print(f"{r['name']:22s} 실패: {r['error']}")
+            continue
+        print(f"{r['name']:22s} {r['fps']:7.1f} {r['elapsed']:6.1f}s {r['peak_mb']:6.0f}MB "
+              f"{r['recall']:7.2f} {r['precision']:9.2f} {r['mean_error']:5.1f}px "
+              f"{r['tp']:4d}/{r['fp']:3d}/{r['fn']:3d}")
+    print("=" * 78)
+
+def save_results(results, csv_path, label=''):
+    """결과를 CSV에 추가 (실행할 때마다 쌓아서 최적화 전후 비교)"""
+    exists = os.path.exists(csv_path)
+    stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with open(csv_path, 'a') as f:
+        if not exists:
+            f.write("timestamp,label,target,num_frames,fps,elapsed,peak_mb,"
+                    "recall,precision,mean_error,tp,fp,fn,error\n")
+        for r in results:
+            f.write(f"{stamp},{label},{r['name']},{r['num_frames']},{r['fps']:.2f},"
+                    f"{r['elapsed']:.3f},{r['peak_mb']:.1f},{r['recall']:.4f},"
+                    f"{r['precision']:.4f},{r['mean_error']:.2f},{r['tp']},{r['fp']},{r['fn']},"
+                    f"{(r['error'] or '').replace(',', ';')}\n")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="합성 영상 기준 속도/정확도 벤치마크")
+    parser.add_argument('--targets', nargs='*', choices=list(TARGETS), help="대상 (기본: 전체)")
+    parser.add_argument('--frames', type=int, default=600, help="합성 영상 길이")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=int, default=60, help="배경 학습 프레임 수")
+    parser.add_argument('--label', default='', help="결과 CSV에 남길 이름 (예: 커밋)")
+    parser.add_argument('--proxy', type=float, default=None,
+                        help="이 비율의 프록시 영상으로 측정 (예: 0.5)")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(PROJECT_ROOT, 'data', 'benchmark')
+    video_path = os.path.join(output_dir, f'synthetic_{args.seed}_{args.frames}.mp4')
+
+    if not os.path.exists(truth_path_for(video_path)):
+        print("합성 영상 생성 중...")
+        generate_synthetic_video(video_path, num_frames=args.frames, seed=args.seed)
+        print(f"✓ {video_path}\n")
+
+    targets = args.targets
+    if args.proxy:
+        video_path = build_proxy(video_path, scale=args.proxy)
+        targets = targets or PROXY_TARGETS
+        args.label = args.label or f'proxy{args.proxy}'
+    
+    print("벤치마크")
+    print("=" * 78)
+    results = run_benchmark(video_path, targets, start_frame=args.start)
+    print()
+    print_results(results)
+
+    csv_path = os.path.join(output_dir, 'results.csv')
+    save_results(results, csv_path, args.label)
+    print(f"✓ 결과 추가: {csv_path}")
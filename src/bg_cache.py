@@ -0,0 +1,159 @@
+import cv2
+import numpy as np
+import hashlib
+import os
+
+from motion_mask import needs_warmup, engine_delay
+
+def subtractor_params(bg_subtractor):
+    """
+    Background Subtractor 파라미터 (캐시 키용)
+    """
+    if isinstance(bg_subtractor, cv2.BackgroundSubtractorKNN):
+        return {
+            'type': 'KNN',
+            'history': bg_subtractor.getHistory(),
+            'dist2Threshold': bg_subtractor.getDist2Threshold(),
+            'detectShadows': bg_subtractor.getDetectShadows(),
+        }
+    if isinstance(bg_subtractor, cv2.BackgroundSubtractorMOG2):
+        return {
+            'type': 'MOG2',
+            'history': bg_subtractor.getHistory(),
+            'varThreshold': bg_subtractor.getVarThreshold(),
+            'detectShadows': bg_subtractor.getDetectShadows(),
+        }
+    return {'type': type(bg_subtractor).__name__}
+
+def cache_key(video_path, start_frame, roi_mask, params, warm_frames, roi_coords=None):
+    """
+    캐시 키: 영상 (경로 + 크기 + 수정 시각) + ROI + 파라미터 + 시작 프레임
+    """
+    video_path = os.path.abspath(video_path)
+    stat = os.stat(video_path)
+
+    h = hashlib.sha1()
+    h.update(f"{video_path}|{stat.st_size}|{int(stat.st_mtime)}".encode())
+    h.update(f"|{start_frame}|{warm_frames}|{sorted(params.items())}".encode())
+    if roi_mask is not None:
+        h.update(np.ascontiguousarray(roi_mask).tobytes())
+    if roi_coords is not None:
+        h.update(f"|crop{tuple(roi_coords)}".encode())
+    return h.hexdigest()[:16]
+
+def _prepare(frame, roi_mask, roi_coords=None):
+    """학습에 넣을 프레임 (ROI 적용)"""
+    if roi_coords is not None:
+        x1, y1, x2, y2 = roi_coords
+        return frame[y1:y2, x1:x2]
+    if roi_mask is None:
+        return frame
+    return cv2.bitwise_and(frame, frame, mask=roi_mask)
+
+def warmup_background(cap, bg_subtractor, video_path, start_frame, roi_mask=None,
+                      cache_dir=None, warm_frames=5, prime_repeats=30, roi_coords=None,
+                      schedule=None):
+    """
+    배경 학습 (디스크 캐시 사용)
+
+    캐시 있음: 저장된 배경 이미지(getBackgroundImage)로 prime 후
+              직전 warm_frames 프레임만 다시 넣음 → 0 ~ start_frame 디코딩 생략
+    캐시 없음: 0 ~ start_frame 전체 학습 후 결과를 저장
+
+    끝나면 cap은 start_frame 위치에 있다.
+    배경 모델이 없는 엔진 (ThreeFrameDiff)은 직전 몇 프레임만 넣고 끝낸다.
+
+    Args:
+        cap: cv2.VideoCapture 또는 FrameReader
+        bg_subtractor: KNN / MOG2 Background Subtractor
+        video_path: 영상 경로 (캐시 키)
+        start_frame: 분석 시작 프레임
+        roi_mask: 코트 ROI 마스크 (None이면 전체 프레임)
+        cache_dir: 캐시 디렉토리 (기본: 영상 옆 bg_cache/)
+        warm_frames: 함께 저장할 직전 프레임 수
+        prime_repeats: 배경 이미지를 반복 적용할 횟수
+        roi_coords: 주면 ROI 사각형만 잘라서 학습 (crop 모드, roi_mask 무시)
+        schedule: BackgroundSchedule (워밍업 간격 / 학습률 감쇠, None이면 매 프레임 기본)
+
+    Returns:
+        True면 캐시 사용
+    """
+    if start_frame <= 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return False
+
+    # ⭐ 차분 엔진: 학습 없음, 직전 프레임만 채움
+    if not needs_warmup(bg_subtractor):
+        prime = min(start_frame, engine_delay(bg_subtractor) + 1)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame - prime)
+        for _ in range(prime):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            bg_subtractor.apply(_prepare(frame, roi_mask, roi_coords))
+        print(f"✓ 배경 학습 생략 (차분 엔진, 직전 {prime} 프레임)")
+        return False
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(video_path)), 'bg_cache')
+
+    params = subtractor_params(bg_subtractor)
+    if schedule is not None:
+        params['schedule'] = schedule.describe()
+    key = cache_key(video_path, start_frame, roi_mask, params, warm_frames, roi_coords)
+    cache_path = os.path.join(cache_dir, f'bg_{key}.npz')
+
+    # ⭐ 캐시 사용
+    if os.path.exists(cache_path):
+        data = np.load(cache_path)
+        background = data['background']
+        for _ in range(prime_repeats):
+            bg_subtractor.apply(background)
+        for frame in data['history']:
+            bg_subtractor.apply(frame)
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        print(f"✓ 배경 캐시 사용: {os.path.basename(cache_path)} "
+              f"(prime {prime_repeats} + {len(data['history'])} 프레임)")
+        return True
+
+    # 전체 학습
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    print(f"배경 학습 중... (0 ~ {start_frame})")
+
+    history = []
+    learned = 0
+    for i in range(start_frame):
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        frame_roi = _prepare(frame, roi_mask, roi_coords)
+        if schedule is None:
+            bg_subtractor.apply(frame_roi)
+        else:
+            rate = schedule.warmup_rate()
+            if rate is not None:
+                bg_subtractor.apply(frame_roi, learningRate=rate)
+        learned += 1
+
+        # 직전 프레임 보관 (리더 버퍼는 재사용되므로 복사)
+        if i >= start_frame - warm_frames:
+            history.append(frame_roi.copy())
+
+        if i % 50 == 0:
+            print(f"  {i} 프레임...")
+
+    # 영상이 중간에 끝나면 저장하지 않음
+    background = bg_subtractor.getBackgroundImage()
+    if learned == start_frame and background is not None:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, background=background, history=np.array(history))
+        os.replace(tmp_path, cache_path)
+        print(f"✓ 배경 캐시 저장: {cache_path}")
+
+    return False
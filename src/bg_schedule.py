@@ -0,0 +1,231 @@
+import cv2
+import numpy as np
+import time
+
+# KNN은 learningRate=0이면 갱신 주기(log(0.7) / log(1 - rate))가 무한대로 깨져서
+# 오히려 느리고 마스크가 흔들린다 → 사실상 동결인 아주 작은 값을 쓴다
+FROZEN_RATE = 1e-6
+
+def frozen_rate(engine):
+    """엔진별 '갱신 안 함' 학습률"""
+    if isinstance(engine, cv2.BackgroundSubtractorKNN):
+        return FROZEN_RATE
+    return 0.0
+
+class BackgroundSchedule:
+    """
+    배경 모델 갱신 스케줄 (apply의 learningRate 결정)
+
+    - update_every: 추적 중 k프레임마다 1번만 갱신, 나머지는 동결 학습률
+      (갱신 프레임은 k / history로 올려서 시간당 적응 속도는 그대로)
+    - warmup_stride: 워밍업은 마스크를 안 쓰므로 k프레임마다 1번만 apply (나머지 건너뜀)
+    - warmup_decay: 워밍업 학습률을 warmup_start부터 지수 감쇠 → 적은 프레임으로 수렴
+    - freeze_in_rally: 공을 추적 중이면(랠리) 갱신 안 함 - 공/선수가 배경에 스며들지 않게
+
+    기본값이면 지금과 같다 (매 프레임 엔진 기본 학습률 -1).
+
+    Args:
+        update_every: 추적 중 갱신 간격 (프레임)
+        warmup_stride: 워밍업 apply 간격 (프레임)
+        warmup_decay: 워밍업 학습률 감쇠율 (None이면 엔진 기본)
+        warmup_start: 감쇠 시작 학습률
+        freeze_in_rally: 추적 중 동결
+        history: 엔진 history (갱신 학습률 계산용)
+    """
+    def __init__(self, update_every=1, warmup_stride=1, warmup_decay=None, warmup_start=0.5,
+                 freeze_in_rally=False, history=500):
+        self.update_every = max(1, update_every)
+        self.warmup_stride = max(1, warmup_stride)
+        self.warmup_decay = warmup_decay
+        self.warmup_start = warmup_start
+        self.freeze_in_rally = freeze_in_rally
+        self.history = history
+        self.frozen = 0.0
+
+        self._warmup_count = 0
+        self._frame_count = 0
+
+        # 통계
+        self.updates = 0
+        self.frozen_frames = 0
+        self.skipped = 0
+
+    def bind(self, engine):
+        """엔진에 맞춰 동결 학습률 / history 설정"""
+        self.frozen = frozen_rate(engine)
+        if hasattr(engine, 'getHistory'):
+            self.history = engine.getHistory()
+        return self
+
+    def _step_rate(self, every):
+        """k프레임마다 1번 갱신할 때 학습률 (k=1이면 엔진 기본 -1)"""
+        if every == 1:
+            return -1
+        return min(1.0, every / self.history)
+
+    def warmup_rate(self):
+        """
+        다음 워밍업 프레임 학습률
+
+        Returns:
+            학습률, 또는 None (이 프레임은 apply 생략)
+        """
+        n = self._warmup_count
+        self._warmup_count += 1
+        if n % self.warmup_stride:
+            self.skipped += 1
+            return None
+        self.updates += 1
+        if self.warmup_decay is None:
+            return self._step_rate(self.warmup_stride)
+        # 감쇠: 처음엔 빠르게 학습, 이후 갱신 학습률까지 내려감
+        floor = self.warmup_stride / self.history
+        return max(floor, self.warmup_start * self.warmup_decay ** (n // self.warmup_stride))
+
+    def rate(self, in_rally=False):
+        """다음 추적 프레임 학습률"""
+        n = self._frame_count
+        self._frame_count += 1
+        if (self.freeze_in_rally and in_rally) or n % self.update_every:
+            self.frozen_frames += 1
+            return self.frozen
+        self.updates += 1
+        return self._step_rate(self.update_every)
+
+    def state(self):
+        """체크포인트용 카운터 (재개해도 갱신 주기가 이어지게)"""
+        return {'warmup_count': self._warmup_count, 'frame_count': self._frame_count,
+                'updates': self.updates, 'frozen_frames': self.frozen_frames,
+                'skipped': self.skipped}
+
+    def restore(self, state):
+        """state() 결과로 되돌리기"""
+        self._warmup_count = int(state['warmup_count'])
+        self._frame_count = int(state['frame_count'])
+        self.updates = int(state['updates'])
+        self.frozen_frames = int(state['frozen_frames'])
+        self.skipped = int(state['skipped'])
+
+    def describe(self):
+        """캐시 키 / 출력용"""
+        return (f"every={self.update_every} stride={self.warmup_stride} "
+                f"decay={self.warmup_decay} start={self.warmup_start} "
+                f"freeze={self.freeze_in_rally}")
+
+    def print_stats(self):
+        total = max(self.updates + self.frozen_frames + self.skipped, 1)
+        print(f"배경 갱신: {self.updates} ({self.updates/total*100:.0f}%) | "
+              f"동결 {self.frozen_frames} | 워밍업 생략 {self.skipped}")
+
+def compare_schedules(video_path, schedules, start_frame=60, num_frames=240, truth=None):
+    """
+    스케줄별 처리량 / 마스크 품질 비교 (BallPipeline 배경 단계만)
+
+    마스크 품질:
+      - iou: 기본 스케줄(첫 번째) 마스크와의 IoU
+      - ball_hit: 정답 공 중심에 전경 픽셀이 있는 비율 (truth 있을 때)
+      - fg_ratio: 전경 픽셀 비율 (노이즈)
+
+    Args:
+        schedules: {이름: BackgroundSchedule 또는 None}
+        truth: load_ground_truth() 결과 (없으면 ball_hit 생략)
+
+    Returns:
+        {이름: dict - warmup_ms, track_ms, fps, iou, ball_hit, fg_ratio}
+    """
+    from ball_pipeline import BallPipeline
+
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    for _ in range(start_frame + num_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if len(frames) <= start_frame:
+        raise ValueError("영상이 start_frame보다 짧음")
+
+    results = {}
+    baseline = None
+    for name, schedule in schedules.items():
+        pipeline = BallPipeline(frames[0].shape, schedule=schedule)
+        ox, oy = pipeline.roi_coords[:2]
+
+        t0 = time.perf_counter()
+        for frame in frames[:start_frame]:
+            pipeline.learn(frame)
+        warmup = time.perf_counter() - t0
+
+        # 배경 단계만 시간 측정, 랠리 판단(추적 상태)을 위해 선택까지는 돌림
+        masks = []
+        track = 0.0
+        for frame in frames[start_frame:]:
+            t0 = time.perf_counter()
+            fg_mask, origin = pipeline.foreground(frame)
+            track += time.perf_counter() - t0
+            masks.append(fg_mask > 0)
+            pipeline.process_mask(pipeline.clean(fg_mask), origin)
+
+        if baseline is None:
+            baseline = masks
+        iou = np.mean([(a & b).sum() / max((a | b).sum(), 1) for a, b in zip(baseline, masks)])
+
+        ball_hit = float('nan')
+        if truth is not None:
+            hits, visible = 0, 0
+            for i, mask in enumerate(masks):
+                index = start_frame + i
+                if not truth['ball_visible'][index]:
+                    continue
+                x, y = truth['ball_x'][index] - ox, truth['ball_y'][index] - oy
+                if 0 <= y < mask.shape[0] and 0 <= x < mask.shape[1]:
+                    visible += 1
+                    hits += bool(mask[y, x])
+            ball_hit = hits / visible if visible else float('nan')
+
+        tracked = len(masks)
+        results[name] = {
+            'warmup_ms': warmup / start_frame * 1000,
+            'track_ms': track / tracked * 1000,
+            'fps': tracked / track if track > 0 else 0.0,
+            'iou': float(iou),
+            'ball_hit': ball_hit,
+            'fg_ratio': float(np.mean([m.mean() for m in masks])),
+        }
+    return results
+
+def print_comparison(results):
+    """compare_schedules() 결과 표"""
+    print("=" * 78)
+    print(f"{'스케줄':16s} {'워밍업':>9s} {'추적':>9s} {'fps':>7s} {'IoU':>6s} "
+          f"{'공 검출':>8s} {'전경':>7s}")
+    print("-" * 78)
+    for name, r in results.items():
+        print(f"{name:16s} {r['warmup_ms']:6.1f} ms {r['track_ms']:6.1f} ms {r['fps']:7.1f} "
+              f"{r['iou']:6.2f} {r['ball_hit']:8.2f} {r['fg_ratio']*100:6.2f}%")
+    print("=" * 78)
+
+if __name__ == "__main__":
+    import os
+    from synthetic_video import generate_synthetic_video, load_ground_truth, truth_path_for
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    video_path = os.path.join(project_root, 'data', 'benchmark', 'synthetic_0_600.mp4')
+    if not os.path.exists(truth_path_for(video_path)):
+        print("합성 영상 생성 중...")
+        generate_synthetic_video(video_path, num_frames=600)
+
+    schedules = {
+        '기본': None,
+        'every4': BackgroundSchedule(update_every=4),
+        'warmup_stride4': BackgroundSchedule(warmup_stride=4, warmup_decay=0.9),
+        'freeze_rally': BackgroundSchedule(freeze_in_rally=True),
+        'all': BackgroundSchedule(update_every=4, warmup_stride=4, warmup_decay=0.9,
+                                  freeze_in_rally=True),
+    }
+    print("배경 갱신 스케줄 비교")
+    results = compare_schedules(video_path, schedules, start_frame=120, num_frames=240,
+                                truth=load_ground_truth(truth_path_for(video_path)))
+    print_comparison(results)
@@ -0,0 +1,136 @@
+import cv2
+import numpy as np
+
+# 후보 1개 = 구조화 배열 1행
+CANDIDATE_DTYPE = np.dtype([
+    ('cx', np.int32),            # 중심 (bbox 중심, 프레임 좌표)
+    ('cy', np.int32),
+    ('x', np.int32),             # bbox (프레임 좌표)
+    ('y', np.int32),
+    ('w', np.int32),
+    ('h', np.int32),
+    ('area', np.float32),        # contourArea
+    ('circularity', np.float32),
+    ('aspect_ratio', np.float32),
+])
+
+def extract_candidates(mask, min_area=10, max_area=400, min_aspect=0.3, max_aspect=2.5,
+                       min_circularity=0.25, y_range=None, exclude_rows=None,
+                       player_min_area=None, player_margin=15, offset=(0, 0)):
+    """
+    공 후보 추출 (connectedComponentsWithStats 1회)
+
+    contour마다 contourArea / boundingRect / arcLength를 부르는 대신
+    모든 blob의 면적/bbox를 배열로 한 번에 얻고 NumPy 마스크로 필터링.
+    원형도(arcLength)는 필터를 통과한 소수의 blob에만 계산한다.
+
+    선수 제거 (player_min_area): 큰 blob → 팽창 → 팽창 영역에 닿는 작은 blob은 후보에서 제외.
+    player_tracker.find_large_blobs도 같은 기준으로 선수를 찾는다.
+
+    Args:
+        mask: 전경 마스크 (전체 프레임 또는 ROI crop)
+        min_area, max_area: 면적 범위
+        min_aspect, max_aspect: 종횡비 (w/h) 범위
+        min_circularity: 최소 원형도
+        y_range: (y_min, y_max) bbox 상단 y 허용 범위 (프레임 좌표)
+        exclude_rows: (top, bottom) 중심이 이 구간이면 제외 (네트, 프레임 좌표)
+        player_min_area: 이보다 큰 blob은 선수로 보고 제거 (None이면 생략)
+        player_margin: 선수 마스크 팽창 커널 크기 (픽셀, 홀수)
+        offset: mask가 crop이면 (x1, y1) - 결과를 프레임 좌표로 변환
+
+    Returns:
+        (candidates, players_mask)
+        candidates: CANDIDATE_DTYPE 구조화 배열
+        players_mask: 팽창된 선수 마스크 (mask와 같은 크기, 선수 제거 안 하면 None)
+    """
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+    # 0번 = 배경
+    ids = np.arange(1, num_labels)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    xs = stats[1:, cv2.CC_STAT_LEFT]
+    ys = stats[1:, cv2.CC_STAT_TOP]
+    ws = stats[1:, cv2.CC_STAT_WIDTH]
+    hs = stats[1:, cv2.CC_STAT_HEIGHT]
+
+    # ⭐ 선수 (큰 blob) 마스크 + 근처 작은 blob 제외
+    players_mask = None
+    keep = np.ones(len(ids), dtype=bool)
+    if player_min_area is not None:
+        large = areas > player_min_area
+        lut = np.zeros(num_labels, dtype=np.uint8)
+        lut[1:][large] = 255
+        players_mask = lut[labels]
+
+        if large.any():
+            # 확장 (머리까지 커버)
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (player_margin, player_margin))
+            players_mask = cv2.dilate(players_mask, kernel, iterations=2)
+            touched = np.bincount(labels[players_mask > 0], minlength=num_labels) > 0
+            keep &= ~touched[1:]
+        keep &= ~large
+
+    # 면적: 픽셀 수 ≥ contourArea → 하한은 그대로, 상한은 둘레만큼 여유 (contour로 재확인)
+    keep &= (areas >= min_area) & (areas <= max_area + (ws + hs) * 2)
+
+    # 종횡비
+    aspect = ws / np.maximum(hs, 1)
+    keep &= (aspect >= min_aspect) & (aspect <= max_aspect)
+
+    # 프레임 좌표
+    fx = xs + offset[0]
+    fy = ys + offset[1]
+    cx = fx + ws // 2
+    cy = fy + hs // 2
+
+    # 높이 필터
+    if y_range is not None:
+        keep &= (fy >= y_range[0]) & (fy <= y_range[1])
+
+    # 네트 제외
+    if exclude_rows is not None:
+        keep &= (cy < exclude_rows[0]) | (cy >= exclude_rows[1])
+
+    # ⭐ 원형도: 살아남은 blob만 (findContours 1회, contour 첫 점으로 label 매칭)
+    survivors = np.flatnonzero(keep)
+    contour_area = np.zeros(num_labels)
+    perimeter = np.zeros(num_labels)
+    if len(survivors) > 0:
+        lut = np.zeros(num_labels, dtype=np.uint8)
+        lut[ids[survivors]] = 255
+        contours, _ = cv2.findContours(lut[labels], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            px, py = contour[0, 0]
+            label = labels[py, px]
+            contour_area[label] = cv2.contourArea(contour)
+            perimeter[label] = cv2.arcLength(contour, True)
+
+    area = contour_area[1:]
+    perim = perimeter[1:]
+    circularity = 4 * np.pi * area / np.maximum(perim * perim, 1e-9)
+    keep &= (perim > 0) & (area >= min_area) & (area <= max_area)
+    keep &= circularity >= min_circularity
+
+    sel = np.flatnonzero(keep)
+    candidates = np.zeros(len(sel), dtype=CANDIDATE_DTYPE)
+    candidates['cx'] = cx[sel]
+    candidates['cy'] = cy[sel]
+    candidates['x'] = fx[sel]
+    candidates['y'] = fy[sel]
+    candidates['w'] = ws[sel]
+    candidates['h'] = hs[sel]
+    candidates['area'] = area[sel]
+    candidates['circularity'] = circularity[sel]
+    candidates['aspect_ratio'] = aspect[sel]
+
+    return candidates, players_mask
+
+def best_by_circularity(candidates):
+    """원형도 최고 후보의 인덱스 (없으면 None)"""
+    if len(candidates) == 0:
+        return None
+    return int(np.argmax(candidates['circularity']))
+
+def distances_to(candidates, point):
+    """모든 후보 중심 ~ point 거리 (배열)"""
+    return np.hypot(candidates['cx'] - point[0], candidates['cy'] - point[1])
@@ -0,0 +1,200 @@
+import numpy as np
+import os
+import time
+
+def _flatten(prefix, value, arrays, none_keys):
+    """중첩 dict → 'a/b' 키 배열들 (None은 키 이름만 따로 기록)"""
+    if isinstance(value, dict):
+        for name, item in value.items():
+            _flatten(f"{prefix}/{name}" if prefix else name, item, arrays, none_keys)
+    elif value is None:
+        none_keys.append(prefix)
+    else:
+        arrays[prefix] = np.asarray(value)
+
+def _unflatten(data, prefix):
+    """_flatten의 반대 (prefix 아래만, 0차원 배열은 스칼라로)"""
+    state = {}
+    names = [name for name in data.files if name.startswith(prefix + '/')]
+    if 'none_keys' in data.files:
+        names += [str(name) for name in data['none_keys'] if str(name).startswith(prefix + '/')]
+    for name in names:
+        keys = name[len(prefix) + 1:].split('/')
+        node = state
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        if name in data.files:
+            value = data[name]
+            node[keys[-1]] = value.item() if value.ndim == 0 else value
+        else:
+            node[keys[-1]] = None
+    return state
+
+def save_checkpoint(path, frame_index, meta, state, background=None, history=None, extra=None):
+    """
+    체크포인트 1개 저장 (임시 파일 → os.replace, 중간에 죽어도 이전 체크포인트는 온전)
+
+    Args:
+        path: .npz 경로
+        frame_index: 마지막으로 처리한 프레임 번호
+        meta: 설정 문자열 (재개할 때 같은 설정인지 확인)
+        state: 추적 상태 dict (BallPipeline.state() 등, 중첩 dict / None 가능)
+        background: 배경 이미지 (getBackgroundImage, 없으면 None)
+        history: 직전 ROI 프레임 배열 (배경 모델 복원용)
+        extra: 호출 쪽 추가 상태 dict (랠리 번호 등)
+    """
+    arrays = {}
+    none_keys = []
+    _flatten('state', state, arrays, none_keys)
+    _flatten('extra', extra or {}, arrays, none_keys)
+    if background is not None:
+        arrays['background'] = background
+    if history is not None and len(history) > 0:
+        arrays['history'] = np.asarray(history)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, frame_index=frame_index, meta=meta, saved_at=time.time(),
+                 none_keys=np.array(none_keys, dtype=str), **arrays)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """
+    체크포인트 읽기
+
+    Returns:
+        dict - frame_index, meta, saved_at, state, extra, background, history
+        (파일 없으면 None)
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {
+            'frame_index': int(data['frame_index']),
+            'meta': str(data['meta']),
+            'saved_at': float(data['saved_at']),
+            'state': _unflatten(data, 'state'),
+            'extra': _unflatten(data, 'extra'),
+            'background': data['background'] if 'background' in data.files else None,
+            'history': data['history'] if 'history' in data.files else None,
+        }
+
+class Checkpointer:
+    """
+    주기적 체크포인트 + 재개 (긴 공 추적 실행용)
+
+    every 프레임마다 저장:
+      - 마지막으로 처리한 프레임 번호
+      - 추적 상태 (칼만 x/P/hits/missed, last_ball_position, 배경 갱신 스케줄 카운터)
+      - 배경 모델: getBackgroundImage + 직전 warm_frames ROI 프레임
+        (OpenCV가 KNN/MOG2 내부 샘플을 꺼내 주지 않으므로 bg_cache와 같은 방식 -
+         재개할 때 배경 이미지를 prime_repeats번 넣고 직전 프레임을 다시 넣는다.
+         3프레임 차분은 직전 프레임만으로 완전히 복원된다)
+
+    직전 프레임은 체크포인트 직전 warm_frames 프레임만 복사하므로 평소 비용은 없다.
+    궤적 행은 호출 쪽에서 save() 전에 TrajectoryStore.flush() - 체크포인트가 가리키는
+    프레임까지의 궤적은 항상 파일에 있다.
+
+    Args:
+        path: 체크포인트 .npz
+        every: 체크포인트 간격 (처리한 프레임 수, 0이면 끔)
+        meta: 설정 dict (영상 / 구간 / 엔진 등) - 재개할 때 다르면 체크포인트 무시
+        warm_frames: 같이 저장할 직전 ROI 프레임 수
+        prime_repeats: 재개할 때 배경 이미지를 반복 적용할 횟수
+    """
+    def __init__(self, path, every=500, meta=None, warm_frames=5, prime_repeats=30):
+        self.path = path
+        self.every = max(0, every)
+        self.meta = repr(sorted((meta or {}).items()))
+        self.warm_frames = warm_frames
+        self.prime_repeats = prime_repeats
+
+        self.count = 0
+        self.history = []
+
+        # 통계
+        self.saves = 0
+        self.save_time = 0.0
+
+    @property
+    def enabled(self):
+        return self.every > 0
+
+    def remember(self, pipeline, frame):
+        """
+        처리한 프레임 1장 알림 (process() 다음에 호출)
+
+        다음 체크포인트 직전 warm_frames 프레임만 ROI를 복사해 둔다.
+        """
+        if not self.enabled:
+            return
+        self.count += 1
+        position = self.count % self.every
+        if position == 0 or position > self.every - self.warm_frames:
+            self.history.append(pipeline.prepare(frame).copy())
+            del self.history[:-self.warm_frames]
+
+    def due(self):
+        """이번 프레임에서 저장할 차례인지"""
+        return self.enabled and self.count > 0 and self.count % self.every == 0
+
+    def save(self, frame_index, pipeline, extra=None):
+        """
+        체크포인트 저장
+
+        Args:
+            frame_index: 마지막으로 처리한 프레임 번호 (재개는 다음 프레임부터)
+            pipeline: BallPipeline
+            extra: 호출 쪽 추가 상태 dict
+        """
+        t0 = time.perf_counter()
+        save_checkpoint(self.path, frame_index, self.meta, pipeline.state(),
+                        background=pipeline.bg_subtractor.getBackgroundImage(),
+                        history=self.history, extra=extra)
+        self.history = []
+        self.saves += 1
+        self.save_time += time.perf_counter() - t0
+
+    def load(self):
+        """
+        재개할 체크포인트 (없거나 설정이 다르면 None)
+        """
+        checkpoint = load_checkpoint(self.path)
+        if checkpoint is None:
+            return None
+        if checkpoint['meta'] != self.meta:
+            print(f"✗ 체크포인트 설정이 다름 - 처음부터: {self.path}")
+            return None
+        return checkpoint
+
+    def restore(self, pipeline, checkpoint):
+        """
+        체크포인트로 파이프라인 복원 (추적 상태 + 배경 모델)
+
+        Returns:
+            다음에 처리할 프레임 번호
+        """
+        engine = pipeline.bg_subtractor
+        background = checkpoint['background']
+        if background is not None:
+            for _ in range(self.prime_repeats):
+                engine.apply(background)
+        history = checkpoint['history']
+        if history is not None:
+            for frame_roi in history:
+                engine.apply(frame_roi)
+        pipeline.restore_state(checkpoint['state'])
+        return checkpoint['frame_index'] + 1
+
+    def remove(self):
+        """정상 종료 후 체크포인트 삭제"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def print_stats(self):
+        if self.saves:
+            print(f"체크포인트: {self.saves}번 | 평균 {self.save_time/self.saves*1000:.1f} ms")
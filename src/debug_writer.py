@@ -0,0 +1,112 @@
+import cv2
+import os
+import queue
+import threading
+
+class DebugWriter:
+    """
+    비동기 디버그 이미지 저장
+
+    추적 루프 안에서 cv2.imwrite를 직접 부르면 JPEG 인코딩 + 디스크 쓰기 동안
+    추적이 멈춘다. 이미지를 큐에 넣기만 하고 인코딩/저장은 스레드 풀이 처리
+    (cv2.imwrite는 GIL을 풀어 주므로 스레드로 충분).
+
+    Args:
+        output_dir: 저장 디렉토리
+        every: 샘플링 간격 (N 프레임마다 저장)
+        enabled: False면 아무것도 저장하지 않음
+        workers: 인코딩/저장 스레드 수
+        queue_size: 대기 가능한 이미지 수
+        policy: 큐가 가득 찼을 때 'drop' (버림, 추적 우선) 또는 'block' (기다림, 전부 저장)
+    """
+    def __init__(self, output_dir, every=1, enabled=True, workers=2, queue_size=32,
+                 policy='drop'):
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"policy는 'drop' 또는 'block': {policy}")
+
+        self.output_dir = output_dir
+        self.every = max(1, every)
+        self.enabled = enabled
+        self.policy = policy
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+
+        if not enabled:
+            return
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        for _ in range(workers):
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def should_write(self, index):
+        """
+        이번 프레임을 저장할지 (시각화 생성 전에 확인해서 불필요한 작업 생략)
+        """
+        return self.enabled and index % self.every == 0
+
+    def write(self, filename, image):
+        """
+        이미지 저장 요청 (즉시 반환)
+
+        image는 복사해서 넣으므로 호출 후 원본 버퍼를 재사용해도 된다.
+
+        Returns:
+            True면 큐에 들어감, False면 버려짐 (drop 정책 / 비활성)
+        """
+        if not self.enabled:
+            return False
+
+        item = (os.path.join(self.output_dir, filename), image.copy())
+        if self.policy == 'block':
+            self._queue.put(item)
+            return True
+
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            path, image = item
+            ok = cv2.imwrite(path, image)
+            with self._lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+            self._queue.task_done()
+
+    def close(self):
+        """남은 이미지 모두 저장하고 스레드 종료"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def print_stats(self):
+        """저장 통계 출력"""
+        if not self.enabled:
+            print("디버그 이미지: 저장 안 함")
+            return
+        print(f"디버그 이미지: {self.written} 저장 | {self.dropped} 버림 | {self.failed} 실패 "
+              f"(매 {self.every} 프레임, {self.policy})")
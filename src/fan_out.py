@@ -0,0 +1,219 @@
+import cv2
+import os
+import queue
+import threading
+import time
+
+from frame_reader import FrameReader
+from ball_pipeline import BallPipeline, trajectory_point
+
+class _Worker:
+    """파이프라인 1개 전용 스레드 (프레임 받으면 learn/process 후 완료 알림)"""
+    def __init__(self, entry, done):
+        self.entry = entry
+        self.done = done
+        self.inbox = queue.Queue(maxsize=1)
+        self.error = None
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            task = self.inbox.get()
+            if task is None:
+                return
+            try:
+                if self.error is None:
+                    self.entry.step(*task)
+            except Exception as e:
+                self.error = e
+            self.done.put(self.entry.name)
+
+class _Entry:
+    """등록된 파이프라인 + 출력 + 시간"""
+    def __init__(self, name, pipeline, collect):
+        self.name = name
+        self.pipeline = pipeline
+        self.collect = collect
+        self.outputs = []
+        self.elapsed = 0.0
+
+    def step(self, frame_index, frame, learn_only):
+        t0 = time.perf_counter()
+        if learn_only:
+            self.pipeline.learn(frame)
+        else:
+            value = self.collect(frame_index, self.pipeline.process(frame), self.pipeline)
+            if value is not None:
+                self.outputs.append(value)
+        self.elapsed += time.perf_counter() - t0
+
+def collect_ball(frame_index, result, pipeline):
+    """
+    BallPipeline 결과 → 궤적 1행 (공 없으면 None)
+
+    shard_runner / v3와 같이 delay만큼 앞 프레임 번호 (diff3), 좌표는 원본 기준 (프록시)
+    """
+    if result['ball'] is None:
+        return None
+    return trajectory_point(frame_index - getattr(pipeline, 'delay', 0), result['ball'],
+                            getattr(pipeline, 'scale', 1.0))
+
+class FanOutRunner:
+    """
+    디코딩 1번으로 여러 파이프라인 실행
+
+    디코더(FrameReader) 1개가 읽은 프레임을 등록된 파이프라인 모두에 같은 배열로 넘긴다.
+    v3 / 고정 게이팅 / 전체 프레임 마스킹처럼 변형 여러 개를 비교할 때
+    영상을 변형 수만큼 디코딩하지 않기 위한 것.
+
+    파이프라인은 BallPipeline처럼 learn(frame) / process(frame)이 있으면 된다.
+    프레임은 모든 파이프라인이 공유하므로 읽기만 해야 한다 (그리려면 copy()).
+
+    threaded=True면 파이프라인마다 스레드 1개 (OpenCV 연산은 GIL을 풀어서 실제로 병렬).
+    프레임마다 모든 파이프라인이 끝난 뒤 다음 프레임을 읽는다 (버퍼 재사용 안전).
+
+    Args:
+        video_path: 영상 경로
+        threaded: True면 파이프라인별 스레드
+    """
+    def __init__(self, video_path, threaded=True):
+        self.video_path = video_path
+        self.threaded = threaded
+        self.entries = []
+        self.decode_time = 0.0
+        self.frames = 0
+
+    def register(self, name, pipeline, collect=collect_ball):
+        """
+        파이프라인 등록
+
+        Args:
+            name: 결과 이름
+            pipeline: learn(frame) / process(frame) 객체
+            collect: (frame_index, process 결과, pipeline) → 저장할 값 (None이면 저장 안 함)
+        """
+        self.entries.append(_Entry(name, pipeline, collect))
+        return pipeline
+
+    def run(self, start_frame=0, num_frames=None):
+        """
+        0 ~ start_frame은 learn (배경 학습), start_frame부터 num_frames는 process
+
+        Returns:
+            {name: outputs 리스트}
+        """
+        cap = FrameReader(self.video_path)
+        if not cap.isOpened():
+            raise IOError(f"영상을 열 수 없음: {self.video_path}")
+        if num_frames is None:
+            num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) - start_frame
+        end_frame = start_frame + num_frames
+
+        done = queue.Queue()
+        workers = [_Worker(entry, done) for entry in self.entries] if self.threaded else []
+
+        try:
+            for frame_index in range(end_frame):
+                t0 = time.perf_counter()
+                ret, frame = cap.read()
+                self.decode_time += time.perf_counter() - t0
+                if not ret:
+                    break
+                self.frames += 1
+                task = (frame_index, frame, frame_index < start_frame)
+
+                if workers:
+                    for worker in workers:
+                        worker.inbox.put(task)
+                    for _ in workers:
+                        done.get()
+                else:
+                    for entry in self.entries:
+                        entry.step(*task)
+        finally:
+            for worker in workers:
+                worker.inbox.put(None)
+            for worker in workers:
+                worker.thread.join()
+            cap.release()
+
+        for worker in workers:
+            if worker.error is not None:
+                raise worker.error
+
+        return {entry.name: entry.outputs for entry in self.entries}
+
+    def side_by_side(self):
+        """
+        프레임별 비교표 (collect_ball 출력 기준)
+
+        Returns:
+            [(frame, {name: position 또는 None}), ...] - 프레임 순서
+        """
+        table = {}
+        for entry in self.entries:
+            for point in entry.outputs:
+                table.setdefault(point['frame'], {})[entry.name] = point['position']
+        names = [entry.name for entry in self.entries]
+        return [(frame, {name: table[frame].get(name) for name in names})
+                for frame in sorted(table)]
+
+    def save_csv(self, path):
+        """비교표 CSV (frame, 이름1_x, 이름1_y, 이름2_x, ...)"""
+        names = [entry.name for entry in self.entries]
+        with open(path, 'w') as f:
+            f.write(",".join(['frame'] + [f"{n}_{axis}" for n in names for axis in 'xy']) + "\n")
+            for frame, positions in self.side_by_side():
+                values = []
+                for name in names:
+                    p = positions[name]
+                    values += [str(p[0]), str(p[1])] if p is not None else ["", ""]
+                f.write(",".join([str(frame)] + values) + "\n")
+
+    def print_stats(self):
+        """파이프라인별 검출 수 / 시간"""
+        print(f"디코딩: {self.frames} 프레임 1번, {self.decode_time:.2f}s"
+              f" ({'스레드' if self.threaded else '순차'})")
+        for entry in self.entries:
+            print(f"  {entry.name:16s} 출력 {len(entry.outputs):5d} | {entry.elapsed:.2f}s")
+
+def ball_variants(frame_shape):
+    """비교용 BallPipeline 변형 (test_ball_tracking_v3 옵션 조합)"""
+    return {
+        'kalman': BallPipeline(frame_shape),
+        'fixed_gate': BallPipeline(frame_shape, use_kalman=False),
+        'full_frame': BallPipeline(frame_shape, crop_roi=False),
+    }
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    video_path = os.path.join(project_root, 'data', 'tennis_sample_1.mp4')
+
+    if not os.path.exists(video_path):
+        print(f"✗ 영상 없음: {video_path}")
+    else:
+        cap = cv2.VideoCapture(video_path)
+        frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                       int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        cap.release()
+
+        print("디코딩 1번 / 파이프라인 여러 개")
+        print("=" * 50)
+        runner = FanOutRunner(video_path)
+        for name, pipeline in ball_variants(frame_shape).items():
+            runner.register(name, pipeline)
+
+        t0 = time.perf_counter()
+        runner.run(start_frame=500, num_frames=300)
+        print(f"총 {time.perf_counter() - t0:.1f}s")
+        runner.print_stats()
+        print("=" * 50)
+
+        output_dir = os.path.join(project_root, 'data', 'fan_out')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        csv_path = os.path.join(output_dir, 'side_by_side.csv')
+        runner.save_csv(csv_path)
+        print(f"✓ 비교표: {csv_path}")
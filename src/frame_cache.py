@@ -0,0 +1,210 @@
+import cv2
+import glob
+import hashlib
+import numpy as np
+import os
+import time
+
+def video_key(video_path):
+    """캐시 키: 영상 (경로 + 크기 + 수정 시각) - 영상이 바뀌면 캐시도 무효"""
+    video_path = os.path.abspath(video_path)
+    stat = os.stat(video_path)
+    return hashlib.sha1(f"{video_path}|{stat.st_size}|{int(stat.st_mtime)}".encode()).hexdigest()[:16]
+
+def default_cache_dir(video_path):
+    """영상 옆 frame_cache/ (bg_cache/와 같은 위치)"""
+    return os.path.join(os.path.dirname(os.path.abspath(video_path)), 'frame_cache')
+
+def find_frame_cache(video_path, start_frame, num_frames, cache_dir=None):
+    """
+    [start_frame, start_frame + num_frames)를 포함하는 캐시 찾기
+
+    Returns:
+        (data_path, index) - 없으면 (None, None)
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir(video_path)
+    key = video_key(video_path)
+
+    for index_path in sorted(glob.glob(os.path.join(cache_dir, f'{key}_*_index.npz'))):
+        with np.load(index_path) as data:
+            index = {name: int(data[name]) for name in data.files}
+        if index['start'] <= start_frame and start_frame + num_frames <= index['start'] + index['filled']:
+            return index_path[:-len('_index.npz')] + '.npy', index
+    return None, None
+
+def fill_frame_cache(video_path, start_frame, num_frames, cache_dir=None, verbose=True):
+    """
+    프레임 구간을 디코딩해서 raw 캐시로 저장 (구간마다 1번)
+
+    N×H×W×3 uint8 .npy (memmap으로 바로 씀) + 인덱스 .npz (시작, 실제 프레임 수, 크기).
+    영상이 구간 중간에 끝나면 읽은 만큼만 인덱스에 기록한다.
+
+    Returns:
+        (data_path, index)
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir(video_path)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"영상을 열 수 없음: {video_path}")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total > 0:
+        num_frames = max(0, min(num_frames, total - start_frame))
+
+    base = os.path.join(cache_dir, f'{video_key(video_path)}_{start_frame}_{num_frames}')
+    data_path = base + '.npy'
+
+    # ⭐ 디스크 배열에 바로 디코딩 (메모리에 N장을 올리지 않음)
+    t0 = time.perf_counter()
+    tmp_path = base + '.tmp.npy'
+    frames = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                       shape=(num_frames, height, width, 3))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    filled = 0
+    while filled < num_frames:
+        ret, _ = cap.read(frames[filled])
+        if not ret:
+            break
+        filled += 1
+    cap.release()
+    frames.flush()
+    del frames
+    os.replace(tmp_path, data_path)
+
+    index = {'start': start_frame, 'count': num_frames, 'filled': filled,
+             'width': width, 'height': height, 'fps_milli': int(round(fps * 1000)),
+             'total_frames': total}
+    index_path = base + '_index.npz'
+    with open(index_path + '.tmp', 'wb') as f:
+        np.savez(f, **index)
+    os.replace(index_path + '.tmp', index_path)
+
+    if verbose:
+        size_mb = os.path.getsize(data_path) / (1024 * 1024)
+        print(f"✓ 프레임 캐시 저장: {start_frame} ~ {start_frame + filled} "
+              f"({filled} 프레임, {size_mb:.0f} MB, {time.perf_counter() - t0:.1f}s)")
+    return data_path, index
+
+class CachedCapture:
+    """
+    raw 프레임 캐시를 읽는 VideoCapture
+
+    [start_frame, start_frame + num_frames) 구간은 memmap에서 복사 없이 꺼내고
+    (처음 1번만 디코딩해서 캐시를 채움), 구간 밖 프레임은 일반 디코더로 읽는다.
+    같은 구간을 임계값만 바꿔 반복 실행할 때 디코딩을 통째로 생략하기 위한 것.
+
+    주의: read()가 돌려준 frame은 읽기 전용 (캐시 파일 뷰)이다.
+    그 위에 그리려면 copy()할 것.
+
+    Args:
+        video_path: 영상 경로
+        start_frame, num_frames: 캐시할 구간
+        cache_dir: 캐시 디렉토리 (기본: 영상 옆 frame_cache/)
+    """
+    def __init__(self, video_path, start_frame, num_frames, cache_dir=None):
+        self.video_path = video_path
+        self.frame_index = -1  # 마지막으로 read()한 프레임 번호
+        self._pos = 0
+        self._decoder = None
+        self._decoder_pos = -1
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+
+        data_path, index = find_frame_cache(video_path, start_frame, num_frames, cache_dir)
+        if data_path is None:
+            data_path, index = fill_frame_cache(video_path, start_frame, num_frames, cache_dir)
+        else:
+            print(f"✓ 프레임 캐시 사용: {os.path.basename(data_path)}")
+
+        self.index = index
+        self.start = index['start']
+        self.end = index['start'] + index['filled']
+        self.frames = np.load(data_path, mmap_mode='r')
+
+    def _decode(self, index, image=None):
+        """캐시 밖 프레임 (순서대로 읽을 때는 seek 없이)"""
+        if self._decoder is None:
+            self._decoder = cv2.VideoCapture(self.video_path)
+        if self._decoder_pos != index:
+            self._decoder.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self._decoder.read(image) if image is not None else self._decoder.read()
+        self._decoder_pos = index + 1 if ret else -1
+        return ret, frame
+
+    def read(self, image=None):
+        """
+        VideoCapture.read() 호환 (image 버퍼를 주면 거기에 복사)
+        """
+        ret, frame, _ = self.read_indexed(image)
+        return ret, frame
+
+    def read_indexed(self, image=None):
+        """
+        다음 프레임과 프레임 번호 (FrameReader 호환)
+
+        Returns:
+            (ret, frame, frame_index)
+        """
+        index = self._pos
+        if self.start <= index < self.end:
+            frame = self.frames[index - self.start]
+            self.hits += 1
+            if image is not None:
+                np.copyto(image, frame)
+                frame = image
+        else:
+            ret, frame = self._decode(index, image)
+            if not ret:
+                return False, None, self.frame_index
+            self.misses += 1
+
+        self._pos = index + 1
+        self.frame_index = index
+        return True, frame, index
+
+    def grab(self):
+        ret, _, _ = self.read_indexed()
+        return ret
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.index['width'])
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.index['height'])
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.index['total_frames'])
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.index['fps_milli'] / 1000
+        return 0.0
+
+    def set(self, prop_id, value):
+        """CAP_PROP_POS_FRAMES만 지원 (위치만 기록)"""
+        if prop_id != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self._pos = max(0, int(value))
+        return True
+
+    def release(self):
+        if self._decoder is not None:
+            self._decoder.release()
+            self._decoder = None
+
+    def print_stats(self):
+        """캐시 적중 통계 출력"""
+        total = max(self.hits + self.misses, 1)
+        print(f"프레임 캐시: {self.start} ~ {self.end} | 적중 {self.hits} "
+              f"({self.hits/total*100:.0f}%) | 디코딩 {self.misses}")
@@ -0,0 +1,207 @@
+import cv2
+import numpy as np
+import queue
+import threading
+import time
+
+class FrameReader:
+    """
+    백그라운드 스레드 프레임 프리페치 리더
+
+    디코딩은 별도 스레드에서, 추적/시각화는 메인 스레드에서 실행해서
+    H.264 디코딩 시간을 추적 작업 뒤로 숨긴다.
+    cv2.VideoCapture와 같은 (ret, frame) 인터페이스를 제공한다.
+
+    주의: read()가 돌려준 frame은 미리 할당된 버퍼를 재사용하므로
+    다음 read() 호출 전까지만 유효하다. 계속 보관하려면 copy()할 것.
+
+    Args:
+        source: 영상 경로 또는 이미 열린 cv2.VideoCapture
+        queue_size: 미리 디코딩해 둘 프레임 수
+        start_frame: 읽기 시작 프레임 번호
+    """
+    def __init__(self, source, queue_size=8, start_frame=0):
+        if isinstance(source, str):
+            self.cap = cv2.VideoCapture(source)
+        else:
+            self.cap = source
+
+        self.queue_size = queue_size
+        self.frame_index = -1  # 마지막으로 read()한 프레임 번호
+
+        # 통계 (초 단위)
+        self.frames_read = 0
+        self.decode_time = 0.0     # 디코더 스레드가 실제로 디코딩한 시간
+        self.decoder_wait = 0.0    # 큐가 가득 차서 디코더가 기다린 시간 (소비가 느림)
+        self.consumer_wait = 0.0   # 큐가 비어서 소비자가 기다린 시간 (디코딩이 느림)
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._held = None  # 소비자가 현재 들고 있는 버퍼
+
+        if not self.cap.isOpened():
+            self._buffers = []
+            return
+
+        # ⭐ 프레임 버퍼 미리 할당 (큐 + 소비자 보유분 + 디코딩 중 1개)
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._buffers = [np.empty((height, width, 3), dtype=np.uint8)
+                         for _ in range(queue_size + 2)]
+
+        if start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self._start(start_frame)
+
+    def _start(self, start_index):
+        """
+        디코더 스레드 시작
+
+        set() 뒤에도 소비자가 들고 있는 버퍼는 다음 read()까지 디코더에 주지 않는다
+        (일시정지 화면 / 추적기 초기화 프레임이 덮어써지지 않게).
+        """
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        for buf in self._buffers:
+            if buf is not self._held:
+                self._free.put(buf)
+        self._next_index = start_index
+        self.frame_index = start_index - 1
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._decode_loop, args=(start_index,),
+                                        daemon=True)
+        self._thread.start()
+
+    def _halt(self):
+        """디코더 스레드 정지 (큐에 남은 프레임은 버림)"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._free.put(None)  # 빈 버퍼를 기다리는 디코더 깨우기
+        self._thread.join()
+        self._thread = None
+
+    def _decode_loop(self, index):
+        """디코더 스레드: 빈 버퍼를 받아 다음 프레임을 디코딩"""
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                buf = self._free.get(timeout=0.1)
+            except queue.Empty:
+                self.decoder_wait += time.perf_counter() - t0
+                continue
+            t1 = time.perf_counter()
+            self.decoder_wait += t1 - t0
+            if buf is None:
+                return
+
+            ret, frame = self.cap.read(buf)
+            self.decode_time += time.perf_counter() - t1
+
+            if not ret:
+                self._filled.put((index, None))  # 영상 끝
+                return
+
+            # 해상도가 달라 새로 할당된 경우에도 그대로 전달
+            self._filled.put((index, frame))
+            index += 1
+
+    def read(self):
+        """
+        다음 프레임 읽기
+
+        Returns:
+            (ret, frame) - cv2.VideoCapture.read()와 동일
+        """
+        ret, frame, _ = self.read_indexed()
+        return ret, frame
+
+    def read_indexed(self):
+        """
+        다음 프레임과 프레임 번호 읽기
+
+        Returns:
+            (ret, frame, frame_index)
+        """
+        if self._thread is None:
+            # 열기 실패 또는 release() 이후
+            return False, None, self.frame_index
+
+        # 이전 버퍼 반납
+        if self._held is not None:
+            self._free.put(self._held)
+            self._held = None
+
+        t0 = time.perf_counter()
+        index, frame = self._filled.get()
+        self.consumer_wait += time.perf_counter() - t0
+
+        if frame is None:
+            # 다음 read()도 끝을 알리도록 다시 넣어 둠
+            self._filled.put((index, None))
+            return False, None, self.frame_index
+
+        self._held = frame
+        self.frame_index = index
+        self._next_index = index + 1
+        self.frames_read += 1
+        return True, frame, index
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop_id):
+        """
+        VideoCapture.get() 호환
+        CAP_PROP_POS_FRAMES는 디코더가 아닌 소비자 기준 위치를 돌려준다.
+        """
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._next_index)
+        return self.cap.get(prop_id)
+
+    def set(self, prop_id, value):
+        """
+        VideoCapture.set() 호환
+        위치 이동 시 프리페치된 프레임을 버리고 새 위치부터 다시 디코딩
+        """
+        if prop_id != cv2.CAP_PROP_POS_FRAMES:
+            return self.cap.set(prop_id, value)
+
+        self._halt()
+        ok = self.cap.set(cv2.CAP_PROP_POS_FRAMES, value)
+        self._start(int(value))
+        return ok
+
+    def release(self):
+        self._halt()
+        self.cap.release()
+
+    def stats(self):
+        """
+        디코딩 vs 소비 대기 시간 통계
+
+        Returns:
+            dict - frames, decode_time, decoder_wait, consumer_wait (초),
+                   decode_hidden (디코딩 시간 중 소비자가 기다리지 않은 비율)
+        """
+        hidden = 0.0
+        if self.decode_time > 0:
+            hidden = max(0.0, 1.0 - self.consumer_wait / self.decode_time)
+        return {
+            'frames': self.frames_read,
+            'decode_time': self.decode_time,
+            'decoder_wait': self.decoder_wait,
+            'consumer_wait': self.consumer_wait,
+            'decode_hidden': hidden,
+        }
+
+    def print_stats(self):
+        """대기 시간 통계 출력"""
+        s = self.stats()
+        frames = max(s['frames'], 1)
+        print(f"프레임 리더: {s['frames']} 프레임")
+        print(f"  디코딩:      {s['decode_time']:.2f}s ({s['decode_time']/frames*1000:.1f} ms/프레임)")
+        print(f"  소비자 대기: {s['consumer_wait']:.2f}s (디코딩이 느림)")
+        print(f"  디코더 대기: {s['decoder_wait']:.2f}s (추적이 느림)")
+        print(f"  숨겨진 디코딩: {s['decode_hidden']*100:.0f}%")
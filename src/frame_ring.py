@@ -0,0 +1,63 @@
+import numpy as np
+
+class FrameRing:
+    """
+    최근 디코딩한 프레임 링 버퍼 (미리 할당, 프레임마다 할당 없음)
+
+    일시정지 후 뒤로 돌려보기 / ROI 선택 / 추적 재생을 디코더 없이 하기 위한 것.
+    프레임 번호 % capacity 슬롯에 복사해 두고, 슬롯마다 들어 있는 프레임 번호를
+    같이 기록해서 덮어써진 프레임은 없는 것으로 처리한다.
+
+    Args:
+        frame_shape: (height, width, 3)
+        capacity: 보관할 프레임 수 (None이면 budget_mb로 결정)
+        budget_mb: 최대 메모리 (MB)
+    """
+    def __init__(self, frame_shape, capacity=None, budget_mb=256):
+        frame_bytes = int(np.prod(frame_shape))
+        max_frames = max(1, budget_mb * 1024 * 1024 // frame_bytes)
+        self.capacity = max_frames if capacity is None else max(1, min(capacity, max_frames))
+
+        self._frames = np.empty((self.capacity,) + tuple(frame_shape), dtype=np.uint8)
+        self._indices = np.full(self.capacity, -1, dtype=np.int64)
+        self.latest = -1  # 마지막으로 넣은 프레임 번호
+
+    def push(self, frame_index, frame):
+        """
+        프레임 복사해서 보관
+
+        Returns:
+            보관된 슬롯 (뷰 - 수정하면 버퍼 내용도 바뀜)
+        """
+        slot = frame_index % self.capacity
+        np.copyto(self._frames[slot], frame)
+        self._indices[slot] = frame_index
+        self.latest = frame_index
+        return self._frames[slot]
+
+    def get(self, frame_index):
+        """
+        보관 중인 프레임 (뷰, 없으면 None)
+
+        뷰는 같은 슬롯에 다른 프레임이 push되기 전까지만 유효하다.
+        """
+        if frame_index < 0:
+            return None
+        slot = frame_index % self.capacity
+        if self._indices[slot] != frame_index:
+            return None
+        return self._frames[slot]
+
+    def __contains__(self, frame_index):
+        return frame_index >= 0 and self._indices[frame_index % self.capacity] == frame_index
+
+    def oldest(self):
+        """latest부터 거꾸로 끊김 없이 보관된 가장 오래된 프레임 번호"""
+        index = self.latest
+        while index - 1 in self and self.latest - (index - 1) < self.capacity:
+            index -= 1
+        return index
+
+    @property
+    def nbytes(self):
+        return self._frames.nbytes
@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+
+MOTION_ENGINES = ['knn', 'mog2', 'diff3']
+
+class ThreeFrameDiff:
+    """
+    3프레임 차분 움직임 마스크 (배경 모델 없음)
+
+        mask(t-1) = (|f(t) - f(t-1)| > T) AND (|f(t-1) - f(t-2)| > T)
+
+    두 차분에 모두 나타나는 건 가운데 프레임 t-1의 움직이는 물체뿐이라
+    공의 잔상(이전/다음 위치)이 빠진다. KNN(history=500)처럼 수백 프레임 학습이 필요 없고
+    픽셀당 연산이 absdiff 2번 + threshold + and 뿐이다.
+
+    주의: apply(f(t))가 돌려주는 마스크는 한 프레임 전 f(t-1)의 것이다 (delay = 1).
+    처음 2프레임은 빈 마스크.
+
+    KNN/MOG2와 같은 apply(image) → mask 인터페이스. 버퍼는 처음 크기로 한 번만 할당.
+
+    Args:
+        threshold: 차분 임계값 (밝기)
+        downscale: 1보다 크면 축소해서 계산 후 마스크만 원래 크기로 (2 → 1/4 픽셀)
+    """
+    delay = 1
+    needs_warmup = False
+
+    def __init__(self, threshold=25, downscale=1):
+        self.threshold = threshold
+        self.downscale = downscale
+        self._shape = None
+        self.frames_seen = 0
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        self._shape = shape
+        self._full = (width, height)
+        self._size = (max(1, width // self.downscale), max(1, height // self.downscale))
+        w, h = self._size
+        self._gray = [np.empty((h, w), dtype=np.uint8) for _ in range(3)]
+        self._full_gray = np.empty((height, width), dtype=np.uint8) if self.downscale > 1 else None
+        self._diff_a = np.empty((h, w), dtype=np.uint8)
+        self._diff_b = np.empty((h, w), dtype=np.uint8)
+        self._small_mask = np.zeros((h, w), dtype=np.uint8)
+        self._mask = np.zeros((height, width), dtype=np.uint8)
+        self._newest = 0
+        self.frames_seen = 0
+
+    def _to_gray(self, image, dst):
+        """BGR → 그레이 (+ 축소), dst에 채움"""
+        if self.downscale > 1:
+            cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._full_gray)
+            cv2.resize(self._full_gray, self._size, dst=dst, interpolation=cv2.INTER_AREA)
+        else:
+            cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dst)
+
+    def apply(self, image, learningRate=-1):
+        """
+        새 프레임 넣고 한 프레임 전의 움직임 마스크 얻기
+
+        learningRate는 KNN/MOG2 인터페이스 호환용 (무시).
+        돌려준 마스크는 다음 apply()에서 덮어쓰므로 보관하려면 copy()할 것.
+        """
+        if self._shape != image.shape:
+            self._allocate(image.shape)
+
+        # 그레이 버퍼 3개를 돌려 씀: newest = f(t), 그 앞 f(t-1), f(t-2)
+        self._newest = (self._newest + 1) % 3
+        current = self._gray[self._newest]
+        previous = self._gray[(self._newest + 2) % 3]
+        oldest = self._gray[(self._newest + 1) % 3]
+        self._to_gray(image, current)
+        self.frames_seen += 1
+
+        if self.frames_seen < 3:
+            self._mask[:] = 0
+            return self._mask
+
+        cv2.absdiff(current, previous, dst=self._diff_a)
+        cv2.absdiff(previous, oldest, dst=self._diff_b)
+        cv2.threshold(self._diff_a, self.threshold, 255, cv2.THRESH_BINARY, dst=self._diff_a)
+        cv2.threshold(self._diff_b, self.threshold, 255, cv2.THRESH_BINARY, dst=self._diff_b)
+
+        if self.downscale > 1:
+            cv2.bitwise_and(self._diff_a, self._diff_b, dst=self._small_mask)
+            cv2.resize(self._small_mask, self._full, dst=self._mask,
+                       interpolation=cv2.INTER_NEAREST)
+        else:
+            cv2.bitwise_and(self._diff_a, self._diff_b, dst=self._mask)
+        return self._mask
+
+    def getBackgroundImage(self):
+        """배경 모델 없음 (bg_cache가 저장하지 않게 None)"""
+        return None
+
+def create_motion_engine(name='knn', **kwargs):
+    """
+    움직임 마스크 엔진 (모두 apply(image) → mask)
+
+    Args:
+        name: 'knn' (기본, 공 검출 스크립트와 같은 설정), 'mog2', 'diff3'
+        kwargs: ThreeFrameDiff 인자 (threshold, downscale)
+    """
+    if name == 'knn':
+        return cv2.createBackgroundSubtractorKNN(history=500, dist2Threshold=400,
+                                                 detectShadows=False)
+    if name == 'mog2':
+        return cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16,
+                                                  detectShadows=False)
+    if name == 'diff3':
+        return ThreeFrameDiff(**kwargs)
+    raise ValueError(f"알 수 없는 엔진: {name} (가능: {', '.join(MOTION_ENGINES)})")
+
+def engine_delay(engine):
+    """마스크가 몇 프레임 늦게 나오는지 (KNN/MOG2는 0)"""
+    return getattr(engine, 'delay', 0)
+
+def needs_warmup(engine):
+    """배경 학습이 필요한 엔진인지"""
+    return getattr(engine, 'needs_warmup', True)
@@ -0,0 +1,266 @@
+import cv2
+import itertools
+import numpy as np
+import os
+import time
+from multiprocessing import Pool
+
+from frame_reader import FrameReader
+from bg_cache import warmup_background
+from ball_pipeline import BallPipeline, DEFAULT_PARAMS, trajectory_point
+from benchmark import score
+from synthetic_video import load_ground_truth
+from trajectory_store import load_trajectories, centers
+
+# v1 / v2 / v3 스크립트에서 손으로 맞춘 값들
+DEFAULT_GRID = {
+    'min_area': [10, 15],
+    'max_area': [250, 400],
+    'aspect': [(0.3, 2.5), (0.6, 1.7)],      # (min_aspect, max_aspect)
+    'min_circularity': [0.25, 0.3, 0.4],
+    'player_min_area': [500],
+    'use_kalman': [True, False],
+    'max_distance': [50, 60],                # use_kalman=False일 때만 의미 있음
+}
+
+def expand_grid(grid):
+    """
+    파라미터 격자 → 설정 리스트
+
+    'aspect'는 (min_aspect, max_aspect) 쌍, max_distance는 칼만 게이팅이면 안 쓰므로
+    use_kalman=True 설정에서는 중복을 뺀다.
+
+    Returns:
+        [dict, ...] - BallPipeline params + 'use_kalman'
+    """
+    names = list(grid)
+    configs = []
+    seen = set()
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = dict(zip(names, values))
+        if 'aspect' in config:
+            config['min_aspect'], config['max_aspect'] = config.pop('aspect')
+        if config.get('use_kalman', True):
+            config.pop('max_distance', None)
+        key = tuple(sorted(config.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+def load_labels(path):
+    """
+    정답 궤적 → score() 형식 dict (frame, ball_x, ball_y, ball_visible)
+
+    합성 영상 _truth.npz, 또는 TrajectoryStore .npz (CSRT로 라벨링한 랠리)
+    TrajectoryStore의 frame은 read() 후 CAP_PROP_POS_FRAMES라 1부터 → 0부터로 맞춘다.
+    """
+    with np.load(path) as data:
+        is_truth = 'ball_visible' in data.files
+    if is_truth:
+        return load_ground_truth(path)
+
+    rows = load_trajectories(path)
+    cx, cy = centers(rows)
+    num_frames = int(rows['frame'].max()) if len(rows) else 0
+    labels = {
+        'frame': np.arange(num_frames, dtype=np.int32),
+        'ball_x': np.zeros(num_frames, dtype=np.int32),
+        'ball_y': np.zeros(num_frames, dtype=np.int32),
+        'ball_visible': np.zeros(num_frames, dtype=bool),
+    }
+    index = rows['frame'] - 1
+    labels['ball_x'][index] = cx
+    labels['ball_y'][index] = cy
+    labels['ball_visible'][index] = rows['success'] == 1
+    return labels
+
+def build_masks(video_path, start_frame, num_frames, mask_path):
+    """
+    공유 단계: 디코딩 + KNN + 노이즈 제거 1번 (필터 파라미터와 무관)
+
+    ROI crop 크기 마스크를 .npy (memmap)로 저장해서 워커들이 복사 없이 읽는다.
+
+    Returns:
+        (mask_path, info) - info: frame_shape, mask_origin, start_frame, num_frames, elapsed
+    """
+    t0 = time.perf_counter()
+    cap = FrameReader(video_path)
+    ret, first_frame = cap.read()
+    if not ret:
+        raise IOError(f"영상을 열 수 없음: {video_path}")
+
+    pipeline = BallPipeline(first_frame.shape)
+    warmup_background(cap, pipeline.bg_subtractor, video_path, start_frame,
+                      roi_mask=pipeline.roi_mask, roi_coords=pipeline.roi_coords)
+
+    x1, y1, x2, y2 = pipeline.roi_coords
+    tmp_path = mask_path + '.tmp.npy'
+    masks = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                      shape=(num_frames, y2 - y1, x2 - x1))
+    filled = 0
+    for i in range(num_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        fg_mask, _ = pipeline.foreground(frame)
+        masks[i] = pipeline.clean(fg_mask)
+        filled += 1
+    cap.release()
+    masks.flush()
+    del masks
+    os.replace(tmp_path, mask_path)
+
+    return mask_path, {
+        'frame_shape': first_frame.shape,
+        'mask_origin': (x1, y1),
+        'start_frame': start_frame,
+        'num_frames': filled,
+        'elapsed': time.perf_counter() - t0,
+    }
+
+def run_config(task):
+    """
+    설정 1개 평가 (워커 프로세스) - 공유 마스크로 후보 + 선택만
+
+    Returns:
+        dict - config, points [(frame, x, y), ...], elapsed
+    """
+    cv2.setNumThreads(1)
+    config, mask_path, info = task
+    params = dict(config)
+    use_kalman = params.pop('use_kalman', True)
+
+    masks = np.load(mask_path, mmap_mode='r')
+    pipeline = BallPipeline(info['frame_shape'], use_kalman=use_kalman, params=params)
+
+    t0 = time.perf_counter()
+    points = []
+    for i in range(info['num_frames']):
+        result = pipeline.process_mask(masks[i], info['mask_origin'])
+        if result['ball'] is not None:
+            point = trajectory_point(info['start_frame'] + i, result['ball'])
+            points.append((point['frame'],) + point['position'])
+    return {'config': config, 'points': points, 'elapsed': time.perf_counter() - t0}
+
+def run_sweep(video_path, labels_path, grid=None, start_frame=60, num_frames=None,
+              workers=None, tolerance=10, cache_dir=None):
+    """
+    파라미터 스윕
+
+    1. 디코딩 + KNN + 노이즈 제거는 1번 (build_masks)
+    2. 설정마다 후보 필터 + 선택만 프로세스 풀에서 병렬
+    3. recall (정답 궤적 기준), fps 순으로 정렬
+
+    Args:
+        video_path: 영상
+        labels_path: 정답 (합성 _truth.npz 또는 TrajectoryStore .npz)
+        grid: 파라미터 격자 (기본: DEFAULT_GRID)
+        start_frame: 분석 시작 (앞은 배경 학습)
+        num_frames: 분석 프레임 수 (None이면 정답 끝까지)
+        workers: 프로세스 수 (기본: CPU 코어 수)
+        tolerance: 정답 인정 거리 (픽셀)
+        cache_dir: 마스크 저장 위치 (기본: 영상 옆 sweep_cache/)
+
+    Returns:
+        (results, info) - results는 정렬된 dict 리스트 (config, recall, precision, fps, ...)
+    """
+    labels = load_labels(labels_path)
+    if num_frames is None:
+        num_frames = len(labels['frame']) - start_frame
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(video_path)), 'sweep_cache')
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    mask_path = os.path.join(cache_dir, f'{name}_{start_frame}_{num_frames}_masks.npy')
+    mask_path, info = build_masks(video_path, start_frame, num_frames, mask_path)
+    end_frame = start_frame + info['num_frames']
+
+    configs = expand_grid(grid or DEFAULT_GRID)
+    tasks = [(config, mask_path, info) for config in configs]
+    workers = workers or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        outputs = [run_config(task) for task in tasks]
+    else:
+        with Pool(processes=workers) as pool:
+            outputs = pool.map(run_config, tasks)
+    info['sweep_elapsed'] = time.perf_counter() - t0
+    info['num_configs'] = len(configs)
+
+    results = []
+    for output in outputs:
+        result = score(output['points'], labels, start_frame, end_frame, tolerance)
+        result['config'] = output['config']
+        result['elapsed'] = output['elapsed']
+        result['fps'] = info['num_frames'] / output['elapsed'] if output['elapsed'] > 0 else 0.0
+        results.append(result)
+
+    results.sort(key=lambda r: (-r['recall'], -r['fps']))
+    return results, info
+
+def format_config(config):
+    """설정 → 짧은 문자열"""
+    return " ".join(f"{k}={v}" for k, v in config.items())
+
+def print_sweep(results, info, top=10):
+    """상위 설정 표"""
+    print("=" * 78)
+    print(f"공유 단계 (디코딩 + KNN + 노이즈 제거): {info['num_frames']} 프레임, {info['elapsed']:.1f}s")
+    print(f"설정 {info['num_configs']}개: {info['sweep_elapsed']:.1f}s")
+    print("-" * 78)
+    print(f"{'순위':>4s} {'recall':>7s} {'precision':>9s} {'fps':>8s}  설정")
+    for rank, r in enumerate(results[:top], 1):
+        print(f"{rank:4d} {r['recall']:7.2f} {r['precision']:9.2f} {r['fps']:8.0f}  "
+              f"{format_config(r['config'])}")
+    print("=" * 78)
+
+def save_sweep(results, csv_path):
+    """전체 결과 CSV (순위 순)"""
+    names = list(DEFAULT_PARAMS) + ['use_kalman']
+    with open(csv_path, 'w') as f:
+        f.write(",".join(['rank'] + names + ['recall', 'precision', 'mean_error',
+                                            'tp', 'fp', 'fn', 'fps']) + "\n")
+        for rank, r in enumerate(results, 1):
+            values = [str(r['config'].get(name, '')) for name in names]
+            f.write(",".join([str(rank)] + values) +
+                    f",{r['recall']:.4f},{r['precision']:.4f},{r['mean_error']:.2f},"
+                    f"{r['tp']},{r['fp']},{r['fn']},{r['fps']:.1f}\n")
+
+if __name__ == "__main__":
+    import argparse
+    from synthetic_video import generate_synthetic_video, truth_path_for
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description="공 검출 필터 파라미터 스윕")
+    parser.add_argument('--video', help="영상 (기본: 합성 영상)")
+    parser.add_argument('--labels', help="정답 (기본: 영상 옆 _truth.npz)")
+    parser.add_argument('--start', type=int, default=60)
+    parser.add_argument('--frames', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    output_dir = os.path.join(project_root, 'data', 'param_sweep')
+    video_path = args.video
+    if video_path is None:
+        video_path = os.path.join(output_dir, 'synthetic_0_600.mp4')
+        if not os.path.exists(truth_path_for(video_path)):
+            print("합성 영상 생성 중...")
+            generate_synthetic_video(video_path, num_frames=600)
+    labels_path = args.labels or truth_path_for(video_path)
+
+    print("파라미터 스윕")
+    results, info = run_sweep(video_path, labels_path, start_frame=args.start,
+                              num_frames=args.frames, workers=args.workers)
+    print_sweep(results, info)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    csv_path = os.path.join(output_dir, 'sweep_results.csv')
+    save_sweep(results, csv_path)
+    print(f"✓ 전체 결과: {csv_path}")
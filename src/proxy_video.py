@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+import os
+import time
+
+from seek_cache import load_keyframe_index
+
+# 해상도에 비례하는 BallPipeline 파라미터 (면적은 scale², 거리는 scale, 커널은 홀수)
+AREA_PARAMS = ('min_area', 'max_area', 'player_min_area')
+LENGTH_PARAMS = ('max_distance',)
+KERNEL_PARAMS = ('player_margin',)
+
+def proxy_path_for(video_path, scale=0.5):
+    """원본 경로 → 프록시 경로 (원본 옆, 예: match_proxy50.mp4)"""
+    return os.path.splitext(video_path)[0] + f'_proxy{int(round(scale * 100))}.mp4'
+
+def info_path_for(proxy_path):
+    """프록시 경로 → 정보 .npz 경로 (scale, 원본 경로/크기)"""
+    return os.path.splitext(proxy_path)[0] + '_info.npz'
+
+def load_proxy_info(video_path):
+    """
+    프록시 정보 읽기
+
+    Returns:
+        dict - source_path, scale, source_width, source_height, ...
+        프록시가 아니면 None
+    """
+    path = info_path_for(video_path)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        info = {name: data[name].item() for name in data.files}
+    info['source_path'] = str(info['source_path'])
+    return info
+
+def proxy_scale(video_path):
+    """영상 좌표 / 원본 좌표 비율 (프록시가 아니면 1.0)"""
+    info = load_proxy_info(video_path)
+    return float(info['scale']) if info else 1.0
+
+def _is_current(proxy_path, video_path):
+    """프록시가 지금 원본으로 만든 것인지 (원본 크기 / 수정 시각 비교)"""
+    info = load_proxy_info(proxy_path)
+    if info is None or not os.path.exists(proxy_path):
+        return False
+    stat = os.stat(video_path)
+    return info['source_size'] == stat.st_size and info['source_mtime'] == int(stat.st_mtime)
+
+def build_proxy(video_path, scale=0.5, gop=12, output_path=None, rebuild=False, verbose=True):
+    """
+    저해상도 프록시 영상 만들기 (원본마다 1번)
+
+    디코딩 비용은 해상도에 비례하므로 전체 경기 분석은 축소본으로 돌리고
+    좌표만 원본 해상도로 되돌린다. 공/선수 blob은 1/2 축소에서도 남는다.
+    GOP를 짧게 (mp4v 기본 12) 해서 SeekableCapture 임의 접근도 빠르게.
+
+    Args:
+        video_path: 원본 영상
+        scale: 축소 비율 (0.5 → 1280x720이 640x360)
+        gop: 키프레임 간격 (지원하는 코덱만 적용)
+        output_path: 프록시 경로 (None이면 proxy_path_for)
+        rebuild: True면 최신이어도 다시 만듦
+
+    Returns:
+        프록시 경로
+    """
+    if output_path is None:
+        output_path = proxy_path_for(video_path, scale)
+    if not rebuild and _is_current(output_path, video_path):
+        return output_path
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"영상을 열 수 없음: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    # 짝수 크기 (코덱 제약)
+    size = (max(2, int(round(width * scale)) // 2 * 2), max(2, int(round(height * scale)) // 2 * 2))
+
+    # 임시 파일에 쓰고 끝나면 교체 (중간에 죽어도 반쪽 프록시가 안 남음)
+    tmp_path = os.path.splitext(output_path)[0] + '.tmp.mp4'
+    writer = cv2.VideoWriter(tmp_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'),
+                             fps, size, [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+    if not writer.isOpened():
+        cap.release()
+        raise IOError(f"프록시 저장 실패: {tmp_path}")
+
+    t0 = time.perf_counter()
+    small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+    num_frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+        writer.write(small)
+        num_frames += 1
+        if verbose and num_frames % 500 == 0:
+            print(f"  프록시 {num_frames} 프레임...")
+    cap.release()
+    writer.release()
+    os.replace(tmp_path, output_path)
+
+    # 실제 축소 비율 (짝수 맞춤 반영, 가로 기준)
+    stat = os.stat(video_path)
+    info_path = info_path_for(output_path)
+    tmp_info = info_path + '.tmp'
+    with open(tmp_info, 'wb') as f:
+        np.savez(f, source_path=os.path.abspath(video_path), scale=size[0] / width,
+                 source_width=width, source_height=height, width=size[0], height=size[1],
+                 num_frames=num_frames, source_size=stat.st_size,
+                 source_mtime=int(stat.st_mtime))
+    os.replace(tmp_info, info_path)
+
+    # 키프레임 인덱스도 미리 (SeekableCapture용)
+    load_keyframe_index(output_path, rebuild=True)
+
+    if verbose:
+        print(f"✓ 프록시: {output_path} ({size[0]}x{size[1]}, {num_frames} 프레임, "
+              f"{time.perf_counter() - t0:.1f}s)")
+    return output_path
+
+def scale_params(params, scale):
+    """
+    BallPipeline 파라미터를 축소 해상도에 맞춤
+
+    Args:
+        params: DEFAULT_PARAMS 형식 dict (일부만 있어도 됨)
+        scale: 영상 / 원본 비율
+
+    Returns:
+        새 dict
+    """
+    scaled = dict(params)
+    if scale == 1.0:
+        return scaled
+    for name in AREA_PARAMS:
+        if name in scaled:
+            scaled[name] = max(1, int(round(scaled[name] * scale * scale)))
+    for name in LENGTH_PARAMS:
+        if name in scaled:
+            scaled[name] = scaled[name] * scale
+    for name in KERNEL_PARAMS:
+        if name in scaled:
+            scaled[name] = max(3, int(scaled[name] * scale) // 2 * 2 + 1)
+    return scaled
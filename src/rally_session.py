@@ -0,0 +1,286 @@
+import cv2
+import numpy as np
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from frame_cache import video_key
+from frame_reader import FrameReader
+from frame_ring import FrameRing
+from redetect import Redetector, update_with_recovery
+from tracker_factory import SwitchingTracker, available_backends
+from trajectory_store import TrajectoryStore, METHODS, method_code
+
+# 시드 1개 = 랠리 1개 (사용자가 R로 고른 프레임 + bbox)
+SEED_COLUMNS = [
+    ('rally_id', np.int32),
+    ('frame', np.int32),       # ROI를 고른 프레임 번호 (0부터, 이 프레임은 init만 하고 행 없음)
+    ('end', np.int32),         # 마지막 추적 프레임 번호 (0부터, 끝나지 않은 랠리는 -1)
+    ('x', np.int32),
+    ('y', np.int32),
+    ('width', np.int32),
+    ('height', np.int32),
+    ('backend', np.uint8),     # 추적기 (METHODS 인덱스)
+]
+
+SEED_DTYPE = np.dtype(SEED_COLUMNS)
+
+def session_path_for(store_path):
+    """궤적 저장소 옆 세션 파일 (trajectories.npz → session.npz)"""
+    return os.path.join(os.path.dirname(store_path), 'session.npz')
+
+def load_seeds(path):
+    """
+    세션 파일 읽기
+
+    Returns:
+        (seeds, video) - SEED_DTYPE 배열 (rally_id 순), 기록한 영상 키 (파일 없으면 빈 배열, '')
+    """
+    if not os.path.exists(path):
+        return np.empty(0, dtype=SEED_DTYPE), ''
+    with np.load(path) as data:
+        seeds = np.empty(len(data['rally_id']), dtype=SEED_DTYPE)
+        for name, _ in SEED_COLUMNS:
+            seeds[name] = data[name]
+        names = [str(m) for m in data['method_names']]
+        if names != METHODS[:len(names)]:
+            remap = np.array([METHODS.index(m) for m in names], dtype=np.uint8)
+            seeds['backend'] = remap[seeds['backend']]
+        video = str(data['video'])
+    return seeds[np.argsort(seeds['rally_id'], kind='stable')], video
+
+class RallySession:
+    """
+    인터랙티브 추적 세션 기록 (랠리별 ROI 선택 = 시드)
+
+    R로 고른 프레임 / bbox / 추적기와 랠리가 끝난 프레임만 저장해 두면
+    GUI 없이 replay_session()으로 다른 추적기 / 파라미터로 전체 랠리를 다시 추적할 수 있다.
+    같은 rally_id를 다시 시작하면 이전 시드를 교체한다 (TrajectoryStore와 같은 규칙).
+    파일이 작으므로 바뀔 때마다 임시 파일 → os.replace로 바로 기록.
+
+    Args:
+        path: 세션 .npz 경로
+        video_path: 영상 (다른 영상 세션 파일이면 비우고 새로 시작)
+    """
+    def __init__(self, path, video_path=None):
+        self.path = path
+        self.video = video_key(video_path) if video_path else ''
+        self.seeds, video = load_seeds(path)
+        if self.video and video and video != self.video and len(self.seeds):
+            print(f"✗ 다른 영상의 세션 파일 - 새로 기록: {path}")
+            self.seeds = np.empty(0, dtype=SEED_DTYPE)
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def start(self, rally_id, frame_index, bbox, backend='csrt'):
+        """랠리 시작 (ROI 선택) 기록"""
+        x, y, w, h = [int(v) for v in bbox]
+        seed = np.array([(rally_id, frame_index, -1, x, y, w, h, method_code(backend))],
+                        dtype=SEED_DTYPE)
+        self.seeds = np.concatenate([self.seeds[self.seeds['rally_id'] != rally_id], seed])
+        self.save()
+
+    def end(self, rally_id, frame_index):
+        """랠리 끝 (마지막 추적 프레임) 기록"""
+        match = self.seeds['rally_id'] == rally_id
+        if match.any():
+            self.seeds['end'][match] = frame_index
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, video=self.video, method_names=np.array(METHODS),
+                     **{name: self.seeds[name] for name, _ in SEED_COLUMNS})
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.seeds)
+
+def replay_rally(task):
+    """
+    랠리 1개 다시 추적 (워커 프로세스, 화면 출력 없음)
+
+    시드 프레임으로 이동 → init → end 프레임까지 update (인터랙티브 도구와 같은
+    SwitchingTracker / 재검출 경로, 실시간 예산이 없으므로 자동 전환은 끔)
+
+    Args:
+        task: dict - video_path, rally_id, frame, end, bbox, backend, window, redetect
+
+    Returns:
+        dict - rally_id, trajectory ([frame, x, y, w, h, success], frame은 1부터),
+               methods, frames, elapsed
+    """
+    t0 = time.perf_counter()
+    start, end = task['frame'], task['end']
+
+    cap = FrameReader(task['video_path'], start_frame=start)
+    ret, frame = cap.read()
+    trajectory = []
+    methods = []
+    if ret:
+        # 재검출용 직전 2프레임만 보관
+        ring = FrameRing(frame.shape, capacity=3)
+        ring.push(start, frame)
+        tracker = SwitchingTracker(preferred=task['backend'], auto=False, window=task['window'])
+        tracker.init(ring.get(start), task['bbox'])
+        redetector = Redetector() if task['redetect'] else None
+        if redetector is not None:
+            redetector.start(task['bbox'])
+
+        for index in range(start + 1, end + 1):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            ring.push(index, frame)
+            success, bbox, method = update_with_recovery(
+                tracker, redetector, ring.get(index), ring.get(index - 1), ring.get(index - 2))
+            if success:
+                x, y, w, h = [int(v) for v in bbox]
+                trajectory.append([index + 1, x, y, w, h, 1])
+            else:
+                trajectory.append([index + 1, -1, -1, -1, -1, 0])
+            methods.append(method)
+    cap.release()
+
+    return {
+        'rally_id': task['rally_id'],
+        'trajectory': trajectory,
+        'methods': methods,
+        'frames': len(trajectory),
+        'elapsed': time.perf_counter() - t0,
+    }
+
+def replay_tasks(video_path, seeds, backend=None, window=True, redetect=True, total_frames=None):
+    """
+    시드 → replay_rally 작업 (끝나지 않은 랠리는 다음 랠리 시작 전 / 영상 끝까지)
+
+    Args:
+        backend: 모든 랠리에 쓸 추적기 (None이면 기록된 추적기)
+    """
+    if total_frames is None:
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+    starts = sorted(int(s) for s in seeds['frame'])
+    tasks = []
+    for seed in seeds:
+        start = int(seed['frame'])
+        end = int(seed['end'])
+        if end < 0:
+            later = [s for s in starts if s > start]
+            end = (later[0] - 1) if later else total_frames - 1
+        tasks.append({
+            'video_path': video_path,
+            'rally_id': int(seed['rally_id']),
+            'frame': start,
+            'end': min(end, total_frames - 1),
+            'bbox': (int(seed['x']), int(seed['y']), int(seed['width']), int(seed['height'])),
+            'backend': backend or METHODS[seed['backend']],
+            'window': window,
+            'redetect': redetect,
+        })
+    return tasks
+
+def replay_session(video_path, session_path, store_path, backend=None, workers=None, window=True,
+                   redetect=True, rally_ids=None):
+    """
+    세션 파일의 모든 랠리를 프로세스 풀에서 다시 추적 (랠리 1개 = 작업 1개)
+
+    랠리끼리는 독립이라 긴 랠리부터 나눠 주고, 끝나는 대로 저장소에 추가해서 마지막에 1번 flush.
+
+    Args:
+        session_path: RallySession 파일
+        store_path: 결과 TrajectoryStore 경로
+        backend: 모든 랠리에 쓸 추적기 (None이면 랠리마다 기록된 추적기)
+        workers: 프로세스 수 (기본: CPU 코어 수)
+        rally_ids: 이 랠리만 (None이면 전체)
+
+    Returns:
+        (results, elapsed) - results는 replay_rally() 결과 (끝난 순서)
+    """
+    seeds, video = load_seeds(session_path)
+    if video and video != video_key(video_path):
+        print(f"⚠️  세션 파일이 다른 영상 기록일 수 있음: {session_path}")
+    if rally_ids is not None:
+        seeds = seeds[np.isin(seeds['rally_id'], list(rally_ids))]
+    if backend is not None and backend not in available_backends():
+        raise ValueError(f"쓸 수 없는 추적기: {backend} (가능: {', '.join(available_backends())})")
+
+    tasks = replay_tasks(video_path, seeds, backend, window, redetect)
+    tasks.sort(key=lambda task: task['frame'] - task['end'])  # 긴 랠리부터
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+
+    store = TrajectoryStore(store_path)
+    results = []
+    t0 = time.perf_counter()
+    with Pool(processes=workers, initializer=cv2.setNumThreads, initargs=(1,)) as pool:
+        for result in pool.imap_unordered(replay_rally, tasks):
+            results.append(result)
+            if result['trajectory']:
+                store.append_rally(result['rally_id'], result['trajectory'],
+                                   method=result['methods'])
+            print(f"  ✓ [{len(results)}/{len(tasks)}] Rally {result['rally_id']}: "
+                  f"{result['frames']} 프레임, {result['elapsed']:.1f}s", flush=True)
+    store.flush()
+    return results, time.perf_counter() - t0
+
+def print_replay_summary(results, elapsed, fps):
+    """재추적 요약 (재생 시간 대비)"""
+    frames = sum(r['frames'] for r in results)
+    found = sum(sum(row[5] for row in r['trajectory']) for r in results)
+    redetected = sum(r['methods'].count('redetect') for r in results)
+    playback = frames / fps if fps else 0.0
+
+    print("=" * 50)
+    print(f"랠리: {len(results)} | 프레임: {frames} | 성공 {found / max(frames, 1) * 100:.1f}% | "
+          f"재검출 {redetected}")
+    print(f"전체 {elapsed:.1f}s ({frames / elapsed if elapsed > 0 else 0:.1f} fps) | "
+          f"재생 시간 {playback:.1f}s의 {elapsed / playback * 100 if playback else 0:.0f}%")
+    print("=" * 50)
+
+def main(argv=None):
+    import argparse
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    rallies_dir = os.path.join(project_root, 'data', 'rallies')
+
+    parser = argparse.ArgumentParser(description="기록된 ROI 선택으로 랠리 다시 추적 (화면 없음)")
+    parser.add_argument('video', help="영상 경로")
+    parser.add_argument('--session', default=os.path.join(rallies_dir, 'session.npz'),
+                        help="세션 파일 (기본: data/rallies/session.npz)")
+    parser.add_argument('--output', default=os.path.join(rallies_dir, 'trajectories_replay.npz'),
+                        help="결과 저장소 (기본: data/rallies/trajectories_replay.npz)")
+    parser.add_argument('--backend', default=None, help="모든 랠리 추적기 (기본: 기록된 추적기)")
+    parser.add_argument('--workers', type=int, default=None, help="프로세스 수 (기본: 코어 수)")
+    parser.add_argument('--rallies', type=int, nargs='*', default=None, help="이 랠리만")
+    parser.add_argument('--full-frame', action='store_true', help="창 crop 없이 전체 프레임 추적")
+    parser.add_argument('--no-redetect', action='store_true', help="놓쳐도 재검출 안 함")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.session):
+        print(f"✗ 세션 파일 없음: {args.session}")
+        return 1
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        print(f"✗ 영상 열기 실패: {args.video}")
+        return 1
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    cap.release()
+
+    print(f"랠리 재추적: {args.session} → {args.output}")
+    results, elapsed = replay_session(args.video, args.session, args.output, backend=args.backend,
+                                      workers=args.workers, window=not args.full_frame,
+                                      redetect=not args.no_redetect, rally_ids=args.rallies)
+    print_replay_summary(results, elapsed, fps)
+    print(f"✓ 저장: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import cv2
+import numpy as np
+import time
+
+from ball_pipeline import DEFAULT_PARAMS
+from candidates import extract_candidates
+
+class Redetector:
+    """
+    추적기를 놓쳤을 때 마지막 위치 주변 창에서만 공 재검출 → 재초기화할 bbox
+
+    공 검출 파이프라인과 같은 후보 필터 (면적 / 종횡비 / 원형도 / 선수 제거)를
+    움직임 마스크에 쓰되, 전체 ROI 대신 예측 위치 주변 창만 본다.
+    창 안 배경 모델을 따로 유지할 수 없으므로 움직임 마스크는 링 버퍼의 직전 2프레임으로:
+
+        mask(t) = (|f(t) - f(t-1)| > T) AND (|f(t) - f(t-2)| > T)
+
+    ThreeFrameDiff와 달리 가운데가 아니라 현재 프레임 기준이라 지연이 없다
+    (이전 위치 잔상은 한쪽 차분에만 나타나서 빠진다).
+
+    - 창 중심: 마지막 확인된 위치 + 속도 × 놓친 프레임 수
+    - 창 크기: base_half + (속도 + growth) × 놓친 프레임 수 (max_half까지)
+    - 후보 선택: 원형도 / (예측 위치까지 거리 + 1) 최대
+    - max_lost 프레임 넘게 못 찾으면 포기 (공이 화면 밖 / 랠리 끝 - R로 다시 선택)
+
+    기본은 추적기가 실패를 알린 프레임만 재검출한다.
+    confirm_frames를 주면 성공한 update도 확인한다: CSRT는 공이 맞거나 튀어서 갑자기
+    방향이 바뀌면 실패를 알리지 않고 선수 / 배경에 붙어 가는 경우가 많아서, bbox 주변 작은
+    창에서 같은 후보 검출을 돌려 공 후보가 confirm_frames 프레임 연속 없으면 놓친 것으로 본다.
+    움직임 후보만 보므로 멈춰 있거나 느린 공은 성공이어도 놓친 것이 될 수 있다 (그래서 기본 꺼짐).
+
+    Args:
+        params: DEFAULT_PARAMS 덮어쓸 값 (후보 필터)
+        threshold: 차분 임계값 (밝기)
+        base_half: 창 절반 최소 크기 (픽셀)
+        growth: 놓친 프레임마다 창 절반에 더할 크기 (픽셀)
+        max_half: 창 절반 최대 크기 (픽셀)
+        max_lost: 연속으로 놓친 프레임이 이보다 많으면 재검출 안 함
+        confirm_frames: bbox에 공 후보가 이 프레임 수 연속 없으면 놓친 것으로 봄 (0 = 확인 안 함, 기본)
+        confirm_margin: 확인 창 여유 (bbox 바깥쪽 픽셀)
+    """
+    def __init__(self, params=None, threshold=25, base_half=80, growth=12, max_half=320,
+                 max_lost=45, confirm_frames=0, confirm_margin=32):
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.threshold = threshold
+        self.base_half = base_half
+        self.growth = growth
+        self.max_half = max_half
+        self.max_lost = max_lost
+        self.confirm_frames = confirm_frames
+        self.confirm_margin = confirm_margin
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        self.center = None         # 마지막 확인된 bbox 중심
+        self.size = None           # 마지막 확인된 bbox 크기 (w, h)
+        self.velocity = (0.0, 0.0)
+        self.lost = 0              # 마지막 확인 후 지난 프레임 수
+        self.unconfirmed = 0       # bbox에 공 후보가 없는 연속 프레임 수
+
+        # 통계
+        self.checks = 0
+        self.check_time = 0.0
+        self.drifts = 0
+        self.attempts = 0
+        self.recovered = 0
+        self.gave_up = 0
+        self.search_time = 0.0
+        self.window_pixels = 0
+
+    def start(self, bbox):
+        """추적 시작 (R로 고른 bbox)"""
+        x, y, w, h = [float(v) for v in bbox]
+        self.center = (x + w / 2.0, y + h / 2.0)
+        self.size = (w, h)
+        self.velocity = (0.0, 0.0)
+        self.lost = 0
+        self.unconfirmed = 0
+
+    def observe(self, confirmed, bbox):
+        """
+        프레임 결과 알림 - 확인된 bbox (공 후보가 있거나 재검출로 찾은 것)만 예측에 씀
+        """
+        if self.center is None:
+            return
+        if not confirmed:
+            self.lost += 1
+            if self.lost == self.max_lost + 1:
+                self.gave_up += 1
+            return
+        x, y, w, h = [float(v) for v in bbox]
+        center = (x + w / 2.0, y + h / 2.0)
+        steps = self.lost + 1
+        vx = (center[0] - self.center[0]) / steps
+        vy = (center[1] - self.center[1]) / steps
+        self.velocity = (0.5 * self.velocity[0] + 0.5 * vx, 0.5 * self.velocity[1] + 0.5 * vy)
+        self.center = center
+        self.size = (w, h)
+        self.lost = 0
+
+    def predicted(self):
+        """지금 프레임의 예측 공 중심"""
+        steps = self.lost + 1
+        return (self.center[0] + self.velocity[0] * steps,
+                self.center[1] + self.velocity[1] * steps)
+
+    def window(self, frame_shape):
+        """
+        재검출 창 (x1, y1, x2, y2) - 프레임 안으로 자름 (프레임과 안 겹치면 None)
+        """
+        steps = self.lost + 1
+        cx, cy = self.predicted()
+        half_w = min(self.max_half, self.base_half + (abs(self.velocity[0]) + self.growth) * steps)
+        half_h = min(self.max_half, self.base_half + (abs(self.velocity[1]) + self.growth) * steps)
+        return self._clip(frame_shape, cx - half_w, cy - half_h, cx + half_w, cy + half_h)
+
+    @staticmethod
+    def _clip(frame_shape, x1, y1, x2, y2):
+        height, width = frame_shape[:2]
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(width, int(x2)), min(height, int(y2))
+        if x1 >= x2 or y1 >= y2:
+            return None
+        return x1, y1, x2, y2
+
+    def _candidates(self, frames, window):
+        """창 안 현재 프레임 공 후보 (frames = f(t), f(t-1), f(t-2), 프레임 좌표)"""
+        x1, y1, x2, y2 = window
+        grays = [cv2.cvtColor(f[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY) for f in frames]
+        diff_a = cv2.absdiff(grays[0], grays[1])
+        diff_b = cv2.absdiff(grays[0], grays[2])
+        mask = cv2.bitwise_and(
+            cv2.threshold(diff_a, self.threshold, 255, cv2.THRESH_BINARY)[1],
+            cv2.threshold(diff_b, self.threshold, 255, cv2.THRESH_BINARY)[1])
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel)
+
+        p = self.params
+        candidates, _ = extract_candidates(
+            mask, min_area=p['min_area'], max_area=p['max_area'],
+            min_aspect=p['min_aspect'], max_aspect=p['max_aspect'],
+            min_circularity=p['min_circularity'], player_min_area=p['player_min_area'],
+            player_margin=p['player_margin'], offset=(x1, y1))
+        return candidates
+
+    def confirm(self, frame, previous, older, bbox):
+        """
+        추적기가 성공이라고 한 bbox에 공 후보가 있는지
+
+        Returns:
+            (confirmed, drifted) - drifted면 confirm_frames 프레임 연속 후보 없음 → 놓친 것으로 처리
+        """
+        if not self.confirm_frames or previous is None or older is None:
+            return True, False
+        t0 = time.perf_counter()
+        x, y, w, h = [float(v) for v in bbox]
+        m = self.confirm_margin
+        window = self._clip(frame.shape, x - m, y - m, x + w + m, y + h + m)
+        found = False
+        if window is not None:
+            candidates = self._candidates((frame, previous, older), window)
+            if len(candidates):
+                reach = max(w, h)
+                distance = np.hypot(candidates['cx'] - (x + w / 2.0),
+                                    candidates['cy'] - (y + h / 2.0))
+                found = bool((distance <= reach).any())
+        self.checks += 1
+        self.check_time += time.perf_counter() - t0
+
+        self.unconfirmed = 0 if found else self.unconfirmed + 1
+        if self.unconfirmed == self.confirm_frames:
+            self.drifts += 1
+        return found, self.unconfirmed >= self.confirm_frames
+
+    def search(self, frame, previous, older):
+        """
+        놓친 프레임에서 공 재검출
+
+        Args:
+            frame: 현재 프레임 f(t)
+            previous, older: 직전 프레임 f(t-1), f(t-2) (링 버퍼, 없으면 None)
+
+        Returns:
+            재초기화할 bbox (x, y, w, h) - 후보 중심, 크기는 마지막 확인된 bbox (못 찾으면 None)
+        """
+        if (self.center is None or self.lost >= self.max_lost
+                or previous is None or older is None):
+            return None
+        window = self.window(frame.shape)
+        if window is None:
+            return None
+
+        t0 = time.perf_counter()
+        self.attempts += 1
+        x1, y1, x2, y2 = window
+        self.window_pixels += (x2 - x1) * (y2 - y1)
+        candidates = self._candidates((frame, previous, older), window)
+
+        bbox = None
+        if len(candidates):
+            px, py = self.predicted()
+            distance = np.hypot(candidates['cx'] - px, candidates['cy'] - py)
+            best = candidates[np.argmax(candidates['circularity'] / (distance + 1.0))]
+            # 크기는 그대로 (CSRT는 템플릿 크기에 따라 update 시간이 몇 배씩 달라짐)
+            w, h = self.size
+            bbox = (int(round(best['cx'] - w / 2.0)), int(round(best['cy'] - h / 2.0)),
+                    int(round(w)), int(round(h)))
+            self.recovered += 1
+            self.unconfirmed = 0
+
+        self.search_time += time.perf_counter() - t0
+        return bbox
+
+    def print_stats(self):
+        """확인 / 재검출 시도 / 복구 / 시간"""
+        if self.checks:
+            print(f"공 확인: {self.checks} 프레임 | {self.check_time/self.checks*1000:.2f} ms/프레임 | "
+                  f"놓침 감지 {self.drifts}번")
+        if self.attempts:
+            print(f"재검출: {self.attempts}번 시도 | 복구 {self.recovered} | 포기 {self.gave_up} | "
+                  f"{self.search_time/self.attempts*1000:.1f} ms/시도 | "
+                  f"창 평균 {self.window_pixels/self.attempts/1000:.0f}K 픽셀")
+
+def update_with_recovery(tracker, redetector, frame, previous=None, older=None):
+    """
+    tracker.update - 실패하면 주변 창 재검출로 재초기화
+    (redetector.confirm_frames를 켜면 bbox에 공 후보가 계속 없는 성공도 실패로 봄)
+
+    Args:
+        tracker: init / update 추적기 (SwitchingTracker면 reinit으로 지금 추적기 유지)
+        redetector: Redetector (None이면 재검출 안 함)
+        frame: 현재 프레임
+        previous, older: 직전 2프레임 (링 버퍼에서, 없으면 재검출 안 함)
+
+    Returns:
+        (success, bbox, method) - method는 궤적 행에 기록할 추적 방법
+        (재검출로 찾은 프레임은 'redetect')
+    """
+    success, bbox = tracker.update(frame)
+    method = getattr(tracker, 'backend', 'csrt')
+    if redetector is None:
+        return success, bbox, method
+
+    confirmed = False
+    if success:
+        confirmed, drifted = redetector.confirm(frame, previous, older, bbox)
+        success = not drifted
+    if not success:
+        found = redetector.search(frame, previous, older)
+        if found is not None:
+            getattr(tracker, 'reinit', tracker.init)(frame, found)
+            success, bbox, method = True, found, 'redetect'
+            confirmed = True
+    redetector.observe(confirmed, bbox)
+    return success, bbox, method
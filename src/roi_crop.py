@@ -0,0 +1,76 @@
+import numpy as np
+
+def get_court_roi_mask(frame_shape):
+    """
+    코트 ROI 마스크 + 사각형 (x1, y1, x2, y2)
+    """
+    height, width = frame_shape[:2]
+    mask = np.zeros((height, width), dtype=np.uint8)
+
+    y1 = int(height * 0.10)
+    y2 = int(height * 0.90)
+    x1 = int(width * 0.20)
+    x2 = int(width * 0.80)
+
+    mask[y1:y2, x1:x2] = 255
+    return mask, (x1, y1, x2, y2)
+
+def crop_to_roi(image, roi_coords):
+    """
+    ROI 사각형만 잘라낸 뷰 (복사 없음)
+
+    bitwise_and로 전체 프레임을 마스킹하는 대신
+    ROI 영역만 KNN / 모폴로지 / 윤곽선에 넘기기 위해 사용.
+    결과는 원본과 메모리를 공유하므로 수정하면 원본도 바뀐다.
+
+    Args:
+        image: 프레임 또는 마스크
+        roi_coords: (x1, y1, x2, y2) - get_court_roi_mask()의 두 번째 반환값
+    """
+    x1, y1, x2, y2 = roi_coords
+    return image[y1:y2, x1:x2]
+
+def paste_to_frame(crop, roi_coords, frame_shape):
+    """
+    ROI 크기 마스크를 전체 프레임 크기로 (시각화/저장용)
+    """
+    x1, y1, x2, y2 = roi_coords
+    full = np.zeros(frame_shape[:2], dtype=crop.dtype)
+    full[y1:y2, x1:x2] = crop
+    return full
+
+def get_net_band(frame_shape):
+    """
+    네트 제외 구간 (행 범위): 화면 45% 지점 ± 5%
+    """
+    height = frame_shape[0]
+    net_y_center = int(height * 0.45)
+    net_thickness = int(height * 0.05)
+    return net_y_center - net_thickness, net_y_center + net_thickness
+
+def exclude_net_band(mask, frame_shape, roi_coords=None):
+    """
+    네트 구간을 0으로 (슬라이스 대입, 제자리 수정)
+
+    Args:
+        mask: 전경 마스크 (전체 프레임 또는 ROI 크기)
+        frame_shape: 원본 프레임 shape
+        roi_coords: mask가 ROI 크기면 (x1, y1, x2, y2)
+    """
+    top, bottom = get_net_band(frame_shape)
+    if roi_coords is not None:
+        # 프레임 좌표 → ROI 좌표
+        y1 = roi_coords[1]
+        top, bottom = top - y1, bottom - y1
+    mask[max(top, 0):max(bottom, 0), :] = 0
+    return mask
+
+def intersect_rect(a, b):
+    """
+    두 사각형 (x1, y1, x2, y2)의 교집합 (겹치지 않으면 None)
+    """
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
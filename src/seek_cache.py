@@ -0,0 +1,216 @@
+import cv2
+import numpy as np
+import os
+from collections import OrderedDict
+
+def index_path_for(video_path):
+    """영상 경로 → 키프레임 인덱스 경로 (영상 옆)"""
+    return os.path.splitext(video_path)[0] + '_keyframes.npz'
+
+def scan_keyframes(video_path):
+    """
+    키프레임 위치 스캔 (디코딩 없이 패킷만 읽음)
+
+    FFmpeg 백엔드 raw 모드(CAP_PROP_FORMAT=-1)에서 grab()은 압축 패킷만 꺼내고
+    CAP_PROP_LRF_HAS_KEY_FRAME으로 키프레임 여부를 알려준다.
+
+    Returns:
+        (keyframes, frame_count) - 키프레임 번호 배열, 실제 프레임 수
+        raw 모드를 지원하지 않으면 (None, 0)
+    """
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+        cap.release()
+        return None, 0
+
+    keyframes = []
+    index = 0
+    while cap.grab():
+        if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(index)
+        index += 1
+    cap.release()
+
+    if not keyframes:
+        return None, index
+    return np.array(keyframes, dtype=np.int64), index
+
+def load_keyframe_index(video_path, rebuild=False):
+    """
+    키프레임 인덱스 (영상마다 1번 스캔 후 영상 옆에 저장)
+
+    영상 크기 / 수정 시각이 바뀌면 다시 스캔한다.
+
+    Returns:
+        (keyframes, frame_count) - scan_keyframes()와 같음
+    """
+    stat = os.stat(video_path)
+    path = index_path_for(video_path)
+
+    if not rebuild and os.path.exists(path):
+        with np.load(path) as data:
+            if int(data['size']) == stat.st_size and int(data['mtime']) == int(stat.st_mtime):
+                keyframes = data['keyframes']
+                return (keyframes if len(keyframes) else None), int(data['frame_count'])
+
+    keyframes, frame_count = scan_keyframes(video_path)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, keyframes=keyframes if keyframes is not None else np.empty(0, np.int64),
+                 frame_count=frame_count, size=stat.st_size, mtime=int(stat.st_mtime))
+    os.replace(tmp_path, path)
+    return keyframes, frame_count
+
+class SeekableCapture:
+    """
+    키프레임 인덱스 + LRU 프레임 캐시를 쓰는 VideoCapture
+
+    set(CAP_PROP_POS_FRAMES)는 위치만 기록하고, 실제 디코더 이동은 다음 read()에서:
+        1. 캐시에 있으면 디코딩 없이 복사
+        2. 디코더가 같은 GOP 안 뒤쪽에 있으면 grab()으로 앞으로만 이동
+        3. 아니면 목표 직전 키프레임으로 이동 후 grab()으로 앞으로
+    read()한 프레임은 LRU 캐시에 남기므로 ← 10프레임 같은 짧은 뒤로 가기는 디코딩이 없다.
+
+    cv2.VideoCapture 대신 FrameReader에 넣어 쓸 수 있다
+    (FrameReader(SeekableCapture(path))).
+
+    Args:
+        video_path: 영상 경로
+        cache_size: 캐시할 프레임 수 (0이면 캐시 안 함)
+        keep_behind: 앞으로 grab()하며 건너뛸 때 목표 직전 몇 프레임은 디코딩해서 캐시
+    """
+    def __init__(self, video_path, cache_size=64, keep_behind=10):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        self.cache_size = cache_size
+        self.keep_behind = keep_behind if cache_size > 0 else 0
+
+        self.keyframes, self.frame_count = (None, 0)
+        if self.cap.isOpened():
+            self.keyframes, self.frame_count = load_keyframe_index(video_path)
+        if not self.frame_count:
+            self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self._cache = OrderedDict()
+        self._pos = 0           # 다음 read() 프레임 번호
+        self._decoder_pos = 0   # 실제 디코더의 다음 프레임 번호
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+        self.seeks = 0
+        self.grabbed = 0
+
+    def keyframe_before(self, index):
+        """index 이하의 가장 가까운 키프레임 (인덱스 없으면 index 그대로)"""
+        if self.keyframes is None:
+            return index
+        k = np.searchsorted(self.keyframes, index, side='right') - 1
+        return int(self.keyframes[max(k, 0)])
+
+    def _cache_put(self, index, frame):
+        if self.cache_size <= 0:
+            return
+        self._cache[index] = frame.copy()
+        self._cache.move_to_end(index)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _move_decoder(self, target):
+        """디코더를 target 바로 앞까지 이동 (grab만, 마지막 keep_behind개는 캐시)"""
+        if not (self.keyframe_before(target) <= self._decoder_pos <= target):
+            start = self.keyframe_before(target)
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self._decoder_pos = start
+            self.seeks += 1
+
+        while self._decoder_pos < target:
+            if not self.cap.grab():
+                return False
+            if target - self._decoder_pos <= self.keep_behind \
+                    and self._decoder_pos not in self._cache:
+                ret, frame = self.cap.retrieve()
+                if ret:
+                    self._cache_put(self._decoder_pos, frame)
+            self._decoder_pos += 1
+            self.grabbed += 1
+        return True
+
+    def read(self, image=None):
+        """
+        VideoCapture.read() 호환 (image 버퍼를 주면 거기에 채움)
+        """
+        index = self._pos
+        cached = self._cache.get(index)
+        if cached is not None:
+            self._cache.move_to_end(index)
+            self.hits += 1
+            self._pos += 1
+            if image is not None and image.shape == cached.shape:
+                np.copyto(image, cached)
+                return True, image
+            return True, cached.copy()
+
+        self.misses += 1
+        if self._decoder_pos != index and not self._move_decoder(index):
+            return False, None
+
+        ret, frame = self.cap.read(image) if image is not None else self.cap.read()
+        if not ret:
+            return False, None
+        self._cache_put(index, frame)
+        self._decoder_pos = index + 1
+        self._pos = index + 1
+        return True, frame
+
+    def read_at(self, index):
+        """
+        특정 프레임 1장 (임의 접근)
+
+        Returns:
+            (ret, frame)
+        """
+        self._pos = int(index)
+        return self.read()
+
+    def grab(self):
+        """다음 프레임 건너뛰기 (VideoCapture.grab() 호환)"""
+        if self._pos in self._cache:
+            self._pos += 1
+            return True
+        if self._decoder_pos != self._pos and not self._move_decoder(self._pos):
+            return False
+        if not self.cap.grab():
+            return False
+        self._pos += 1
+        self._decoder_pos = self._pos
+        return True
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        return self.cap.get(prop_id)
+
+    def set(self, prop_id, value):
+        """CAP_PROP_POS_FRAMES는 위치만 기록 (실제 이동은 다음 read()에서)"""
+        if prop_id != cv2.CAP_PROP_POS_FRAMES:
+            return self.cap.set(prop_id, value)
+        self._pos = max(0, int(value))
+        return True
+
+    def release(self):
+        self._cache.clear()
+        self.cap.release()
+
+    def print_stats(self):
+        """캐시 / 이동 통계 출력"""
+        total = max(self.hits + self.misses, 1)
+        gop = "없음" if self.keyframes is None else f"{len(self.keyframes)}개"
+        print(f"탐색 캐시: 적중 {self.hits} ({self.hits/total*100:.0f}%) | "
+              f"키프레임 이동 {self.seeks} | grab {self.grabbed} | 키프레임 {gop}")
@@ -0,0 +1,203 @@
+import cv2
+import os
+import time
+from multiprocessing import Pool
+
+from frame_reader import FrameReader
+from ball_pipeline import BallPipeline, trajectory_point
+from trajectory_store import TrajectoryStore, ball_rows
+from proxy_video import proxy_scale
+
+def split_shards(start_frame, end_frame, num_shards):
+    """
+    [start_frame, end_frame) 구간을 num_shards개로 균등 분할
+
+    Returns:
+        [(start, end), ...]
+    """
+    total = end_frame - start_frame
+    num_shards = max(1, min(num_shards, total))
+    bounds = [start_frame + total * k // num_shards for k in range(num_shards + 1)]
+    return [(bounds[k], bounds[k + 1]) for k in range(num_shards)]
+
+def run_shard(task):
+    """
+    샤드 1개 처리 (워커 프로세스)
+
+    start - overlap 위치로 이동해서 overlap 구간으로 배경 모델을 학습하고,
+    마지막 track_overlap 프레임은 추적까지 돌려 칼만 상태도 이어 받은 뒤
+    [start, end) 구간의 궤적만 돌려준다.
+
+    Args:
+        task: dict - video_path, start, end, overlap, track_overlap, params, scale, motion
+
+    Returns:
+        dict - start, end, frames, trajectory, elapsed
+        (frames = [start, end)에서 실제로 읽은 프레임 수 - 영상이 FRAME_COUNT보다 짧으면 적음)
+    """
+    t0 = time.perf_counter()
+
+    # 워커끼리 코어를 나눠 쓰므로 OpenCV 내부 스레드는 1개
+    cv2.setNumThreads(1)
+
+    start, end = task['start'], task['end']
+    warm_start = max(0, start - task['overlap'])
+    track_start = max(warm_start, start - task['track_overlap'])
+
+    cap = FrameReader(task['video_path'], start_frame=warm_start)
+    trajectory = []
+    pipeline = None
+    frames = 0
+
+    # diff3는 결과가 delay 프레임 늦으므로 end + delay까지 읽어야 [start, end)가 다 채워짐
+    frame_index, stop = warm_start, end
+    while frame_index < stop:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if pipeline is None:
+            pipeline = BallPipeline(frame.shape, params=task.get('params'),
+                                    scale=task.get('scale', 1.0),
+                                    motion=task.get('motion', 'knn'))
+            stop = end + pipeline.delay
+
+        # 워밍업 구간: 배경 학습만
+        if frame_index < track_start:
+            pipeline.learn(frame)
+            frame_index += 1
+            continue
+
+        result = pipeline.process(frame)
+        frames += start <= frame_index < end
+
+        # ⭐ 결과가 나타내는 프레임 번호 (겹치는 구간 결과는 앞 샤드 담당)
+        labeled = frame_index - pipeline.delay
+        if start <= labeled < end and result['ball'] is not None:
+            trajectory.append(trajectory_point(labeled, result['ball'], pipeline.scale))
+        frame_index += 1
+
+    cap.release()
+
+    return {
+        'start': start,
+        'end': end,
+        'frames': frames,
+        'trajectory': trajectory,
+        'elapsed': time.perf_counter() - t0,
+    }
+
+def stitch_shards(results):
+    """샤드별 궤적을 프레임 순서로 합치기 (중복 프레임은 앞 샤드 우선)"""
+    trajectory = []
+    last_frame = -1
+    for result in sorted(results, key=lambda r: r['start']):
+        for point in result['trajectory']:
+            if point['frame'] > last_frame:
+                trajectory.append(point)
+                last_frame = point['frame']
+    return trajectory
+
+def run_sharded(video_path, start_frame, end_frame, workers=None, overlap=300,
+                track_overlap=30, params=None, motion='knn'):
+    """
+    영상 구간을 프레임 범위 샤드로 나눠 프로세스 풀에서 병렬 처리
+
+    프록시 영상 (build_proxy)을 주면 축소 해상도로 처리하고 좌표는 원본 해상도로 돌려준다.
+
+    Args:
+        video_path: 영상 경로 (원본 또는 프록시)
+        start_frame, end_frame: 분석 구간 [start_frame, end_frame)
+        workers: 프로세스 수 (기본: CPU 코어 수)
+        overlap: 샤드마다 배경 학습에 쓰는 앞쪽 겹침 프레임 수
+        track_overlap: 겹침 중 추적까지 돌리는 프레임 수 (칼만 상태 워밍업)
+        params: BallPipeline 파라미터
+        motion: 움직임 마스크 엔진 ('knn', 'mog2', 'diff3')
+
+    Returns:
+        (trajectory, elapsed, shard_results)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    scale = proxy_scale(video_path)
+
+    tasks = [{
+        'video_path': video_path,
+        'start': start,
+        'end': end,
+        'overlap': overlap,
+        'track_overlap': track_overlap,
+        'params': params,
+        'scale': scale,
+        'motion': motion,
+    } for start, end in split_shards(start_frame, end_frame, workers)]
+
+    t0 = time.perf_counter()
+    if len(tasks) == 1:
+        results = [run_shard(tasks[0])]
+    else:
+        with Pool(processes=len(tasks)) as pool:
+            results = pool.map(run_shard, tasks)
+    elapsed = time.perf_counter() - t0
+
+    return stitch_shards(results), elapsed, results
+
+def compare_with_single(video_path, start_frame, end_frame, workers=None, overlap=300):
+    """
+    단일 프로세스 vs 샤드 병렬 속도 비교 (같은 머신, 같은 구간)
+    """
+    print("샤드 병렬 공 추적")
+    print("=" * 50)
+    print(f"구간: {start_frame} ~ {end_frame} ({end_frame - start_frame} 프레임)")
+    print(f"워커: {workers or os.cpu_count()} | 겹침: {overlap} 프레임")
+    print("=" * 50)
+
+    print("\n단일 프로세스 실행 중...")
+    single, single_time, _ = run_sharded(video_path, start_frame, end_frame,
+                                         workers=1, overlap=overlap)
+
+    print("샤드 병렬 실행 중...")
+    sharded, sharded_time, results = run_sharded(video_path, start_frame, end_frame,
+                                                 workers=workers, overlap=overlap)
+
+    num_frames = end_frame - start_frame
+    print("\n" + "=" * 50)
+    print("결과")
+    print("=" * 50)
+    for r in results:
+        print(f"  샤드 {r['start']:6d} ~ {r['end']:6d}: "
+              f"{len(r['trajectory']):5d} 검출 ({r['elapsed']:.1f}s)")
+    print("-" * 50)
+    print(f"단일: {single_time:.1f}s ({num_frames/single_time:.1f} fps) | 검출 {len(single)}")
+    print(f"병렬: {sharded_time:.1f}s ({num_frames/sharded_time:.1f} fps) | 검출 {len(sharded)}")
+    print(f"속도 향상: {single_time/sharded_time:.2f}x")
+    print("=" * 50)
+
+    return sharded
+
+def save_trajectory(trajectory, path):
+    """궤적 저장 (test_ball_tracking_v3와 같은 컬럼 저장소)"""
+    store = TrajectoryStore(path)
+    store.append_rows(ball_rows(trajectory))
+    store.flush()
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    video_path = os.path.join(project_root, 'data', 'tennis_sample_1.mp4')
+
+    if not os.path.exists(video_path):
+        print(f"✗ 영상 없음: {video_path}")
+    else:
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        trajectory = compare_with_single(video_path, 0, total_frames)
+
+        output_dir = os.path.join(project_root, 'data', 'ball_tracking_sharded')
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        store_path = os.path.join(output_dir, 'ball_trajectory.npz')
+        save_trajectory(trajectory, store_path)
+        print(f"✓ 궤적: {store_path}")
@@ -0,0 +1,156 @@
+import numpy as np
+import time
+from contextlib import nullcontext
+
+# 비활성 타이머가 돌려주는 빈 컨텍스트 (매번 새로 만들지 않음)
+_NULL_STAGE = nullcontext()
+
+class _Stage:
+    """with 블록 1개 시간 측정"""
+    __slots__ = ('timer', 'name', 't0')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        now = time.perf_counter()
+        self.timer.add(self.name, now - self.t0)
+        self.timer._last = now
+        return False
+
+class StageTimer:
+    """
+    프레임별 단계 시간 측정 (decode, KNN, 모폴로지, 후보 필터링, 그리기, 저장 ...)
+
+    사용:
+        timer = StageTimer(enabled=profile)
+        for i in range(num_frames):
+            timer.next_frame(i)
+            with timer.stage('decode'):
+                ret, frame = cap.read()
+        timer.print_stats()
+        timer.dump_timeline('timeline.csv')
+
+    들여쓰기를 바꾸기 어려운 긴 루프는 lap()으로 구간 끝마다 찍어도 된다:
+        timer.next_frame(i)
+        ret, frame = cap.read()
+        timer.lap('decode')      # next_frame 이후 ~ 여기
+        fg_mask = bg.apply(frame)
+        timer.lap('knn')         # 직전 lap 이후 ~ 여기
+
+    enabled=False면 stage()가 미리 만들어 둔 빈 컨텍스트를 돌려주고
+    아무것도 기록하지 않는다 (perf_counter 호출도 없음).
+
+    Args:
+        enabled: False면 측정 안 함
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []       # 처음 등장한 순서
+        self.frames = []       # 프레임 번호
+        self.timeline = []     # 프레임별 {단계: 초}
+        self._current = None
+        self._last = 0.0
+
+    def next_frame(self, frame_index):
+        """새 프레임 시작 (이후 stage 시간은 이 프레임에 기록)"""
+        if not self.enabled:
+            return
+        self._current = {}
+        self.frames.append(frame_index)
+        self.timeline.append(self._current)
+        self._last = time.perf_counter()
+
+    def stage(self, name):
+        """
+        단계 시간 측정 컨텍스트
+
+        같은 프레임에서 같은 단계가 여러 번 나오면 합산한다.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def lap(self, name):
+        """직전 lap (또는 next_frame) 이후 시간을 name 단계로 기록"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.add(name, now - self._last)
+        self._last = now
+
+    def timed(self, name):
+        """
+        함수 데코레이터 버전
+
+            @timer.timed('select')
+            def select(...): ...
+        """
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add(self, name, seconds):
+        """측정값 직접 기록 (next_frame 전이면 무시)"""
+        if self._current is None:
+            return
+        if name not in self.stages:
+            self.stages.append(name)
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def durations(self, name):
+        """단계 1개의 프레임별 시간 (ms, 그 단계가 없던 프레임은 제외)"""
+        return np.array([f[name] * 1000 for f in self.timeline if name in f])
+
+    def summary(self):
+        """
+        단계별 통계 (ms)
+
+        Returns:
+            {단계: {'count', 'total', 'mean', 'p50', 'p95', 'max'}} - 등장 순서
+        """
+        result = {}
+        for name in self.stages:
+            d = self.durations(name)
+            result[name] = {
+                'count': len(d),
+                'total': float(d.sum()),
+                'mean': float(d.mean()),
+                'p50': float(np.percentile(d, 50)),
+                'p95': float(np.percentile(d, 95)),
+                'max': float(d.max()),
+            }
+        return result
+
+    def print_stats(self):
+        """단계별 p50 / p95 / max 표"""
+        if not self.enabled:
+            return
+        summary = self.summary()
+        if not summary:
+            print("단계 시간: 기록 없음")
+            return
+
+        grand_total = sum(s['total'] for s in summary.values())
+        print(f"단계 시간 ({len(self.frames)} 프레임, ms):")
+        print(f"  {'단계':<14s} {'p50':>7s} {'p95':>7s} {'max':>7s} {'비중':>6s}")
+        for name, s in summary.items():
+            share = s['total'] / grand_total * 100 if grand_total > 0 else 0.0
+            print(f"  {name:<14s} {s['p50']:7.2f} {s['p95']:7.2f} {s['max']:7.2f} {share:5.1f}%")
+
+    def dump_timeline(self, path):
+        """프레임별 타임라인 CSV (frame, 단계1_ms, 단계2_ms, ...)"""
+        with open(path, 'w') as f:
+            f.write(",".join(['frame'] + [f"{name}_ms" for name in self.stages]) + "\n")
+            for frame_index, times in zip(self.frames, self.timeline):
+                values = [f"{times[name] * 1000:.3f}" if name in times else ""
+                          for name in self.stages]
+                f.write(",".join([str(frame_index)] + values) + "\n")
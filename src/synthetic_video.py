@@ -0,0 +1,222 @@
+import cv2
+import numpy as np
+import os
+
+# 코트 배치 (화면 비율) - get_court_roi_mask(), get_net_band()와 맞춤
+FAR_BASELINE = 0.20       # 먼 쪽 베이스라인 y
+NEAR_BASELINE = 0.80      # 가까운 쪽 베이스라인 y
+NET_Y = 0.45              # 네트 y (get_net_band 중심)
+FAR_HALF_WIDTH = 0.14     # 먼 쪽 코트 절반 폭 (원근)
+NEAR_HALF_WIDTH = 0.22    # 가까운 쪽 코트 절반 폭
+
+COURT_COLOR = (95, 130, 60)      # 하드 코트 (BGR)
+SURROUND_COLOR = (70, 95, 45)
+LINE_COLOR = (235, 235, 235)
+BALL_COLOR = (40, 235, 225)      # 형광 노랑
+PLAYER1_COLOR = (40, 40, 150)    # 가까운 쪽
+PLAYER2_COLOR = (150, 60, 40)    # 먼 쪽
+
+def _court_x(frame_shape, y_ratio, u):
+    """
+    코트 위 좌우 위치 u (-1 ~ 1) → 화면 x (원근 사다리꼴)
+    """
+    height, width = frame_shape[:2]
+    t = (y_ratio - FAR_BASELINE) / (NEAR_BASELINE - FAR_BASELINE)
+    half = FAR_HALF_WIDTH + (NEAR_HALF_WIDTH - FAR_HALF_WIDTH) * t
+    return width * (0.5 + half * u)
+
+def draw_court(frame_shape, draw_net=True):
+    """
+    정지된 코트 배경 (라인 + 네트)
+    """
+    height, width = frame_shape[:2]
+    court = np.empty((height, width, 3), dtype=np.uint8)
+    court[:] = SURROUND_COLOR
+
+    def pt(y_ratio, u):
+        return int(_court_x(frame_shape, y_ratio, u)), int(height * y_ratio)
+
+    # 코트 면
+    margin = 1.25
+    surface = np.array([pt(FAR_BASELINE - 0.04, -margin), pt(FAR_BASELINE - 0.04, margin),
+                        pt(NEAR_BASELINE + 0.04, margin), pt(NEAR_BASELINE + 0.04, -margin)])
+    cv2.fillPoly(court, [surface], COURT_COLOR)
+
+    # 베이스라인 / 사이드라인 / 서비스라인 / 센터라인
+    thickness = max(1, height // 240)
+    cv2.polylines(court, [np.array([pt(FAR_BASELINE, -1), pt(FAR_BASELINE, 1),
+                                    pt(NEAR_BASELINE, 1), pt(NEAR_BASELINE, -1)])],
+                  True, LINE_COLOR, thickness)
+    for y_ratio in (0.29, 0.61):
+        cv2.line(court, pt(y_ratio, -1), pt(y_ratio, 1), LINE_COLOR, thickness)
+    cv2.line(court, pt(0.29, 0), pt(0.61, 0), LINE_COLOR, thickness)
+
+    if draw_net:
+        left, right = pt(NET_Y, -1.15), pt(NET_Y, 1.15)
+        cv2.line(court, left, right, (200, 200, 200), thickness * 2)
+        post = int(height * 0.04)
+        cv2.line(court, left, (left[0], left[1] - post), (60, 60, 60), thickness * 2)
+        cv2.line(court, right, (right[0], right[1] - post), (60, 60, 60), thickness * 2)
+
+    return court
+
+def _draw_player(frame, center, scale, color):
+    """선수 블롭 (몸통 타원 + 머리 + 다리)"""
+    cx, cy = int(center[0]), int(center[1])
+    body_w, body_h = int(14 * scale), int(28 * scale)
+    cv2.ellipse(frame, (cx, cy), (body_w, body_h), 0, 0, 360, color, -1)
+    cv2.circle(frame, (cx, cy - body_h - int(8 * scale)), int(9 * scale), (120, 150, 200), -1)
+    leg = int(22 * scale)
+    cv2.line(frame, (cx - body_w // 2, cy + body_h - 4), (cx - body_w // 2, cy + body_h + leg),
+             color, max(2, int(7 * scale)))
+    cv2.line(frame, (cx + body_w // 2, cy + body_h - 4), (cx + body_w // 2, cy + body_h + leg),
+             color, max(2, int(7 * scale)))
+
+def plan_rally(num_frames, rng, min_shot=26, max_shot=40):
+    """
+    샷 계획 (가까운 쪽 ↔ 먼 쪽 번갈아)
+
+    Returns:
+        [(start_frame, end_frame, u_from, u_to, from_near), ...]
+    """
+    shots = []
+    frame = 0
+    u = 0.0
+    from_near = True
+    while frame < num_frames:
+        length = int(rng.integers(min_shot, max_shot + 1))
+        u_to = float(rng.uniform(-0.85, 0.85))
+        shots.append((frame, frame + length, u, u_to, from_near))
+        frame += length
+        u = u_to
+        from_near = not from_near
+    return shots
+
+def generate_synthetic_video(output_path, num_frames=600, width=1280, height=720, fps=30,
+                             seed=0, noise=4.0, draw_net=True, ball_radius=None,
+                             arc_height=0.12):
+    """
+    합성 테니스 영상 + 정답 궤적 생성
+
+    정지된 코트, 베이스라인 근처를 움직이는 선수 블롭 2개,
+    선수 사이를 포물선으로 오가는 작은 노란 공. 카메라 노이즈는 선택.
+
+    Args:
+        output_path: .mp4 경로 (정답은 같은 이름의 _truth.npz)
+        num_frames: 프레임 수
+        width, height: 해상도
+        fps: 프레임 레이트
+        seed: 난수 시드 (같으면 같은 영상)
+        noise: 가우시안 노이즈 표준편차 (0이면 없음)
+        draw_net: 네트 그리기
+        ball_radius: 공 반지름 (None이면 height / 144)
+        arc_height: 샷 최고 높이 (화면 높이 비율)
+
+    Returns:
+        정답 .npz 경로
+    """
+    rng = np.random.default_rng(seed)
+    frame_shape = (height, width, 3)
+    if ball_radius is None:
+        ball_radius = max(2, int(round(height / 144)))
+
+    directory = os.path.dirname(output_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    court = draw_court(frame_shape, draw_net)
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"영상 저장 실패: {output_path}")
+
+    shots = plan_rally(num_frames, rng)
+    truth = {name: np.zeros(num_frames, dtype=np.int32) for name in
+             ('ball_x', 'ball_y', 'player1_x', 'player1_y', 'player2_x', 'player2_y')}
+    truth['ball_visible'] = np.zeros(num_frames, dtype=bool)
+
+    near_scale = height / 360
+    far_scale = near_scale * 0.65
+
+    # 노이즈 프레임 몇 장을 미리 만들어 돌려 씀 (매 프레임 randn은 느림)
+    noise_bank = []
+    if noise > 0:
+        for _ in range(8):
+            buf = np.empty(frame_shape, dtype=np.int16)
+            cv2.randn(buf, 0, noise)
+            noise_bank.append(buf)
+    frame_index = 0
+
+    for start, end, u_from, u_to, from_near in shots:
+        y_from = NEAR_BASELINE if from_near else FAR_BASELINE
+        y_to = FAR_BASELINE if from_near else NEAR_BASELINE
+        length = end - start
+
+        for t in range(length):
+            if frame_index >= num_frames:
+                break
+            s = t / length
+
+            # 공: 코트 위 위치는 직선, 높이는 포물선 (중력)
+            ground_y = y_from + (y_to - y_from) * s
+            ground_u = u_from + (u_to - u_from) * s
+            z = 4 * arc_height * s * (1 - s) + 0.05 * (1 - s)
+            bx = _court_x(frame_shape, ground_y, ground_u)
+            by = height * (ground_y - z)
+
+            # 선수: 치는 쪽은 친 자리에서 가운데로 복귀, 받는 쪽은 도착점으로 이동
+            hitter_u = u_from * (1 - s)
+            receiver_u = u_to * min(1.0, s * 1.4)
+            near_u, far_u = (hitter_u, receiver_u) if from_near else (receiver_u, hitter_u)
+            p1 = (_court_x(frame_shape, NEAR_BASELINE, near_u) + 0.03 * width * np.sign(near_u - 1e-3),
+                  height * (NEAR_BASELINE - 0.02))
+            p2 = (_court_x(frame_shape, FAR_BASELINE, far_u) + 0.02 * width * np.sign(far_u - 1e-3),
+                  height * (FAR_BASELINE - 0.06))
+
+            frame = court.copy()
+            _draw_player(frame, p2, far_scale, PLAYER2_COLOR)
+            _draw_player(frame, p1, near_scale, PLAYER1_COLOR)
+            cv2.circle(frame, (int(round(bx)), int(round(by))), ball_radius, BALL_COLOR, -1,
+                       cv2.LINE_AA)
+
+            if noise_bank:
+                frame = cv2.add(frame, noise_bank[rng.integers(len(noise_bank))], dtype=cv2.CV_8U)
+
+            writer.write(frame)
+
+            truth['ball_x'][frame_index] = int(round(bx))
+            truth['ball_y'][frame_index] = int(round(by))
+            truth['ball_visible'][frame_index] = 0 <= bx < width and 0 <= by < height
+            truth['player1_x'][frame_index], truth['player1_y'][frame_index] = p1
+            truth['player2_x'][frame_index], truth['player2_y'][frame_index] = p2
+            frame_index += 1
+
+    writer.release()
+
+    truth_path = truth_path_for(output_path)
+    np.savez_compressed(truth_path, frame=np.arange(num_frames, dtype=np.int32), fps=fps,
+                        width=width, height=height, seed=seed, **truth)
+    return truth_path
+
+def truth_path_for(video_path):
+    """영상 경로 → 정답 .npz 경로"""
+    return os.path.splitext(video_path)[0] + '_truth.npz'
+
+def load_ground_truth(path):
+    """
+    정답 읽기
+
+    Returns:
+        dict - frame, ball_x, ball_y, ball_visible, player1_x/y, player2_x/y (배열)
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    video_path = os.path.join(project_root, 'data', 'synthetic', 'synthetic_0.mp4')
+
+    print("합성 테니스 영상 생성 중...")
+    truth_path = generate_synthetic_video(video_path)
+    print(f"✓ 영상: {video_path}")
+    print(f"✓ 정답: {truth_path}")
@@ -0,0 +1,380 @@
+import cv2
+import numpy as np
+import os
+import time
+
+from tracker_window import WindowedTracker
+from ball_pipeline import BallPipeline
+from trajectory_store import load_trajectories
+
+# 선택 순서 (B 키 순환) - 이름은 trajectory_store.METHODS와 같음
+# 속도 / 정확도 순이 아님: 공 영상에서 MIL이 가장 느리고 (~160 ms) 일치율도 가장 낮음 (~8%)
+# → 실제 순위는 python src/tracker_factory.py 벤치마크로 확인
+TRACKER_BACKENDS = ['csrt', 'kcf', 'mil', 'mosse', 'detector']
+
+# OpenCV 추적기 클래스 이름
+_OPENCV_NAMES = {'csrt': 'TrackerCSRT', 'kcf': 'TrackerKCF', 'mil': 'TrackerMIL',
+                 'mosse': 'TrackerMOSSE'}
+
+def _opencv_constructor(name):
+    """
+    OpenCV 추적기 생성 함수 (버전 호환)
+
+    4.5.1 이상: cv2.TrackerX.create / 3.x ~ 4.5.0: cv2.TrackerX_create /
+    contrib legacy: cv2.legacy.TrackerX_create (MOSSE는 legacy에만 있음)
+
+    Returns:
+        인자 없는 생성 함수, 또는 None (이 빌드에 없음)
+    """
+    class_name = _OPENCV_NAMES[name]
+    tracker_class = getattr(cv2, class_name, None)
+    if tracker_class is not None and hasattr(tracker_class, 'create'):
+        return tracker_class.create
+    if hasattr(cv2, class_name + '_create'):
+        return getattr(cv2, class_name + '_create')
+    legacy = getattr(cv2, 'legacy', None)
+    if legacy is not None and hasattr(legacy, class_name + '_create'):
+        return getattr(legacy, class_name + '_create')
+    return None
+
+def available_backends():
+    """이 OpenCV 빌드에서 쓸 수 있는 추적기 (CSRT/KCF/MOSSE는 contrib 필요)"""
+    return [name for name in TRACKER_BACKENDS
+            if name == 'detector' or _opencv_constructor(name) is not None]
+
+class DetectorTracker:
+    """
+    검출기 기반 추적기 (외형 모델 없음, cv2 Tracker와 같은 init / update)
+
+    BallPipeline (3프레임 차분 + 후보 필터 + 칼만 게이팅)을 그대로 쓴다.
+    init의 bbox로 칼만을 초기화하고, 이후 프레임마다 움직임 마스크에서
+    예측 위치에 가까운 둥근 blob을 고른다. 차분 엔진은 배경 학습이 필요 없어서
+    랠리 중간에 바로 시작할 수 있다.
+
+    diff3 마스크는 한 프레임 늦으므로 (delay = 1) 현재 프레임 위치는
+    칼만 상태를 delay만큼 앞으로 민 값이다. 이번 프레임에 검출이 없으면 실패.
+
+    Args:
+        motion: 움직임 마스크 엔진 ('diff3' 기본 - KNN/MOG2는 배경 학습이 필요)
+        params: BallPipeline 파라미터
+    """
+    def __init__(self, motion='diff3', params=None):
+        self.motion = motion
+        self.params = params
+        self.pipeline = None
+        self.size = (0, 0)
+        self.bbox = (0, 0, 0, 0)
+
+    def init(self, frame, bbox):
+        """bbox 중심으로 칼만 초기화 (크기는 결과 bbox에 그대로 씀)"""
+        if self.pipeline is None or self.pipeline.frame_shape != frame.shape:
+            self.pipeline = BallPipeline(frame.shape, motion=self.motion, params=self.params)
+        pipeline = self.pipeline
+        x, y, w, h = [int(v) for v in bbox]
+        self.size = (w, h)
+        self.bbox = (x, y, w, h)
+        pipeline.kalman.init((x + w / 2.0, y + h / 2.0))
+        pipeline.last_ball_position = (x + w // 2, y + h // 2)
+        pipeline.bg_subtractor.apply(pipeline.prepare(frame))
+        return True
+
+    def update(self, frame):
+        """
+        Returns:
+            (success, bbox) - 이번 프레임에 검출이 있으면 success
+        """
+        pipeline = self.pipeline
+        result = pipeline.process(frame)
+        kalman = pipeline.kalman
+        if result['ball'] is None or not kalman.initialized:
+            return False, self.bbox
+
+        cx = kalman.x[0] + kalman.x[2] * pipeline.delay
+        cy = kalman.x[1] + kalman.x[3] * pipeline.delay
+        w, h = self.size
+        self.bbox = (int(round(cx - w / 2.0)), int(round(cy - h / 2.0)), w, h)
+        return True, self.bbox
+
+def create_tracker(name='csrt', window=False):
+    """
+    추적기 1개 (모두 init(frame, bbox) / update(frame) → (success, bbox))
+
+    Args:
+        name: TRACKER_BACKENDS 중 하나
+        window: True면 OpenCV 추적기를 WindowedTracker로 감쌈 (마지막 bbox 주변 창만 처리)
+    """
+    if name == 'detector':
+        return DetectorTracker()
+    if name not in _OPENCV_NAMES:
+        raise ValueError(f"알 수 없는 추적기: {name} (가능: {', '.join(TRACKER_BACKENDS)})")
+    constructor = _opencv_constructor(name)
+    if constructor is None:
+        raise ValueError(f"이 OpenCV 빌드에 {name} 없음 (opencv-contrib-python 필요, "
+                         f"가능: {', '.join(available_backends())})")
+    if window:
+        return WindowedTracker(create=constructor)
+    return constructor()
+
+class SwitchingTracker:
+    """
+    랠리별 추적기 선택 + 실시간보다 느려지면 더 빠른 추적기로 자동 전환
+
+    init()마다 preferred 추적기로 시작한다 (랠리마다 select()로 바꿀 수 있음).
+    auto=True면 (기본 꺼짐) update 시간의 지수 평균이 budget_ms를 patience 프레임 연속 넘을 때
+    backends에서 다음(더 빠른) 추적기로 바꾸고 현재 프레임 / bbox로 다시 초기화한다.
+    랠리 안에서는 느린 쪽으로 돌아가지 않는다.
+    지금까지 update 성공률이 min_success보다 낮은 추적기로는 전환하지 않는다
+    (patience 프레임 이상 써 본 추적기만 판단). MOSSE / MIL은 공을 거의 못 따라가서
+    기본 전환 순서에서 뺐다.
+
+    backend 속성이 지금 쓰는 추적기 이름 - 궤적 행의 method로 기록.
+
+    Args:
+        preferred: 랠리 시작 추적기
+        backends: 전환 순서 (정확도 순, 없는 추적기는 뺌)
+        auto: 자동 전환 (기본 False - 전환하면 정확도가 떨어짐)
+        min_success: 전환 대상 추적기의 최소 update 성공률
+        budget_ms: 프레임당 추적기 허용 시간 (재생 프레임 간격에서 디코딩/그리기 몫을 뺀 값)
+        patience: 몇 프레임 연속 넘으면 전환할지
+        window: OpenCV 추적기를 WindowedTracker로 감쌀지
+    """
+    def __init__(self, preferred='csrt', backends=('csrt', 'kcf'), auto=False,
+                 budget_ms=16.0, patience=15, window=True, min_success=0.5):
+        available = available_backends()
+        self.backends = [name for name in backends if name in available]
+        self.preferred = preferred if preferred in available else (self.backends or available)[0]
+        self.auto = auto
+        self.min_success = min_success
+        self.budget_ms = budget_ms
+        self.patience = patience
+        self.window = window
+
+        self.tracker = None
+        self.backend = None
+        self.ema_ms = 0.0
+        self.slow = 0
+
+        # 통계 (추적기별)
+        self.times = {}
+        self.counts = {}
+        self.successes = {}
+        self.switches = []
+
+    def select(self, name):
+        """다음 랠리 추적기"""
+        if name not in available_backends():
+            raise ValueError(f"쓸 수 없는 추적기: {name}")
+        self.preferred = name
+
+    def cycle(self):
+        """다음 랠리 추적기를 순서대로 바꿈 (키 입력용)"""
+        available = available_backends()
+        self.preferred = available[(available.index(self.preferred) + 1) % len(available)]
+        return self.preferred
+
+    def _start(self, name, frame, bbox):
+        self.tracker = create_tracker(name, window=self.window and name != 'detector')
+        self.tracker.init(frame, tuple(int(v) for v in bbox))
+        self.backend = name
+        self.ema_ms = 0.0
+        self.slow = 0
+
+    def init(self, frame, bbox):
+        self._start(self.preferred, frame, bbox)
+        return True
+
+    def reinit(self, frame, bbox):
+        """랠리 중 재초기화 (재검출 등) - 지금 추적기 그대로"""
+        self._start(self.backend or self.preferred, frame, bbox)
+        return True
+
+    def update(self, frame):
+        t0 = time.perf_counter()
+        success, bbox = self.tracker.update(frame)
+        elapsed = (time.perf_counter() - t0) * 1000
+
+        name = self.backend
+        self.times[name] = self.times.get(name, 0.0) + elapsed
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.successes[name] = self.successes.get(name, 0) + bool(success)
+
+        # 지수 평균 (첫 프레임은 그대로)
+        self.ema_ms = elapsed if self.ema_ms == 0.0 else 0.8 * self.ema_ms + 0.2 * elapsed
+        self.slow = self.slow + 1 if self.ema_ms > self.budget_ms else 0
+
+        # ⭐ 계속 느리면 다음 추적기로 (성공한 bbox에서 다시 시작)
+        if self.auto and success and self.slow >= self.patience:
+            order = self.backends if name in self.backends else [name] + self.backends
+            # 써 보니 성공률이 낮았던 추적기는 건너뜀
+            faster = next((candidate for candidate in order[order.index(name) + 1:]
+                           if self._reliable(candidate)), None)
+            if faster is not None:
+                self.switches.append((name, faster, self.ema_ms))
+                print(f"⚡ 추적기 전환: {name} → {faster} ({self.ema_ms:.1f} ms > "
+                      f"{self.budget_ms:.1f} ms)")
+                self._start(faster, frame, bbox)
+        return success, bbox
+
+    def _reliable(self, name):
+        """전환해도 되는 추적기인지 (아직 patience 프레임 안 써 봤으면 True)"""
+        count = self.counts.get(name, 0)
+        return count < self.patience or self.successes[name] / count >= self.min_success
+
+    def print_stats(self):
+        """추적기별 update 시간 / 전환 횟수"""
+        if not self.counts:
+            return
+        parts = [f"{name} {self.counts[name]} ({self.times[name]/self.counts[name]:.1f} ms)"
+                 for name in self.counts]
+        print(f"추적기: {' | '.join(parts)}")
+        if self.switches:
+            print(f"  자동 전환: {len(self.switches)}번 (예산 {self.budget_ms:.1f} ms)")
+
+def load_rallies(store_path, rally_ids=None, min_frames=10):
+    """
+    기록된 랠리 (TrajectoryStore) → 벤치마크 구간
+
+    frame은 read() 후 CAP_PROP_POS_FRAMES라 1부터 → 0부터 프레임 번호로 바꾼다.
+    랠리의 첫 성공 행이 초기 bbox.
+
+    Returns:
+        [dict - rally_id, start (초기화 프레임), end (마지막 프레임 + 1), bbox,
+                truth {프레임: (cx, cy)} (기록된 성공 행)], ...
+    """
+    rows = load_trajectories(store_path)
+    rallies = []
+    for rally_id in np.unique(rows['rally_id']):
+        if rally_ids is not None and rally_id not in rally_ids:
+            continue
+        rally = rows[rows['rally_id'] == rally_id]
+        rally = rally[np.argsort(rally['frame'])]
+        found = rally[rally['success'] == 1]
+        if len(found) == 0 or len(rally) < min_frames:
+            continue
+        first = found[0]
+        rallies.append({
+            'rally_id': int(rally_id),
+            'start': int(first['frame']) - 1,
+            'end': int(rally['frame'].max()),
+            'bbox': (int(first['x']), int(first['y']), int(first['width']), int(first['height'])),
+            'truth': {int(r['frame']) - 1: (r['x'] + r['width'] / 2.0, r['y'] + r['height'] / 2.0)
+                      for r in found[1:]},
+        })
+    return rallies
+
+def benchmark_backends(video_path, store_path, backends=None, window=False, tolerance=15,
+                       max_rallies=None):
+    """
+    기록된 랠리 ROI로 추적기 비교 (랠리마다 디코딩 1번, 모든 추적기에 같은 프레임)
+
+    Args:
+        video_path: 랠리를 기록한 영상
+        store_path: TrajectoryStore .npz (data/rallies/trajectories.npz)
+        backends: 비교할 추적기 (기본: 쓸 수 있는 전부)
+        window: OpenCV 추적기를 WindowedTracker로 감쌀지
+        tolerance: 기록된 bbox 중심과 이 거리(픽셀) 안이면 일치
+        max_rallies: 앞에서부터 몇 랠리만
+
+    Returns:
+        {추적기: dict - updates, mean_ms, p95_ms, fps, success_rate, agreement}
+        agreement = 기록된 성공 프레임 중 추적 성공 + 중심 tolerance 안 비율
+    """
+    backends = backends or available_backends()
+    rallies = load_rallies(store_path)[:max_rallies]
+    if not rallies:
+        raise ValueError(f"랠리 기록 없음: {store_path}")
+
+    times = {name: [] for name in backends}
+    successes = {name: 0 for name in backends}
+    agreed = {name: 0 for name in backends}
+    labeled = 0
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"영상을 열 수 없음: {video_path}")
+    for rally in rallies:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, rally['start'])
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        trackers = {}
+        for name in backends:
+            trackers[name] = create_tracker(name, window=window and name != 'detector')
+            trackers[name].init(frame, rally['bbox'])
+
+        for index in range(rally['start'] + 1, rally['end']):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            truth = rally['truth'].get(index)
+            labeled += truth is not None
+            for name, tracker in trackers.items():
+                t0 = time.perf_counter()
+                success, bbox = tracker.update(frame)
+                times[name].append(time.perf_counter() - t0)
+                if not success:
+                    continue
+                successes[name] += 1
+                if truth is not None:
+                    cx, cy = bbox[0] + bbox[2] / 2.0, bbox[1] + bbox[3] / 2.0
+                    agreed[name] += np.hypot(cx - truth[0], cy - truth[1]) <= tolerance
+    cap.release()
+
+    results = {}
+    for name in backends:
+        t = np.array(times[name]) * 1000
+        updates = len(t)
+        results[name] = {
+            'updates': updates,
+            'mean_ms': float(t.mean()) if updates else 0.0,
+            'p95_ms': float(np.percentile(t, 95)) if updates else 0.0,
+            'fps': 1000 / t.mean() if updates and t.mean() > 0 else 0.0,
+            'success_rate': successes[name] / updates if updates else 0.0,
+            'agreement': agreed[name] / labeled if labeled else float('nan'),
+        }
+    return results
+
+def print_benchmark(results):
+    """benchmark_backends() 결과 표"""
+    print("=" * 66)
+    print(f"{'추적기':10s} {'update':>10s} {'p95':>9s} {'fps':>7s} {'성공률':>7s} {'기록 일치':>9s}")
+    print("-" * 66)
+    for name, r in results.items():
+        print(f"{name:10s} {r['mean_ms']:7.1f} ms {r['p95_ms']:6.1f} ms {r['fps']:7.1f} "
+              f"{r['success_rate']*100:6.1f}% {r['agreement']*100:8.1f}%")
+    print("=" * 66)
+
+def save_benchmark(results, csv_path):
+    """결과 CSV"""
+    with open(csv_path, 'w') as f:
+        f.write("backend,updates,mean_ms,p95_ms,fps,success_rate,agreement\n")
+        for name, r in results.items():
+            f.write(f"{name},{r['updates']},{r['mean_ms']:.2f},{r['p95_ms']:.2f},{r['fps']:.1f},"
+                    f"{r['success_rate']:.4f},{r['agreement']:.4f}\n")
+
+if __name__ == "__main__":
+    import argparse
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    rallies_dir = os.path.join(project_root, 'data', 'rallies')
+
+    parser = argparse.ArgumentParser(description="기록된 랠리로 추적기 속도 / 정확도 비교")
+    parser.add_argument('video', help="랠리를 기록한 영상")
+    parser.add_argument('--store', default=os.path.join(rallies_dir, 'trajectories.npz'))
+    parser.add_argument('--backends', default=None,
+                        help=f"쉼표로 구분 (기본: 전부, {','.join(TRACKER_BACKENDS)})")
+    parser.add_argument('--window', action='store_true', help="WindowedTracker로 감싸서 비교")
+    parser.add_argument('--rallies', type=int, default=None, help="앞에서부터 몇 랠리만")
+    args = parser.parse_args()
+
+    backends = args.backends.split(',') if args.backends else None
+    print(f"추적기 벤치마크: {os.path.basename(args.video)} ({args.store})")
+    print(f"쓸 수 있는 추적기: {', '.join(available_backends())}")
+    results = benchmark_backends(args.video, args.store, backends=backends, window=args.window,
+                                 max_rallies=args.rallies)
+    print_benchmark(results)
+
+    csv_path = os.path.join(os.path.dirname(os.path.abspath(args.store)), 'tracker_benchmark.csv')
+    save_benchmark(results, csv_path)
+    print(f"✓ 결과: {csv_path}")
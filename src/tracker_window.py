@@ -0,0 +1,235 @@
+import cv2
+import numpy as np
+import time
+
+def create_csrt():
+    """기본 추적기 (CSRT)"""
+    return cv2.TrackerCSRT.create()
+
+def crop_padded(frame, origin, size):
+    """
+    frame에서 origin (x, y), size (w, h) 영역
+
+    프레임 안이면 복사 없는 뷰, 밖으로 나가면 가장자리 복제 (CSRT 내부 패치와 같은 처리)
+
+    Returns:
+        영역 이미지, 또는 None (영역이 프레임과 전혀 안 겹침)
+    """
+    x1, y1 = origin
+    w, h = size
+    height, width = frame.shape[:2]
+    if x1 >= 0 and y1 >= 0 and x1 + w <= width and y1 + h <= height:
+        return frame[y1:y1+h, x1:x1+w]
+
+    cx1, cy1 = max(x1, 0), max(y1, 0)
+    cx2, cy2 = min(x1 + w, width), min(y1 + h, height)
+    if cx1 >= cx2 or cy1 >= cy2:
+        return None
+    return cv2.copyMakeBorder(frame[cy1:cy2, cx1:cx2], cy1 - y1, y1 + h - cy2,
+                              cx1 - x1, x1 + w - cx2, cv2.BORDER_REPLICATE)
+
+class WindowedTracker:
+    """
+    검색 창 crop 추적기 (cv2 Tracker와 같은 init / update 인터페이스)
+
+    CSRT는 update()마다 받은 이미지 전체를 HSV로 바꾸고 (분할 마스크용)
+    특징을 뽑으므로 1080p 전체 프레임을 넘기면 대부분이 버려지는 연산이다.
+    실제로 보는 건 bbox + padding × sqrt(w·h) 패치뿐이라 그 주변만 잘라서 넘긴다.
+
+    - 창 크기: (re)init 때 bbox와 최근 속도로 정하고 고정
+      (추적기 내부 좌표는 창 좌상단 기준이라 크기가 바뀌면 위치가 어긋난다)
+    - 창 위치: 매 프레임 속도만큼 옮김 (+ 중심에서 벗어난 만큼 조금씩 되돌림)
+      → 추적기 입장에선 공이 예측 오차만큼만 움직이는 것처럼 보임 (움직임 보상)
+    - 실패하면: 직전 성공 프레임의 넓은 창으로 새 추적기를 만들고
+      같은 넓은 창에서 다시 update (CSRT는 실패하면 내부 위치가 망가져서 재초기화 필요).
+      max_missed 프레임까지 매 프레임 재시도, 넓은 창으로 shrink_after 프레임 성공하면 원래 크기로
+    - 결과 bbox는 프레임 좌표
+
+    Args:
+        create: 추적기 생성 함수 (기본 CSRT)
+        padding: 추적기 검색 패치 여유 (CSRT 기본 padding = 3)
+        velocity_margin: 창 절반에 더할 속도 배수 (빠른 공일수록 넓게)
+        wide_factor: 실패 시 넓은 창 배율
+        min_half: 창 절반 최소 크기 (픽셀)
+        max_missed: 연속 실패 몇 프레임까지 넓은 창으로 재시도할지
+        shrink_after: 넓은 창으로 몇 프레임 연속 성공하면 원래 창으로 돌아갈지
+        recenter: 프레임당 창 중심 보정 최대 (픽셀) - 추적기에는 그만큼 움직임으로 보임
+    """
+    def __init__(self, create=None, padding=3.0, velocity_margin=2.0, wide_factor=2.5,
+                 min_half=32, max_missed=5, shrink_after=10, recenter=4):
+        self.create = create or create_csrt
+        self.padding = padding
+        self.velocity_margin = velocity_margin
+        self.wide_factor = wide_factor
+        self.min_half = min_half
+        self.max_missed = max_missed
+        self.shrink_after = shrink_after
+        self.recenter = recenter
+
+        self.tracker = None
+        self.bbox = None           # 마지막 성공 bbox (프레임 좌표, float)
+        self.velocity = (0.0, 0.0)
+        self.half = None           # 현재 창 절반 크기 (w, h)
+        self.origin = None         # 추적기 좌표계 원점 (마지막 창 좌상단)
+        self.wide = False
+        self.streak = 0            # 넓은 창 연속 성공
+        self.missed = 0
+        self.last_patch = None     # 직전 성공 프레임의 넓은 창 (복사본, 실패 시 재초기화용)
+        self.last_patch_origin = None
+
+        # 통계
+        self.updates = 0
+        self.fallbacks = 0
+        self.recovered = 0
+        self.reinits = 0
+        self.update_time = 0.0
+        self.window_pixels = 0
+        self.frame_pixels = 0
+
+    def _window_half(self, bbox, factor=1.0):
+        """bbox + 검색 패치 + 속도 여유 → 창 절반 (w, h)"""
+        w, h = bbox[2], bbox[3]
+        pad = self.padding * np.sqrt(max(w * h, 1.0))
+        vx, vy = self.velocity
+        half_w = max(self.min_half, (w + pad) * 0.6 + self.velocity_margin * abs(vx))
+        half_h = max(self.min_half, (h + pad) * 0.6 + self.velocity_margin * abs(vy))
+        return int(half_w * factor), int(half_h * factor)
+
+    @staticmethod
+    def _center(bbox):
+        return bbox[0] + bbox[2] / 2.0, bbox[1] + bbox[3] / 2.0
+
+    def _window_origin(self, center, half):
+        return int(round(center[0])) - half[0], int(round(center[1])) - half[1]
+
+    def _start(self, image, origin, half, bbox):
+        """image (origin 기준 창)에서 bbox (프레임 좌표)로 새 추적기"""
+        tracker = self.create()
+        x, y, w, h = bbox
+        tracker.init(image, (int(round(x - origin[0])), int(round(y - origin[1])),
+                             int(round(w)), int(round(h))))
+        self.tracker = tracker
+        self.origin = origin
+        self.half = half
+        self.reinits += 1
+
+    def _keep_patch(self, frame):
+        """다음 실패 대비: 이번 프레임의 넓은 창 복사 (bbox 중심)"""
+        half = self._window_half(self.bbox, self.wide_factor)
+        origin = self._window_origin(self._center(self.bbox), half)
+        patch = crop_padded(frame, origin, (2 * half[0], 2 * half[1]))
+        self.last_patch = None if patch is None else patch.copy()
+        self.last_patch_origin = origin
+
+    def init(self, frame, bbox):
+        """추적 시작 (bbox = 프레임 좌표 x, y, w, h)"""
+        self.bbox = tuple(float(v) for v in bbox)
+        self.velocity = (0.0, 0.0)
+        self.wide = False
+        self.streak = 0
+        self.missed = 0
+
+        half = self._window_half(self.bbox)
+        origin = self._window_origin(self._center(self.bbox), half)
+        self._start(crop_padded(frame, origin, (2 * half[0], 2 * half[1])), origin, half,
+                    self.bbox)
+        self._keep_patch(frame)
+        return True
+
+    def _accept(self, frame, bbox):
+        """성공: 속도 / bbox 갱신 (속도는 지수 평활)"""
+        old = self._center(self.bbox)
+        new = self._center(bbox)
+        steps = self.missed + 1
+        vx = (new[0] - old[0]) / steps
+        vy = (new[1] - old[1]) / steps
+        self.velocity = (0.5 * self.velocity[0] + 0.5 * vx, 0.5 * self.velocity[1] + 0.5 * vy)
+        self.bbox = bbox
+        self.missed = 0
+
+        # 넓은 창으로 충분히 따라왔으면 원래 크기 창으로 재초기화
+        if self.wide:
+            self.streak += 1
+            if self.streak >= self.shrink_after:
+                half = self._window_half(bbox)
+                origin = self._window_origin(self._center(bbox), half)
+                image = crop_padded(frame, origin, (2 * half[0], 2 * half[1]))
+                if image is not None:
+                    self._start(image, origin, half, bbox)
+                    self.wide = False
+                    self.streak = 0
+        self._keep_patch(frame)
+
+    def _track(self, frame, origin, half):
+        """origin 창에서 update → 프레임 좌표 bbox 또는 None"""
+        image = crop_padded(frame, origin, (2 * half[0], 2 * half[1]))
+        if image is None:
+            return None
+        self.window_pixels += image.shape[0] * image.shape[1]
+        success, box = self.tracker.update(image)
+        if not success:
+            return None
+        x, y, w, h = box
+        return (float(x + origin[0]), float(y + origin[1]), float(w), float(h))
+
+    def _fallback(self, frame):
+        """
+        넓은 창으로 재시도: 직전 성공 프레임 넓은 창에서 재초기화 → 같은 창 위치에서 update
+        """
+        if self.last_patch is None or self.missed > self.max_missed:
+            return None
+        self.fallbacks += 1
+        half = (self.last_patch.shape[1] // 2, self.last_patch.shape[0] // 2)
+        origin = self.last_patch_origin
+        self._start(self.last_patch, origin, half, self.bbox)
+        self.wide = True
+        self.streak = 0
+        return self._track(frame, origin, half)
+
+    def update(self, frame):
+        """
+        다음 프레임 추적
+
+        Returns:
+            (success, bbox) - bbox는 프레임 좌표 (실패면 마지막 성공 bbox)
+        """
+        t0 = time.perf_counter()
+        self.updates += 1
+        self.frame_pixels += frame.shape[0] * frame.shape[1]
+
+        bbox = None
+        if self.missed == 0:
+            # 창을 속도만큼 이동 (크기는 고정) + 중심 쪽으로 조금 보정
+            cx, cy = self._center(self.bbox)
+            r = self.recenter
+            dx = self.velocity[0] + np.clip(cx - self.origin[0] - self.half[0], -r, r)
+            dy = self.velocity[1] + np.clip(cy - self.origin[1] - self.half[1], -r, r)
+            origin = (self.origin[0] + int(round(dx)), self.origin[1] + int(round(dy)))
+            bbox = self._track(frame, origin, self.half)
+            if bbox is not None:
+                self.origin = origin
+
+        if bbox is None:
+            bbox = self._fallback(frame)
+            if bbox is not None:
+                self.recovered += 1
+
+        if bbox is not None:
+            self._accept(frame, bbox)
+        else:
+            self.missed += 1
+
+        self.update_time += time.perf_counter() - t0
+        if bbox is None:
+            return False, tuple(int(v) for v in self.bbox)
+        return True, tuple(int(round(v)) for v in bbox)
+
+    def print_stats(self):
+        """update 시간 / 창 크기 / 재시도"""
+        if not self.updates:
+            return
+        ratio = self.window_pixels / max(self.frame_pixels, 1) * 100
+        print(f"창 추적: {self.updates} 프레임 | {self.update_time/self.updates*1000:.1f} ms/프레임 | "
+              f"창 {ratio:.1f}% 픽셀")
+        print(f"  넓은 창 재시도: {self.fallbacks} (복구 {self.recovered}) | "
+              f"재초기화 {self.reinits}")
@@ -0,0 +1,291 @@
+import glob
+import numpy as np
+import os
+
+# 컬럼 (이름, 타입) - .npz 안에 컬럼별 배열로 저장
+COLUMNS = [
+    ('rally_id', np.int32),
+    ('frame', np.int32),
+    ('x', np.int32),           # bbox 좌상단 (실패 프레임은 -1)
+    ('y', np.int32),
+    ('width', np.int32),
+    ('height', np.int32),
+    ('success', np.int8),      # 1 = 추적/검출 성공, 0 = 실패
+    ('confidence', np.float32),
+    ('method', np.uint8),      # METHODS 인덱스
+]
+
+TRAJECTORY_DTYPE = np.dtype(COLUMNS)
+
+# 추적 방법 코드 (뒤에만 추가 - 파일에 이름 목록도 같이 저장)
+METHODS = ['none', 'csrt', 'kcf', 'mosse', 'mil', 'detector', 'kalman', 'redetect']
+
+def method_code(name):
+    """추적 방법 이름 → 코드"""
+    if name not in METHODS:
+        raise ValueError(f"알 수 없는 추적 방법: {name} (가능: {', '.join(METHODS)})")
+    return METHODS.index(name)
+
+def to_rows(rally_id, trajectory, method='csrt', confidence=None):
+    """
+    [frame, x, y, w, h, success] 리스트 → 구조화 배열 (한 번에 변환)
+
+    Args:
+        rally_id: 랠리 번호
+        trajectory: 기존 CSV 행 형식의 리스트
+        method: 추적 방법 이름, 또는 행별 이름 리스트 (랠리 중 추적기가 바뀐 경우)
+        confidence: 행별 신뢰도 (None이면 success 값 그대로 1.0 / 0.0)
+    """
+    table = np.asarray(trajectory, dtype=np.int64).reshape(-1, 6)
+    rows = np.empty(len(table), dtype=TRAJECTORY_DTYPE)
+    rows['rally_id'] = rally_id
+    rows['frame'] = table[:, 0]
+    rows['x'] = table[:, 1]
+    rows['y'] = table[:, 2]
+    rows['width'] = table[:, 3]
+    rows['height'] = table[:, 4]
+    rows['success'] = table[:, 5]
+    rows['confidence'] = table[:, 5] if confidence is None else confidence
+    if isinstance(method, str):
+        rows['method'] = method_code(method)
+    else:
+        rows['method'] = [method_code(name) for name in method]
+    return rows
+
+def ball_rows(trajectory, rally_id=0, method='detector'):
+    """
+    trajectory_point() 리스트 → 구조화 배열 (신뢰도 = 원형도)
+    """
+    rows = np.empty(len(trajectory), dtype=TRAJECTORY_DTYPE)
+    for i, point in enumerate(trajectory):
+        cx, cy = point['position']
+        w, h = point['size']
+        rows[i] = (rally_id, point['frame'], cx - w // 2, cy - h // 2, w, h, 1,
+                   point['circularity'], method_code(method))
+    return rows
+
+def part_paths(path):
+    """
+    flush 조각 파일 [(번호, 경로), ...] - 번호 순
+
+    조각 = path + '.partNNNNN' (TrajectoryStore.flush가 새 행만 쓴 파일)
+    """
+    parts = []
+    for part_path in glob.glob(glob.escape(path) + '.part*'):
+        suffix = part_path[len(path) + len('.part'):]
+        if suffix.isdigit():
+            parts.append((int(suffix), part_path))
+    return sorted(parts)
+
+def _read_npz(path):
+    """
+    .npz 1개 → (rows, extra) - extra는 컬럼 외 배열 (replaces, compacted)
+    """
+    with np.load(path) as data:
+        n = len(data['frame'])
+        rows = np.empty(n, dtype=TRAJECTORY_DTYPE)
+        for name, _ in COLUMNS:
+            rows[name] = data[name]
+
+        # 파일 기록 당시 코드표 → 현재 코드표
+        names = [str(m) for m in data['method_names']]
+        if names != METHODS[:len(names)]:
+            remap = np.array([METHODS.index(m) for m in names], dtype=np.uint8)
+            rows['method'] = remap[rows['method']]
+
+        extra = {key: data[key] for key in ('replaces', 'compacted') if key in data.files}
+    return rows, extra
+
+def _write_npz(path, rows, **extra):
+    """임시 파일 → os.replace (중간에 죽어도 파일이 깨지지 않음)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            method_names=np.array(METHODS),
+            **{name: rows[name] for name, _ in COLUMNS},
+            **extra
+        )
+    os.replace(tmp_path, path)
+
+def load_trajectories(path, rally_id=None, frame_range=None):
+    """
+    저장된 궤적 읽기 (텍스트 파싱 없이 컬럼 배열 그대로)
+
+    본 파일 뒤에 아직 합쳐지지 않은 flush 조각이 있으면 순서대로 적용한다
+    (조각의 replaces 랠리는 앞 행을 지우고 새 행으로 교체).
+
+    Args:
+        path: .npz 경로
+        rally_id: 특정 랠리만 (None이면 전체)
+        frame_range: (start, end) - start <= frame < end 만
+
+    Returns:
+        TRAJECTORY_DTYPE 구조화 배열 (파일 없으면 빈 배열)
+    """
+    rows = np.empty(0, dtype=TRAJECTORY_DTYPE)
+    compacted = -1
+    if os.path.exists(path):
+        rows, extra = _read_npz(path)
+        compacted = int(extra.get('compacted', -1))
+
+    for index, part_path in part_paths(path):
+        if index <= compacted:
+            continue  # 본 파일에 이미 합쳐짐 (조각 삭제 전에 죽은 경우)
+        part, extra = _read_npz(part_path)
+        replaces = extra.get('replaces')
+        if replaces is not None and len(replaces) and len(rows):
+            rows = rows[~np.isin(rows['rally_id'], replaces)]
+        rows = np.concatenate([rows, part])
+
+    return select_rows(rows, rally_id, frame_range)
+
+def select_rows(rows, rally_id=None, frame_range=None):
+    """랠리 / 프레임 구간으로 거르기 (불리언 마스크 1번)"""
+    keep = np.ones(len(rows), dtype=bool)
+    if rally_id is not None:
+        keep &= rows['rally_id'] == rally_id
+    if frame_range is not None:
+        keep &= (rows['frame'] >= frame_range[0]) & (rows['frame'] < frame_range[1])
+    return rows if keep.all() else rows[keep]
+
+def centers(rows):
+    """bbox 중심 (cx, cy) 배열 - 실패 프레임은 -1"""
+    ok = rows['success'] == 1
+    cx = np.where(ok, rows['x'] + rows['width'] // 2, -1)
+    cy = np.where(ok, rows['y'] + rows['height'] // 2, -1)
+    return cx, cy
+
+def rally_summary(rows):
+    """
+    랠리별 요약 (rally_id, start_frame, end_frame, num_frames, success_rate)
+    """
+    summary = []
+    for rally_id in np.unique(rows['rally_id']):
+        rally = rows[rows['rally_id'] == rally_id]
+        summary.append({
+            'rally_id': int(rally_id),
+            'start_frame': int(rally['frame'].min()),
+            'end_frame': int(rally['frame'].max()),
+            'num_frames': len(rally),
+            'success_rate': float(rally['success'].mean()),
+        })
+    return summary
+
+def export_csv(rows, csv_path):
+    """사람이 볼 CSV로 내보내기 (all_rallies.csv 형식 + confidence, method)"""
+    with open(csv_path, 'w', newline='') as f:
+        f.write("rally_id,frame,x,y,width,height,success,confidence,method\n")
+        for row in rows:
+            f.write(f"{row['rally_id']},{row['frame']},{row['x']},{row['y']},"
+                    f"{row['width']},{row['height']},{row['success']},"
+                    f"{row['confidence']:.3f},{METHODS[row['method']]}\n")
+
+class TrajectoryStore:
+    """
+    컬럼 기반 궤적 저장소 (.npz 1개)
+
+    랠리마다 CSV 파일을 따로 쓰는 대신 모든 랠리를 rally_id 컬럼으로 구분해서
+    파일 하나에 저장한다. 경기 전체를 분석할 때는 load_trajectories() 1번으로 끝.
+
+    ⭐ flush()는 새 행만 조각 파일 (path.partNNNNN)로 쓴다 - 매번 전체를 다시 쓰면
+    체크포인트마다 flush하는 경기 전체 분석에서 쓰기 비용이 행 수의 제곱으로 늘어난다.
+    조각 행 수가 본 파일 행 수 이상이 되면 본 파일로 합친다 (compact) - 본 파일이
+    매번 2배 이상 커지므로 전체 쓰기량은 행 수의 몇 배 이내. 조각 파일이 max_parts개가
+    되어도 합친다 (파일 수 제한).
+    파일은 모두 임시 파일 → os.replace (중간에 죽어도 깨지지 않음).
+    조각만 남아 있어도 load_trajectories()가 합쳐서 읽는다.
+
+    같은 rally_id를 이번 세션에서 처음 flush하면 파일에 있던 같은 랠리 행은
+    지운다 (기존 rally_XX.csv 덮어쓰기와 같은 동작).
+
+    Args:
+        path: .npz 경로
+        max_parts: 조각 파일 최대 개수
+    """
+    def __init__(self, path, max_parts=64):
+        self.path = path
+        self.max_parts = max_parts
+        self._rows = load_trajectories(path)
+        self._pending = []
+        self._owned = set()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # 이전 세션 조각은 여기서 본 파일로 합침 (조각 번호는 계속 이어서)
+        parts = part_paths(path)
+        self._next_part = parts[-1][0] + 1 if parts else 0
+        self._parts = [part_path for _, part_path in parts]
+        self._part_rows = 0
+        self._file_rows = len(self._rows)
+        if self._parts:
+            self.compact()
+
+    def append(self, rally_id, frame, x, y, width, height, success, confidence=None,
+               method='csrt'):
+        """행 1개 추가 (flush 전까지 메모리에만)"""
+        if confidence is None:
+            confidence = float(success)
+        row = np.array([(rally_id, frame, x, y, width, height, success, confidence,
+                         method_code(method))], dtype=TRAJECTORY_DTYPE)
+        self._pending.append(row)
+
+    def append_rows(self, rows):
+        """구조화 배열 (to_rows / ball_rows 결과) 추가"""
+        if len(rows) > 0:
+            self._pending.append(np.asarray(rows, dtype=TRAJECTORY_DTYPE))
+
+    def append_rally(self, rally_id, trajectory, method='csrt', confidence=None):
+        """[frame, x, y, w, h, success] 리스트를 랠리 1개로 추가"""
+        self.append_rows(to_rows(rally_id, trajectory, method, confidence))
+
+    def flush(self):
+        """쌓인 행을 파일에 기록"""
+        if not self._pending:
+            return
+
+        new_rows = np.concatenate(self._pending)
+        self._pending = []
+
+        # 이번 세션에서 처음 쓰는 랠리는 이전 기록 교체
+        fresh = np.setdiff1d(np.unique(new_rows['rally_id']), list(self._owned))
+        if len(fresh) > 0 and len(self._rows) > 0:
+            self._rows = self._rows[~np.isin(self._rows['rally_id'], fresh)]
+        self._owned.update(int(r) for r in fresh)
+
+        self._rows = np.concatenate([self._rows, new_rows])
+
+        # 조각이 본 파일만큼 쌓이면 합치기, 아니면 새 행만 조각으로
+        if (self._part_rows + len(new_rows) >= self._file_rows
+                or len(self._parts) >= self.max_parts):
+            self.compact()
+            return
+        part_path = f"{self.path}.part{self._next_part:05d}"
+        _write_npz(part_path, new_rows, replaces=fresh.astype(np.int32))
+        self._next_part += 1
+        self._parts.append(part_path)
+        self._part_rows += len(new_rows)
+
+    def compact(self):
+        """기록된 행 전체를 본 파일 1개로 (조각 삭제)"""
+        _write_npz(self.path, self._rows, compacted=np.int64(self._next_part - 1))
+        for part_path in self._parts:
+            os.remove(part_path)
+        self._parts = []
+        self._part_rows = 0
+        self._file_rows = len(self._rows)
+
+    def rows(self, rally_id=None, frame_range=None):
+        """
+        기록된 행 (flush 안 된 행 포함)
+
+        Args:
+            rally_id, frame_range: load_trajectories()와 같음
+        """
+        rows = np.concatenate([self._rows] + self._pending)
+        return select_rows(rows, rally_id, frame_range)
+
+    def __len__(self):
+        return len(self._rows) + sum(len(r) for r in self._pending)
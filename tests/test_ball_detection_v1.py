@@ -1,10 +1,19 @@
 import cv2
 import numpy as np
 import os
+import sys
 
-def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from bg_cache import warmup_background
+from stage_timer import StageTimer
+
+def detect_ball_candidates(video_path, start_frame=200, num_frames=10, profile=False):
     """
     Background Subtraction + 필터링으로 공 후보 검출
+
+    Args:
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
     """
     cap = cv2.VideoCapture(video_path)
     
@@ -30,24 +39,21 @@ def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    # 배경 학습 (start_frame까지)
-    print(f"\n배경 학습 중... (0 ~ {start_frame})")
-    for i in range(start_frame):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        bg_subtractor.apply(frame)
-        if i % 50 == 0:
-            print(f"  {i} 프레임...")
-    
+    # 배경 학습 (⭐ 캐시 있으면 0 ~ start_frame 디코딩 생략)
+    print()
+    warmup_background(cap, bg_subtractor, video_path, start_frame, roi_mask=None)
     print(f"✓ 배경 학습 완료\n")
     
     # 검출 시작
     print(f"공 검출 중... ({start_frame} ~ {start_frame + num_frames})")
     print("=" * 50)
     
+    timer = StageTimer(enabled=profile)
+    
     for i in range(num_frames):
+        timer.next_frame(start_frame + i)
         ret, frame = cap.read()
+        timer.lap('decode')
         if not ret:
             break
         
@@ -55,6 +61,7 @@ def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
         
         # 1. Background Subtraction
         fg_mask = bg_subtractor.apply(frame)
+        timer.lap('knn')
         
         # 2. 노이즈 제거 (Morphology)
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
@@ -64,6 +71,7 @@ def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
         
         # Closing: 구멍 메우기
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        timer.lap('morphology')
         
         # 3. 윤곽선 찾기
         contours, _ = cv2.findContours(
@@ -112,6 +120,7 @@ def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
                 'bbox': (x, y, w, h),
                 'circularity': circularity
             })
+        timer.lap('candidates')
         
         # 5. 시각화
         result_frame = frame.copy()
@@ -131,6 +140,7 @@ def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
             info = f"A:{candidate['area']:.0f} C:{candidate['circularity']:.2f}"
             cv2.putText(result_frame, info, (x, y-5), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+        timer.lap('draw')
         
         # 저장
         cv2.imwrite(
@@ -145,12 +155,16 @@ def detect_ball_candidates(video_path, start_frame=200, num_frames=10):
             os.path.join(output_dir, f'frame_{current_frame:04d}_detected.jpg'),
             result_frame
         )
+        timer.lap('save')
         
         print(f"Frame {current_frame:4d}: {len(ball_candidates)} 공 후보 검출")
     
     cap.release()
     
     print("=" * 50)
+    timer.print_stats()
+    if profile:
+        timer.dump_timeline(os.path.join(output_dir, 'timeline.csv'))
     print(f"✓ 완료! 결과: {output_dir}")
     print("\n확인:")
     print(f"  open {output_dir}")
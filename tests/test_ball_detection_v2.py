@@ -1,6 +1,16 @@
 import cv2
 import numpy as np
 import os
+import sys
+
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from frame_reader import FrameReader
+from frame_cache import CachedCapture
+from bg_cache import warmup_background
+from debug_writer import DebugWriter
+from stage_timer import StageTimer
+
 
 def get_court_roi_mask(frame_shape):
     """
@@ -24,11 +34,24 @@ def get_court_roi_mask(frame_shape):
     
     return mask, (x1, y1, x2, y2)
 
-def detect_ball_with_roi(video_path, start_frame=200, num_frames=10):
+def detect_ball_with_roi(video_path, start_frame=200, num_frames=10, save_debug=True,
+                         debug_every=1, profile=False, frame_cache=False):
     """
     ROI를 적용한 공 검출
+
+    Args:
+        save_debug: False면 프레임별 이미지 저장 안 함 (시각화도 생략)
+        debug_every: 프레임별 이미지 저장 간격
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
+        frame_cache: True면 분석 구간을 raw 프레임 캐시(frame_cache/)에서 읽음 - 반복 실행 시 디코딩 없음
+
+    Returns:
+        프레임별 검출 결과 (frame, candidates, detected, position)
     """
-    cap = cv2.VideoCapture(video_path)
+    if frame_cache:
+        cap = CachedCapture(video_path, start_frame, num_frames)
+    else:
+        cap = FrameReader(video_path)  # ⭐ 디코딩은 백그라운드 스레드
     
     if not cap.isOpened():
         print("✗ 영상을 열 수 없습니다.")
@@ -72,23 +95,13 @@ def detect_ball_with_roi(video_path, start_frame=200, num_frames=10):
                 cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
     cv2.imwrite(os.path.join(output_dir, 'roi_mask.jpg'), roi_visualization)
     
-    # 시작 위치로 이동
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    
-    # 배경 학습
-    print(f"\n배경 학습 중... (0 ~ {start_frame})")
-    for i in range(start_frame):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # ROI 영역만 학습
-        frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-        bg_subtractor.apply(frame_roi)
-        
-        if i % 50 == 0:
-            print(f"  {i} 프레임...")
+    # ⭐ 프레임별 이미지는 비동기 저장 (큐 가득 차면 버림 → 검출 속도 우선)
+    debug = DebugWriter(output_dir, every=debug_every, enabled=save_debug)
     
+    # 시작 위치로 이동
+    # 배경 학습 (⭐ 캐시 있으면 0 ~ start_frame 디코딩 생략)
+    print()
+    warmup_background(cap, bg_subtractor, video_path, start_frame, roi_mask=roi_mask)
     print(f"✓ 배경 학습 완료\n")
     
     # 검출 시작
@@ -97,8 +110,12 @@ def detect_ball_with_roi(video_path, start_frame=200, num_frames=10):
     
     detection_stats = []
     
+    timer = StageTimer(enabled=profile)
+    
     for i in range(num_frames):
+        timer.next_frame(start_frame + i)
         ret, frame = cap.read()
+        timer.lap('decode')
         if not ret:
             break
         
@@ -112,11 +129,13 @@ def detect_ball_with_roi(video_path, start_frame=200, num_frames=10):
         
         # 3. ROI로 다시 한번 마스킹 (확실하게)
         fg_mask = cv2.bitwise_and(fg_mask, fg_mask, mask=roi_mask)
+        timer.lap('knn')
         
         # 4. 노이즈 제거
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel, iterations=2)
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        timer.lap('morphology')
         
         # 5. 윤곽선 찾기
         contours, _ = cv2.findContours(
@@ -165,59 +184,55 @@ def detect_ball_with_roi(video_path, start_frame=200, num_frames=10):
             best_candidate = max(ball_candidates, key=lambda c: c['circularity'])
         else:
             best_candidate = None
+        timer.lap('candidates')
         
-        # 8. 시각화
-        result_frame = frame.copy()
+        # 8. 시각화 + 저장 (⭐ 샘플링된 프레임만)
+        if debug.should_write(i):
+            result_frame = frame.copy()
         
-        # ROI 경계 표시
-        cv2.rectangle(result_frame, (x1, y1), (x2, y2), (100, 100, 100), 1)
+            # ROI 경계 표시
+            cv2.rectangle(result_frame, (x1, y1), (x2, y2), (100, 100, 100), 1)
         
-        # 모든 후보 (회색)
-        for candidate in ball_candidates:
-            x, y, w, h = candidate['bbox']
-            cv2.rectangle(result_frame, (x, y), (x+w, y+h), (128, 128, 128), 1)
+            # 모든 후보 (회색)
+            for candidate in ball_candidates:
+                x, y, w, h = candidate['bbox']
+                cv2.rectangle(result_frame, (x, y), (x+w, y+h), (128, 128, 128), 1)
         
-        # 최고 후보 (녹색, 굵게)
-        if best_candidate:
-            x, y, w, h = best_candidate['bbox']
-            cx, cy = best_candidate['center']
+            # 최고 후보 (녹색, 굵게)
+            if best_candidate:
+                x, y, w, h = best_candidate['bbox']
+                cx, cy = best_candidate['center']
             
-            cv2.rectangle(result_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.circle(result_frame, (cx, cy), 3, (0, 0, 255), -1)
+                cv2.rectangle(result_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                cv2.circle(result_frame, (cx, cy), 3, (0, 0, 255), -1)
             
-            info = f"BALL: A={best_candidate['area']:.0f} C={best_candidate['circularity']:.2f}"
-            cv2.putText(result_frame, info, (x, y-5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        # 통계 표시
-        stats_text = f"Frame {current_frame} | Candidates: {len(ball_candidates)}"
-        cv2.putText(result_frame, stats_text, (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-        
-        # 저장
-        cv2.imwrite(
-            os.path.join(output_dir, f'frame_{current_frame:04d}_original.jpg'),
-            frame
-        )
-        cv2.imwrite(
-            os.path.join(output_dir, f'frame_{current_frame:04d}_mask_cleaned.jpg'),
-            fg_mask
-        )
-        cv2.imwrite(
-            os.path.join(output_dir, f'frame_{current_frame:04d}_detected.jpg'),
-            result_frame
-        )
+                info = f"BALL: A={best_candidate['area']:.0f} C={best_candidate['circularity']:.2f}"
+                cv2.putText(result_frame, info, (x, y-5), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        
+            # 통계 표시
+            stats_text = f"Frame {current_frame} | Candidates: {len(ball_candidates)}"
+            cv2.putText(result_frame, stats_text, (10, 30),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        
+            # 저장 (백그라운드 스레드)
+            debug.write(f'frame_{current_frame:04d}_original.jpg', frame)
+            debug.write(f'frame_{current_frame:04d}_mask_cleaned.jpg', fg_mask)
+            debug.write(f'frame_{current_frame:04d}_detected.jpg', result_frame)
+        timer.lap('draw_save')
         
         detection_stats.append({
             'frame': current_frame,
             'candidates': len(ball_candidates),
-            'detected': best_candidate is not None
+            'detected': best_candidate is not None,
+            'position': best_candidate['center'] if best_candidate else None
         })
         
         print(f"Frame {current_frame:4d}: {len(ball_candidates):2d} 후보, "
               f"최고: {'공 검출!' if best_candidate else '없음'}")
     
     cap.release()
+    debug.close()
     
     # 통계 요약
     print("\n" + "=" * 50)
@@ -227,10 +242,18 @@ def detect_ball_with_roi(video_path, start_frame=200, num_frames=10):
     avg_candidates = np.mean([s['candidates'] for s in detection_stats])
     print(f"공 검출 프레임: {detected_count}/{num_frames}")
     print(f"평균 후보 수: {avg_candidates:.1f}")
+    print("-" * 50)
+    cap.print_stats()
+    debug.print_stats()
+    timer.print_stats()
+    if profile:
+        timer.dump_timeline(os.path.join(output_dir, 'timeline.csv'))
     print("=" * 50)
     print(f"✓ 완료! 결과: {output_dir}")
     print("\n확인:")
     print(f"  open {output_dir}")
+    
+    return detection_stats
 
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
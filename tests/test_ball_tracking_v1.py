@@ -1,6 +1,13 @@
 import cv2
 import numpy as np
 import os
+import sys
+
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from bg_cache import warmup_background
+from stage_timer import StageTimer
+from frame_cache import CachedCapture
 
 def get_court_roi_mask(frame_shape):
     """
@@ -25,11 +32,22 @@ def distance(p1, p2):
     """
     return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
-def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
+def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50, profile=False,
+                               frame_cache=False):
     """
     궤적 추적으로 공 검출
+
+    Args:
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
+        frame_cache: True면 분석 구간을 raw 프레임 캐시(frame_cache/)에서 읽음 - 반복 실행 시 디코딩 없음
+
+    Returns:
+        공 궤적 리스트 (frame, position, area, circularity)
     """
-    cap = cv2.VideoCapture(video_path)
+    if frame_cache:
+        cap = CachedCapture(video_path, start_frame, num_frames)
+    else:
+        cap = cv2.VideoCapture(video_path)
     
     if not cap.isOpened():
         print("✗ 영상을 열 수 없습니다.")
@@ -65,19 +83,9 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
         os.makedirs(output_dir)
     
     # 시작 위치로 이동
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    
-    # 배경 학습
-    print(f"\n배경 학습 중... (0 ~ {start_frame})")
-    for i in range(start_frame):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-        bg_subtractor.apply(frame_roi)
-        if i % 50 == 0:
-            print(f"  {i} 프레임...")
-    
+    # 배경 학습 (⭐ 캐시 있으면 0 ~ start_frame 디코딩 생략)
+    print()
+    warmup_background(cap, bg_subtractor, video_path, start_frame, roi_mask=roi_mask)
     print(f"✓ 배경 학습 완료\n")
     
     # 추적 변수
@@ -89,8 +97,12 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
     print(f"공 추적 중...")
     print("=" * 50)
     
+    timer = StageTimer(enabled=profile)
+    
     for i in range(num_frames):
+        timer.next_frame(start_frame + i)
         ret, frame = cap.read()
+        timer.lap('decode')
         if not ret:
             break
         
@@ -100,11 +112,13 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
         frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
         fg_mask = bg_subtractor.apply(frame_roi)
         fg_mask = cv2.bitwise_and(fg_mask, fg_mask, mask=roi_mask)
+        timer.lap('knn')
         
         # 2. 노이즈 제거
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel, iterations=2)
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        timer.lap('morphology')
         
         # 3. 윤곽선 찾기
         contours, _ = cv2.findContours(
@@ -144,6 +158,7 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
                 'bbox': (x, y, w, h),
                 'circularity': circularity
             })
+        timer.lap('candidates')
         
         # 5. 궤적 기반 선택 ⭐
         selected_ball = None
@@ -180,6 +195,7 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
                 'circularity': selected_ball['circularity']
             })
             last_ball_position = selected_ball['center']
+        timer.lap('select')
         
         # 7. 시각화
         result_frame = frame.copy()
@@ -216,6 +232,7 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
         stats_text = f"Frame {current_frame} | Candidates: {len(candidates)} | Track: {len(ball_trajectory)}"
         cv2.putText(result_frame, stats_text, (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        timer.lap('draw')
         
         # 저장 (10프레임마다)
         if i % 5 == 0:
@@ -223,6 +240,7 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
                 os.path.join(output_dir, f'frame_{current_frame:04d}_tracked.jpg'),
                 result_frame
             )
+        timer.lap('save')
         
         detected = "✓" if selected_ball else "✗"
         print(f"Frame {current_frame:4d}: {len(candidates):2d} 후보 | {detected} | 궤적 길이: {len(ball_trajectory)}")
@@ -236,6 +254,9 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
     print(f"총 프레임: {num_frames}")
     print(f"공 검출: {len(ball_trajectory)} 프레임 ({len(ball_trajectory)/num_frames*100:.1f}%)")
     print(f"궤적 길이: {len(ball_trajectory)} 포인트")
+    timer.print_stats()
+    if profile:
+        timer.dump_timeline(os.path.join(output_dir, 'timeline.csv'))
     print("=" * 50)
     
     # 궤적 CSV 저장
@@ -251,6 +272,8 @@ def track_ball_with_trajectory(video_path, start_frame=200, num_frames=50):
     print(f"\n✓ 완료! 결과: {output_dir}")
     print("\n확인:")
     print(f"  open {output_dir}")
+    
+    return ball_trajectory
 
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
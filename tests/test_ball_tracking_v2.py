@@ -1,6 +1,16 @@
 import cv2
 import numpy as np
 import os
+import sys
+
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from bg_cache import warmup_background
+from roi_crop import crop_to_roi
+from candidates import extract_candidates, best_by_circularity, distances_to
+from ball_kalman import BallKalman
+from stage_timer import StageTimer
+from frame_cache import CachedCapture
 
 def get_court_roi_mask(frame_shape):
     """코트 영역 ROI 마스크"""
@@ -19,11 +29,24 @@ def distance(p1, p2):
     """유클리드 거리"""
     return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
-def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
+def track_ball_with_confidence(video_path, start_frame=200, num_frames=50, crop_roi=True,
+                               use_kalman=True, profile=False, frame_cache=False):
     """
     신뢰도 기반 공 추적
+
+    Args:
+        crop_roi: True면 ROI 사각형만 잘라서 처리 (bitwise_and 전체 마스킹 대신)
+        use_kalman: True면 마지막 위치 대신 칼만 예측 위치 기준으로 게이팅
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
+        frame_cache: True면 분석 구간을 raw 프레임 캐시(frame_cache/)에서 읽음 - 반복 실행 시 디코딩 없음
+
+    Returns:
+        공 궤적 리스트 (frame, position, area, circularity, confidence, method)
     """
-    cap = cv2.VideoCapture(video_path)
+    if frame_cache:
+        cap = CachedCapture(video_path, start_frame, num_frames)
+    else:
+        cap = cv2.VideoCapture(video_path)
     
     if not cap.isOpened():
         print("✗ 영상을 열 수 없습니다.")
@@ -54,20 +77,11 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    
-    # 배경 학습
-    print(f"\n배경 학습 중...")
-    for i in range(start_frame):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-        bg_subtractor.apply(frame_roi)
-        if i % 50 == 0:
-            print(f"  {i} 프레임...")
-    
-    print(f"✓ 완료\n")
+    # 배경 학습 (⭐ 캐시 있으면 0 ~ start_frame 디코딩 생략)
+    print()
+    warmup_background(cap, bg_subtractor, video_path, start_frame, roi_mask=roi_mask,
+                      roi_coords=roi_coords if crop_roi else None)
+    print(f"✓ 배경 학습 완료\n")
     
     # 추적 변수
     ball_trajectory = []
@@ -75,62 +89,49 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
     tracking_confidence = 0  # 신뢰도 점수 ⭐
     max_distance = 50
     min_confidence = -2  # 이하면 추적 중단
+    kalman = BallKalman()
     
     print("추적 시작...")
     print("=" * 50)
     
+    timer = StageTimer(enabled=profile)
+    
     for i in range(num_frames):
+        timer.next_frame(start_frame + i)
         ret, frame = cap.read()
+        timer.lap('decode')
         if not ret:
             break
         
         current_frame = start_frame + i
         
         # Background Subtraction
-        frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-        fg_mask = bg_subtractor.apply(frame_roi)
-        fg_mask = cv2.bitwise_and(fg_mask, fg_mask, mask=roi_mask)
+        if crop_roi:
+            # ⭐ ROI만 잘라서 (복사 없는 슬라이스) → 이후 단계 모두 ROI 크기
+            frame_roi = crop_to_roi(frame, roi_coords)
+            fg_mask = bg_subtractor.apply(frame_roi)
+        else:
+            frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
+            fg_mask = bg_subtractor.apply(frame_roi)
+            fg_mask = cv2.bitwise_and(fg_mask, fg_mask, mask=roi_mask)
+        timer.lap('knn')
         
         # 노이즈 제거
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel, iterations=2)
         fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        timer.lap('morphology')
         
-        # 윤곽선
-        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 후보 필터링
-        candidates = []
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            
-            # 크기: 공은 작음, 선수는 큼
-            if area < 15 or area > 250:  # 더 좁은 범위 ⭐
-                continue
-            
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = w / h if h > 0 else 0
-            
-            if aspect_ratio < 0.6 or aspect_ratio > 1.7:  # 더 엄격 ⭐
-                continue
-            
-            perimeter = cv2.arcLength(contour, True)
-            if perimeter == 0:
-                continue
-            circularity = 4 * np.pi * area / (perimeter * perimeter)
-            
-            if circularity < 0.4:  # 더 엄격 ⭐
-                continue
-            
-            center = (x + w//2, y + h//2)
-            
-            candidates.append({
-                'center': center,
-                'area': area,
-                'bbox': (x, y, w, h),
-                'circularity': circularity
-            })
+        # 후보 필터링 (connected components 1회)
+        # crop 모드: offset으로 ROI 좌표 → 프레임 좌표 변환
+        candidates, _ = extract_candidates(
+            fg_mask,
+            min_area=15, max_area=250,            # 더 좁은 범위 ⭐
+            min_aspect=0.6, max_aspect=1.7,       # 더 엄격 ⭐
+            min_circularity=0.4,                  # 더 엄격 ⭐
+            offset=(x1, y1) if crop_roi else (0, 0)
+        )
+        timer.lap('candidates')
         
         # 신뢰도 기반 선택 ⭐
         selected_ball = None
@@ -141,36 +142,38 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
             last_ball_position = None
             tracking_confidence = 0
             selection_method = "RESET"
+            kalman.reset()
+        
+        # ⭐ 칼만 예측 (속도 반영된 다음 위치)
+        if use_kalman and kalman.initialized:
+            kalman.predict()
         
         if last_ball_position is None:
             # 첫 프레임 or 리셋: 원형도 최고
-            if candidates:
-                selected_ball = max(candidates, key=lambda c: c['circularity'])
+            best = best_by_circularity(candidates)
+            if best is not None:
+                selected_ball = candidates[best]
                 selection_method = "INIT"
                 tracking_confidence = 1
         else:
             # 궤적 기반
-            nearby = []
-            
-            for candidate in candidates:
-                dist = distance(candidate['center'], last_ball_position)
+            if use_kalman and kalman.initialized:
+                # 예측 위치 기준 Mahalanobis 게이팅 (빠른 샷도 예측 창 안)
+                dists = distances_to(candidates, kalman.position)
+                nearby = kalman.mahalanobis(candidates['cx'], candidates['cy']) <= kalman.gate
+            else:
+                dists = distances_to(candidates, last_ball_position)
                 
-                if dist <= max_distance:
-                    # 속도 체크 ⭐
-                    speed = dist  # 프레임당 픽셀
-                    if speed > 40:  # 너무 빠르면 의심
-                        continue
-                    
-                    candidate['distance'] = dist
-                    nearby.append(candidate)
+                # 속도 체크 ⭐ (프레임당 픽셀, 너무 빠르면 의심)
+                nearby = (dists <= max_distance) & (dists <= 40)
             
-            if nearby:
+            if nearby.any():
                 # 가까운 것 중 가장 둥근 것 ⭐
-                nearby_sorted = sorted(nearby, key=lambda c: c['circularity'], reverse=True)
-                selected_ball = nearby_sorted[0]
+                best = int(np.argmax(np.where(nearby, candidates['circularity'], -1)))
+                selected_ball = candidates[best]
                 
                 # 거리도 고려
-                if selected_ball['distance'] < 20:
+                if dists[best] < 20:
                     tracking_confidence += 1  # 가까우면 신뢰도 상승
                     selection_method = "TRACK_GOOD"
                 else:
@@ -182,24 +185,34 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
                 selection_method = "LOST"
                 
                 # 신뢰도 여유 있으면 원형도로 시도
-                if tracking_confidence > 0 and candidates:
-                    selected_ball = max(candidates, key=lambda c: c['circularity'])
+                best = best_by_circularity(candidates)
+                if tracking_confidence > 0 and best is not None:
+                    selected_ball = candidates[best]
                     selection_method = "RECOVER"
         
         # 궤적 업데이트
-        if selected_ball:
+        if selected_ball is not None:
+            center = (int(selected_ball['cx']), int(selected_ball['cy']))
             ball_trajectory.append({
                 'frame': current_frame,
-                'position': selected_ball['center'],
-                'area': selected_ball['area'],
-                'circularity': selected_ball['circularity'],
+                'position': center,
+                'area': float(selected_ball['area']),
+                'circularity': float(selected_ball['circularity']),
                 'confidence': tracking_confidence,
                 'method': selection_method
             })
-            last_ball_position = selected_ball['center']
+            last_ball_position = center
+            
+            if use_kalman:
+                if selection_method.startswith("TRACK") and kalman.initialized:
+                    kalman.update(center)
+                else:
+                    # INIT / RECOVER: 새 위치에서 다시 시작
+                    kalman.init(center)
         
         # 신뢰도 제한
         tracking_confidence = max(min_confidence, min(tracking_confidence, 5))
+        timer.lap('select')
         
         # 시각화
         result_frame = frame.copy()
@@ -209,13 +222,13 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
         
         # 모든 후보 (회색)
         for candidate in candidates:
-            x, y, w, h = candidate['bbox']
+            x, y, w, h = [int(v) for v in candidate[['x', 'y', 'w', 'h']]]
             cv2.rectangle(result_frame, (x, y), (x+w, y+h), (128, 128, 128), 1)
         
         # 선택된 공
-        if selected_ball:
-            x, y, w, h = selected_ball['bbox']
-            cx, cy = selected_ball['center']
+        if selected_ball is not None:
+            x, y, w, h = [int(v) for v in selected_ball[['x', 'y', 'w', 'h']]]
+            cx, cy = center
             
             # 신뢰도에 따라 색상 변경 ⭐
             if tracking_confidence > 2:
@@ -248,6 +261,7 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
         stats = f"Frame {current_frame} | Candidates: {len(candidates)}"
         cv2.putText(result_frame, stats, (10, 60),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        timer.lap('draw')
         
         # 저장 (매 5프레임)
         if i % 5 == 0:
@@ -255,8 +269,9 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
                 os.path.join(output_dir, f'frame_{current_frame:04d}_tracked.jpg'),
                 result_frame
             )
+        timer.lap('save')
         
-        detected = "✓" if selected_ball else "✗"
+        detected = "✓" if selected_ball is not None else "✗"
         print(f"Frame {current_frame:4d}: {len(candidates):2d} 후보 | {detected} | "
               f"신뢰도: {tracking_confidence:4.1f} | {selection_method}")
     
@@ -279,6 +294,9 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
     for method, count in sorted(methods.items()):
         print(f"  {method:15s}: {count:3d} ({count/len(ball_trajectory)*100:.1f}%)")
     
+    timer.print_stats()
+    if profile:
+        timer.dump_timeline(os.path.join(output_dir, 'timeline.csv'))
     print("=" * 50)
     
     # CSV 저장
@@ -294,6 +312,8 @@ def track_ball_with_confidence(video_path, start_frame=200, num_frames=50):
     
     print(f"\n✓ 완료: {output_dir}")
     print(f"  open {output_dir}")
+    
+    return ball_trajectory
 
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -1,68 +1,114 @@
 import cv2
 import numpy as np
 import os
+import sys
 
-def get_court_roi_mask(frame_shape):
-    """코트 ROI"""
-    height, width = frame_shape[:2]
-    mask = np.zeros((height, width), dtype=np.uint8)
-    
-    y1 = int(height * 0.10)
-    y2 = int(height * 0.90)
-    x1 = int(width * 0.20)
-    x2 = int(width * 0.80)
-    
-    mask[y1:y2, x1:x2] = 255
-    return mask, (x1, y1, x2, y2)
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from frame_reader import FrameReader
+from bg_cache import warmup_background
+from ball_pipeline import BallPipeline, trajectory_point
+from debug_writer import DebugWriter
+from stage_timer import StageTimer
+from trajectory_store import TrajectoryStore, ball_rows
+from proxy_video import proxy_scale
+from frame_cache import CachedCapture, video_key
+from checkpoint import Checkpointer
 
-def get_net_exclusion_mask(frame_shape):
+# 선수 제거 / 네트 제외는 BallPipeline 안에서 (candidates.extract_candidates의 player_min_area,
+# roi_crop.get_net_band) - player_tracker도 같은 선수 기준을 쓴다
+
+def draw_tracking(frame, result, roi_coords, ball_trajectory, current_frame, scale=1.0):
     """
-    네트 라인 근처 제외 마스크
+    추적 결과 시각화 (디버그 이미지용)
+
+    scale: 프록시 영상이면 궤적(원본 좌표)을 프레임 좌표로 되돌릴 비율
     """
-    height, width = frame_shape[:2]
-    mask = np.ones((height, width), dtype=np.uint8) * 255
+    candidates = result['candidates']
+    selected_ball = result['ball']
+    players_mask = result['players_mask']
+    mask_origin = result['mask_origin']
+    window = result['window']
+    x1, y1, x2, y2 = roi_coords
     
-    # 네트 위치 (화면 중앙, 가로로)
-    net_y_center = int(height * 0.45)  # 화면 45% 지점
-    net_thickness = int(height * 0.05)  # 위아래 5%
+    result_frame = frame.copy()
     
-    # 네트 근처 검정색으로
-    mask[net_y_center - net_thickness:net_y_center + net_thickness, :] = 0
+    # ROI
+    cv2.rectangle(result_frame, (x1, y1), (x2, y2), (100, 100, 100), 1)
     
-    return mask
-
-def distance(p1, p2):
-    """유클리드 거리"""
-    return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-
-def remove_large_objects(mask, min_area=500):
-    """
-    큰 객체(선수) 제거
-    """
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # 선수 영역 (빨간색) - 마스크가 덮는 영역만
+    ox, oy = mask_origin
+    mh, mw = players_mask.shape
+    result_players = result_frame[oy:oy+mh, ox:ox+mw]
+    result_players[players_mask > 0] = result_players[players_mask > 0] * 0.5 + np.array([0, 0, 128]) * 0.5
     
-    # 큰 객체 마스크
-    large_objects_mask = np.zeros_like(mask)
+    # 모든 후보 (회색)
+    for candidate in candidates:
+        x, y, w, h = [int(v) for v in candidate[['x', 'y', 'w', 'h']]]
+        cv2.rectangle(result_frame, (x, y), (x+w, y+h), (128, 128, 128), 1)
     
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area > min_area:  # 큰 객체 (선수)
-            cv2.drawContours(large_objects_mask, [contour], -1, 255, -1)
+    # 칼만 검색 창 (하늘색)
+    if window is not None:
+        cv2.rectangle(result_frame, window[:2], window[2:], (255, 255, 0), 1)
     
- # ⭐ 확장 (머리까지 커버)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (15, 15))
-    large_objects_mask = cv2.dilate(large_objects_mask, kernel, iterations=2)
-
-    # 큰 객체 제거
-    mask_without_large = cv2.bitwise_and(mask, cv2.bitwise_not(large_objects_mask))
+    # 선택된 공 (녹색)
+    if selected_ball is not None:
+        x, y, w, h = [int(v) for v in selected_ball[['x', 'y', 'w', 'h']]]
+        cx, cy = int(selected_ball['cx']), int(selected_ball['cy'])
+        
+        cv2.rectangle(result_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+        cv2.circle(result_frame, (cx, cy), 5, (0, 0, 255), -1)
+        
+        info = f"BALL: A={selected_ball['area']:.0f} C={selected_ball['circularity']:.2f}"
+        cv2.putText(result_frame, info, (x, y-5), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+    
+    # 궤적
+    if len(ball_trajectory) > 1:
+        recent = ball_trajectory[-10:]
+        for j in range(len(recent) - 1):
+            pt1 = tuple(int(v * scale) for v in recent[j]['position'])
+            pt2 = tuple(int(v * scale) for v in recent[j+1]['position'])
+            cv2.line(result_frame, pt1, pt2, (255, 0, 0), 2)
+    
+    # 통계
+    stats = f"Frame {current_frame} | Candidates: {len(candidates)} | Track: {len(ball_trajectory)}"
+    cv2.putText(result_frame, stats, (10, 30),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
     
-    return mask_without_large, large_objects_mask
+    return result_frame
 
-def track_ball_exclude_players(video_path, start_frame=200, num_frames=50):
+def track_ball_exclude_players(video_path, start_frame=200, num_frames=50, crop_roi=True,
+                               use_kalman=True, save_debug=True, debug_every=5, profile=False,
+                               frame_cache=False, motion='knn', schedule=None,
+                               checkpoint_every=0, resume=False):
     """
     선수 제외 후 공 추적
+
+    Args:
+        crop_roi: True면 ROI 사각형만 잘라서 처리 (bitwise_and 전체 마스킹 대신)
+        use_kalman: True면 칼만 예측 + Mahalanobis 게이팅 (False면 고정 max_distance)
+        save_debug: False면 디버그 이미지 저장 안 함 (시각화도 생략)
+        debug_every: 디버그 이미지 저장 간격 (프레임)
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
+        frame_cache: True면 분석 구간을 raw 프레임 캐시(frame_cache/)에서 읽음 - 반복 실행 시 디코딩 없음
+        motion: 움직임 마스크 엔진 ('knn', 'mog2', 'diff3' - 3프레임 차분, 배경 학습 없음)
+        schedule: BackgroundSchedule (배경 갱신 간격 / 워밍업 감쇠 / 랠리 중 동결)
+        checkpoint_every: 0보다 크면 이 프레임 수마다 체크포인트
+                          (추적 상태 + 배경 모델 + 궤적 flush, checkpoint.npz)
+        resume: True면 마지막 체크포인트 다음 프레임부터 이어서 (배경 학습 생략)
+                - 통계 / 반환값은 이번 실행분, ball_trajectory.npz는 전체
+
+    video_path가 프록시 영상(build_proxy)이면 축소 해상도로 처리하고
+    궤적 좌표는 원본 해상도로 돌려준다.
+
+    Returns:
+        공 궤적 리스트 (trajectory_point 형식, 원본 해상도 좌표)
     """
-    cap = cv2.VideoCapture(video_path)
+    if frame_cache:
+        cap = CachedCapture(video_path, start_frame, num_frames)
+    else:
+        cap = FrameReader(video_path)  # ⭐ 디코딩은 백그라운드 스레드
     
     if not cap.isOpened():
         print("✗ 영상을 열 수 없습니다.")
@@ -72,20 +118,23 @@ def track_ball_exclude_players(video_path, start_frame=200, num_frames=50):
     if not ret:
         return
     
-    roi_mask, roi_coords = get_court_roi_mask(first_frame.shape)
-    x1, y1, x2, y2 = roi_coords
+    # ⭐ 검출/추적 로직은 BallPipeline (src/ball_pipeline.py)
+    timer = StageTimer(enabled=profile)
+    scale = proxy_scale(video_path)
+    pipeline = BallPipeline(first_frame.shape, crop_roi=crop_roi, use_kalman=use_kalman,
+                            timer=timer, scale=scale, motion=motion, schedule=schedule)
+    roi_coords = pipeline.roi_coords
     
     print("선수 제외 공 추적")
     print("=" * 50)
     print(f"전략: 큰 객체(선수) 제거 → 작은 객체(공) 검출")
+    print(f"처리 방식: {'ROI crop' if crop_roi else '전체 프레임 마스킹'}")
+    print(f"궤적 게이팅: {'칼만 예측' if use_kalman else '고정 거리'}")
+    print(f"움직임 마스크: {motion}")
+    if scale != 1.0:
+        print(f"프록시: {first_frame.shape[1]}x{first_frame.shape[0]} (x{scale:.2f}, 좌표는 원본 기준)")
     print("=" * 50)
     
-    bg_subtractor = cv2.createBackgroundSubtractorKNN(
-        history=500,
-        dist2Threshold=400,
-        detectShadows=False
-    )
-    
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(script_dir)
     output_dir = os.path.join(project_root, 'data', 'ball_tracking_v3')
@@ -93,225 +142,129 @@ def track_ball_exclude_players(video_path, start_frame=200, num_frames=50):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    # ⭐ 디버그 이미지는 비동기 저장 (큐 가득 차면 버림 → 추적 속도 우선)
+    debug = DebugWriter(output_dir, every=debug_every, enabled=save_debug)
     
-    # 배경 학습
-    print(f"\n배경 학습 중...")
-    for i in range(start_frame):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-        bg_subtractor.apply(frame_roi)
-        if i % 50 == 0:
-            print(f"  {i} 프레임...")
+    # ⭐ 체크포인트 (설정이 같을 때만 재개)
+    checkpointer = Checkpointer(
+        os.path.join(output_dir, 'checkpoint.npz'), every=checkpoint_every,
+        meta={'video': video_key(video_path), 'start_frame': start_frame,
+              'num_frames': num_frames, 'crop_roi': crop_roi, 'use_kalman': use_kalman,
+              'motion': motion, 'schedule': schedule.describe() if schedule else None})
+    store = TrajectoryStore(os.path.join(output_dir, 'ball_trajectory.npz'))
+    checkpoint = checkpointer.load() if resume else None
     
-    print(f"✓ 완료\n")
+    print()
+    if checkpoint is not None:
+        # 추적 상태 + 배경 모델 복원, 체크포인트까지의 궤적은 파일에서 그대로 유지
+        first_frame_index = checkpointer.restore(pipeline, checkpoint)
+        store.append_rows(store.rows(rally_id=0, frame_range=(0, first_frame_index)))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame_index)
+        print(f"✓ 체크포인트에서 재개: Frame {first_frame_index}")
+    else:
+        # 배경 학습 (⭐ 캐시 있으면 0 ~ start_frame 디코딩 생략)
+        first_frame_index = start_frame
+        warmup_background(cap, pipeline.bg_subtractor, video_path, start_frame,
+                          roi_mask=pipeline.roi_mask,
+                          roi_coords=roi_coords if crop_roi else None,
+                          schedule=pipeline.schedule)
+        print(f"✓ 배경 학습 완료\n")
     
     # 추적 변수
     ball_trajectory = []
-    last_ball_position = None
-    max_distance = 60  # 조금 더 여유있게
+    flushed = 0  # 저장소에 넘긴 궤적 수
     
     print("추적 시작...")
     print("=" * 50)
     
-    for i in range(num_frames):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
+    for i in range(first_frame_index - start_frame, num_frames):
         current_frame = start_frame + i
+        timer.next_frame(current_frame)
         
-        # Background Subtraction
-        frame_roi = cv2.bitwise_and(frame, frame, mask=roi_mask)
-        fg_mask = bg_subtractor.apply(frame_roi)
-        fg_mask = cv2.bitwise_and(fg_mask, fg_mask, mask=roi_mask)
-        
-        # 노이즈 제거
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel, iterations=2)
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
-        
-        # ⭐ 선수 제거
-        fg_mask_small, players_mask = remove_large_objects(fg_mask, min_area=500)
-        
-        # 윤곽선 (작은 객체만)
-        contours, _ = cv2.findContours(fg_mask_small, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 후보 필터링 (v1 수준으로 완화)
-        candidates = []
-
-        # ⭐ 네트 제외 마스크 적용
-        net_mask = get_net_exclusion_mask(frame.shape)
-        fg_mask_small = cv2.bitwise_and(fg_mask_small, fg_mask_small, mask=net_mask)
-
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            
-            # 크기: v1 수준
-            if area < 10 or area > 400:
-                continue
-            
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = w / h if h > 0 else 0
-            
-            # 종횡비: 완화 - 타원형 허용 (모션 블러)
-            if aspect_ratio < 0.3 or aspect_ratio > 2.5:
-                continue
-            
-            # ⭐ 높이 필터 (너무 위/아래 제외)
-            frame_height = frame.shape[0]
-            if y < frame_height * 0.15 or y > frame_height * 0.90:
-                continue
-
-
-            perimeter = cv2.arcLength(contour, True)
-            if perimeter == 0:
-                continue
-            circularity = 4 * np.pi * area / (perimeter * perimeter)
-            
-            # 원형도: 완화 - 타원 허용
-            if circularity < 0.25:
-                continue
-            
-            center = (x + w//2, y + h//2)
-            
-            candidates.append({
-                'center': center,
-                'area': area,
-                'bbox': (x, y, w, h),
-                'circularity': circularity,
-                'aspect_ratio': aspect_ratio
-            })
-        
-        # 궤적 기반 선택
-        selected_ball = None
-        
-        if last_ball_position is None:
-            # 첫 프레임
-            if candidates:
-                selected_ball = max(candidates, key=lambda c: c['circularity'])
-        else:
-            # 가장 가까운 것
-            nearby = []
-            
-            for candidate in candidates:
-                dist = distance(candidate['center'], last_ball_position)
-                
-                if dist <= max_distance:
-                    candidate['distance'] = dist
-                    nearby.append(candidate)
-            
-            if nearby:
-                # 거리와 원형도 조합
-                # 가까우면서 둥근 것
-                for c in nearby:
-                    c['score'] = c['circularity'] / (c['distance'] + 1)
-                
-                selected_ball = max(nearby, key=lambda c: c['score'])
-            elif candidates:
-                # 근처에 없으면 원형도로
-                selected_ball = max(candidates, key=lambda c: c['circularity'])
-        
-        # 궤적 업데이트
-        if selected_ball:
-            ball_trajectory.append({
-                'frame': current_frame,
-                'position': selected_ball['center'],
-                'area': selected_ball['area'],
-                'circularity': selected_ball['circularity']
-            })
-            last_ball_position = selected_ball['center']
-        
-        # 시각화
-        result_frame = frame.copy()
+        with timer.stage('decode'):
+            ret, frame = cap.read()
+        if not ret:
+            break
         
-        # ROI
-        cv2.rectangle(result_frame, (x1, y1), (x2, y2), (100, 100, 100), 1)
         
-        # 선수 영역 (빨간색)
-        result_frame[players_mask > 0] = result_frame[players_mask > 0] * 0.5 + np.array([0, 0, 128]) * 0.5
+        # Background Subtraction → 노이즈 제거 → 선수 제거 + 후보 필터링 → 궤적 기반 선택
+        result = pipeline.process(frame)
+        candidates = result['candidates']
+        selected_ball = result['ball']
+        fg_mask = result['fg_mask']
+        players_mask = result['players_mask']
         
-        # 모든 후보 (회색)
-        for candidate in candidates:
-            x, y, w, h = candidate['bbox']
-            cv2.rectangle(result_frame, (x, y), (x+w, y+h), (128, 128, 128), 1)
+        # 궤적 업데이트 (diff3는 한 프레임 전 결과 → delay만큼 앞 프레임 번호)
+        if selected_ball is not None:
+            ball_trajectory.append(trajectory_point(current_frame - pipeline.delay,
+                                                    selected_ball, scale))
         
-        # 선택된 공 (녹색)
-        if selected_ball:
-            x, y, w, h = selected_ball['bbox']
-            cx, cy = selected_ball['center']
+        # 디버그 이미지 (⭐ 샘플링된 프레임만 시각화, 저장은 백그라운드 스레드)
+        if debug.should_write(i):
+            with timer.stage('draw'):
+                result_frame = draw_tracking(frame, result, roi_coords, ball_trajectory,
+                                             current_frame, scale)
+                fg_mask_small = cv2.bitwise_and(fg_mask, cv2.bitwise_not(players_mask))
             
-            cv2.rectangle(result_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.circle(result_frame, (cx, cy), 5, (0, 0, 255), -1)
-            
-            info = f"BALL: A={selected_ball['area']:.0f} C={selected_ball['circularity']:.2f}"
-            cv2.putText(result_frame, info, (x, y-5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
-        
-        # 궤적
-        if len(ball_trajectory) > 1:
-            recent = ball_trajectory[-10:]
-            for j in range(len(recent) - 1):
-                pt1 = recent[j]['position']
-                pt2 = recent[j+1]['position']
-                cv2.line(result_frame, pt1, pt2, (255, 0, 0), 2)
-        
-        # 통계
-        stats = f"Frame {current_frame} | Candidates: {len(candidates)} | Track: {len(ball_trajectory)}"
-        cv2.putText(result_frame, stats, (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-        
-        # 저장
-        if i % 5 == 0:
             # 3단계 비교
-            cv2.imwrite(
-                os.path.join(output_dir, f'frame_{current_frame:04d}_1_original.jpg'),
-                frame
-            )
-            cv2.imwrite(
-                os.path.join(output_dir, f'frame_{current_frame:04d}_2_mask_all.jpg'),
-                fg_mask
-            )
-            cv2.imwrite(
-                os.path.join(output_dir, f'frame_{current_frame:04d}_3_mask_small.jpg'),
-                fg_mask_small
-            )
-            cv2.imwrite(
-                os.path.join(output_dir, f'frame_{current_frame:04d}_4_players.jpg'),
-                players_mask
-            )
-            cv2.imwrite(
-                os.path.join(output_dir, f'frame_{current_frame:04d}_5_tracked.jpg'),
-                result_frame
-            )
+            with timer.stage('save'):
+                debug.write(f'frame_{current_frame:04d}_1_original.jpg', frame)
+                debug.write(f'frame_{current_frame:04d}_2_mask_all.jpg', fg_mask)
+                debug.write(f'frame_{current_frame:04d}_3_mask_small.jpg', fg_mask_small)
+                debug.write(f'frame_{current_frame:04d}_4_players.jpg', players_mask)
+                debug.write(f'frame_{current_frame:04d}_5_tracked.jpg', result_frame)
         
-        detected = "✓" if selected_ball else "✗"
+        detected = "✓" if selected_ball is not None else "✗"
         print(f"Frame {current_frame:4d}: {len(candidates):2d} 후보 | {detected}")
+        
+        # 체크포인트 (궤적 flush 먼저 - 체크포인트 프레임까지는 항상 파일에 있음)
+        checkpointer.remember(pipeline, frame)
+        if checkpointer.due():
+            with timer.stage('checkpoint'):
+                store.append_rows(ball_rows(ball_trajectory[flushed:]))
+                flushed = len(ball_trajectory)
+                store.flush()
+                checkpointer.save(current_frame, pipeline)
     
     cap.release()
+    debug.close()
+    tracked_frames = num_frames - (first_frame_index - start_frame)
     
     # 통계
     print("\n" + "=" * 50)
     print("추적 통계")
     print("=" * 50)
-    print(f"총 프레임: {num_frames}")
-    print(f"공 검출: {len(ball_trajectory)} ({len(ball_trajectory)/num_frames*100:.1f}%)")
+    print(f"총 프레임: {tracked_frames}"
+          + (f" (Frame {first_frame_index}부터 재개)" if checkpoint is not None else ""))
+    print(f"공 검출: {len(ball_trajectory)} ({len(ball_trajectory)/max(tracked_frames, 1)*100:.1f}%)")
+    if use_kalman:
+        print(f"예측 창 검색: {pipeline.windowed_frames} 프레임 "
+              f"({pipeline.windowed_frames/num_frames*100:.1f}%)")
+    print("-" * 50)
+    cap.print_stats()
+    debug.print_stats()
+    timer.print_stats()
+    if pipeline.schedule is not None:
+        pipeline.schedule.print_stats()
+    checkpointer.print_stats()
     print("=" * 50)
     
-    # CSV
-    if ball_trajectory:
-        csv_path = os.path.join(output_dir, 'ball_trajectory.csv')
-        with open(csv_path, 'w') as f:
-            f.write("frame,x,y,area,circularity\n")
-            for point in ball_trajectory:
-                f.write(f"{point['frame']},{point['position'][0]},{point['position'][1]},"
-                       f"{point['area']:.1f},{point['circularity']:.3f}\n")
-        print(f"✓ CSV: {csv_path}")
+    if profile:
+        timeline_path = os.path.join(output_dir, 'timeline.csv')
+        timer.dump_timeline(timeline_path)
+        print(f"✓ 타임라인: {timeline_path}")
+    
+    # 궤적 저장 (컬럼 저장소, 신뢰도 = 원형도)
+    if ball_trajectory or checkpoint is not None:
+        store.append_rows(ball_rows(ball_trajectory[flushed:]))
+        store.flush()
+        print(f"✓ 궤적: {store.path} ({len(store)} 행)")
+    checkpointer.remove()
     
     print(f"\n✓ 완료: {output_dir}")
     print(f"  open {output_dir}")
+    
+    return ball_trajectory
 
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -1,16 +1,45 @@
 import cv2
 import numpy as np
 import os
-import csv
 from datetime import datetime
+import sys
+
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from frame_reader import FrameReader
+from frame_ring import FrameRing
+from seek_cache import SeekableCapture
+from trajectory_store import TrajectoryStore, export_csv, METHODS
+from stage_timer import StageTimer
+from frame_cache import video_key
+from checkpoint import save_checkpoint, load_checkpoint
+from tracker_factory import SwitchingTracker
+from redetect import Redetector, update_with_recovery
+from rally_session import RallySession, session_path_for
+
 
 class InteractiveTracker:
     """
     인터랙티브 공 추적 시스템
+
+    Args:
+        video_path: 영상 경로
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
+        ring_budget_mb: 최근 프레임 링 버퍼 메모리 (일시정지 후 뒤로 보기용)
+        checkpoint_every: 이 프레임 수마다 체크포인트 (현재 랠리 행 flush + 위치, 0이면 끔)
+        resume: True면 마지막 체크포인트 위치에서 이어서 (추적 중이던 랠리는 마지막 bbox로 재시작)
+        window: True면 CSRT에 마지막 bbox 주변 창만 넘김 (WindowedTracker), False면 전체 프레임
+        backend: 랠리 시작 추적기 ('csrt', 'kcf', 'mil', 'mosse', 'detector' - B 키로 변경)
+        auto_switch: True면 추적기가 재생 속도를 못 따라갈 때 더 빠른 추적기로 자동 전환
+                     (기본 꺼짐 - 전환하면 정확도가 떨어지므로 느려도 고른 추적기 유지)
+        redetect: True면 추적 실패 시 마지막 위치 주변에서 공 재검출 → 재초기화
     """
-    def __init__(self, video_path):
+    def __init__(self, video_path, profile=False, ring_budget_mb=256, checkpoint_every=300,
+                 resume=False, window=True, backend='csrt', auto_switch=False, redetect=True):
         self.video_path = video_path
-        self.cap = cv2.VideoCapture(video_path)
+        # ⭐ 디코딩은 백그라운드 스레드, ←/→ 이동은 키프레임 인덱스 + 최근 프레임 캐시
+        self.seeker = SeekableCapture(video_path)
+        self.cap = FrameReader(self.seeker)
         
         if not self.cap.isOpened():
             raise ValueError("영상을 열 수 없습니다.")
@@ -22,11 +51,25 @@ class InteractiveTracker:
         
         # 추적 상태
         self.tracker = None
+        # ⭐ 랠리마다 init()으로 재사용 (예산 = 프레임 간격의 절반, 나머지는 디코딩/그리기)
+        self.selector = SwitchingTracker(preferred=backend, auto=auto_switch,
+                                         budget_ms=500 / self.fps, window=window)
+        # ⭐ 놓치면 주변 창 재검출 (수동 ROI 선택 대신)
+        self.redetector = Redetector() if redetect else None
         self.tracking = False
         self.paused = False
         self.rally_count = 0
         self.all_trajectories = []
         self.current_trajectory = []
+        self.current_methods = []  # 행별 추적기 이름 (자동 전환 기록)
+        self.flushed = 0  # 현재 랠리에서 저장소에 넘긴 행 수
+        self.timer = StageTimer(enabled=profile)
+        
+        # ⭐ 최근 프레임 링 버퍼 (일시정지 중 ←/→, ROI 선택은 디코더 안 건드림)
+        frame_shape = (self.height, self.width, 3)
+        self.ring = FrameRing(frame_shape, budget_mb=ring_budget_mb)
+        self.display = np.empty(frame_shape, dtype=np.uint8)
+        self.view_index = -1  # 일시정지 중 보고 있는 프레임 번호
         
         # 출력 디렉토리
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -35,10 +78,26 @@ class InteractiveTracker:
         
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        
+        # ⭐ 랠리별 CSV 대신 컬럼 저장소 1개 (rally_id로 구분)
+        self.store = TrajectoryStore(os.path.join(self.output_dir, 'trajectories.npz'))
+        # ⭐ ROI 선택 기록 (src/rally_session.py로 GUI 없이 다시 추적)
+        self.session = RallySession(session_path_for(self.store.path), video_path)
+        
+        # ⭐ 체크포인트 (CSRT 내부 모델은 저장할 수 없으므로 마지막 bbox로 다시 초기화)
+        self.checkpoint_path = os.path.join(self.output_dir, 'checkpoint.npz')
+        self.checkpoint_every = checkpoint_every
+        self.since_checkpoint = 0
+        if resume:
+            self.resume()
     
-    def init_tracker(self, frame):
+    def init_tracker(self, frame, frame_index):
         """
         Tracker 초기화
+
+        Args:
+            frame: ROI를 고를 프레임 (링 버퍼 원본)
+            frame_index: 그 프레임 번호 (세션 기록용)
         """
         print("\n" + "=" * 50)
         print("공 주변에 박스를 그리세요")
@@ -53,18 +112,60 @@ class InteractiveTracker:
             return False
         
         # Tracker 생성
-        self.tracker = cv2.TrackerCSRT.create()
+        self.tracker = self.create_tracker()
         self.tracker.init(frame, bbox)
+        if self.redetector is not None:
+            self.redetector.start(bbox)
         
         self.tracking = True
         self.rally_count += 1
+        self.session.start(self.rally_count, frame_index, bbox, self.selector.backend)
         self.current_trajectory = []
+        self.current_methods = []
+        self.flushed = 0
         
         current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-        print(f"✓ Rally {self.rally_count} 시작 (Frame {current_frame})")
+        print(f"✓ Rally {self.rally_count} 시작 (Frame {current_frame}, {self.selector.backend})")
         
         return True
     
+    def create_tracker(self):
+        """
+        랠리용 추적기 (init마다 선택된 추적기로 시작, 느리면 자동 전환)
+        """
+        return self.selector
+    
+    def track_frame(self, frame, frame_number):
+        """
+        Tracker 업데이트 + 궤적 1행 추가
+
+        실패하면 링 버퍼의 직전 2프레임으로 마지막 위치 주변 재검출
+
+        Returns:
+            (success, bbox)
+        """
+        index = frame_number - 1  # 링 버퍼 프레임 번호
+        success, bbox, method = update_with_recovery(self.tracker, self.redetector, frame,
+                                                     self.ring.get(index - 1),
+                                                     self.ring.get(index - 2))
+        if success:
+            x, y, w, h = [int(v) for v in bbox]
+            self.current_trajectory.append([frame_number, x, y, w, h, 1])
+        else:
+            self.current_trajectory.append([frame_number, -1, -1, -1, -1, 0])
+        self.current_methods.append(method)
+        return success, bbox
+    
+    def catch_up(self, from_index):
+        """
+        from_index 다음부터 최신 프레임까지 링 버퍼로 추적 (디코딩 없음)
+
+        뒤로 돌려 본 프레임에서 랠리를 시작했을 때 사용.
+        """
+        for index in range(from_index + 1, self.ring.latest + 1):
+            self.track_frame(self.ring.get(index), index + 1)
+        return self.ring.latest - from_index
+    
     def save_rally(self):
         """
         현재 랠리 데이터 저장
@@ -72,14 +173,9 @@ class InteractiveTracker:
         if not self.current_trajectory:
             return
         
-        # CSV 저장
-        filename = f'rally_{self.rally_count:02d}.csv'
-        filepath = os.path.join(self.output_dir, filename)
-        
-        with open(filepath, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['frame', 'x', 'y', 'width', 'height', 'success'])
-            writer.writerows(self.current_trajectory)
+        # 저장소에 추가 (파일 교체는 원자적)
+        self.flush_rally()
+        self.session.end(self.rally_count, self.current_trajectory[-1][0] - 1)
         
         # 전체 데이터에 추가
         self.all_trajectories.append({
@@ -92,6 +188,80 @@ class InteractiveTracker:
         
         print(f"✓ Rally {self.rally_count} 저장: {len(self.current_trajectory)} 프레임")
     
+    def flush_rally(self):
+        """
+        현재 랠리에서 아직 안 넘긴 행만 저장소에 추가 + 파일 기록
+        """
+        if self.flushed < len(self.current_trajectory):
+            self.store.append_rally(self.rally_count, self.current_trajectory[self.flushed:],
+                                    method=self.current_methods[self.flushed:])
+            self.flushed = len(self.current_trajectory)
+        self.store.flush()
+    
+    def write_checkpoint(self):
+        """
+        체크포인트: 현재 랠리 행 flush 후 위치 / 랠리 번호 / 마지막 bbox 저장
+        """
+        if self.tracking:
+            self.flush_rally()
+        
+        # 마지막으로 추적 성공한 bbox (재개할 때 CSRT 재초기화용)
+        bbox = None
+        if self.tracking:
+            found = [t for t in self.current_trajectory if t[5] == 1]
+            if found:
+                bbox = found[-1][1:5]
+        
+        save_checkpoint(self.checkpoint_path, self.cap.frame_index, video_key(self.video_path),
+                        state={'rally_count': self.rally_count,
+                               'tracking': int(self.tracking and bbox is not None),
+                               'bbox': bbox})
+        self.since_checkpoint = 0
+    
+    def resume(self):
+        """
+        마지막 체크포인트에서 이어서 (위치 + 랠리 번호, 추적 중이었으면 같은 랠리 계속)
+        """
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        if checkpoint is None:
+            print("체크포인트 없음 - 처음부터")
+            return False
+        if checkpoint['meta'] != video_key(self.video_path):
+            print(f"✗ 다른 영상의 체크포인트 - 처음부터: {self.checkpoint_path}")
+            return False
+        
+        state = checkpoint['state']
+        frame_index = checkpoint['frame_index']
+        self.rally_count = int(state['rally_count'])
+        
+        # 체크포인트 프레임 다시 읽기 (링 버퍼 + CSRT 재초기화)
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, max(frame_index, 0))
+        ret, frame = self.cap.read()
+        if not ret:
+            return False
+        self.ring.push(self.cap.frame_index, frame)
+        self.view_index = self.cap.frame_index
+        
+        if state['tracking']:
+            # 이미 저장된 행을 이어 붙임 (다음 flush에서 이 랠리 전체를 다시 씀)
+            rows = self.store.rows(rally_id=self.rally_count)
+            self.current_trajectory = [[int(r['frame']), int(r['x']), int(r['y']),
+                                        int(r['width']), int(r['height']), int(r['success'])]
+                                       for r in rows]
+            self.current_methods = [METHODS[r['method']] for r in rows]
+            self.flushed = 0
+            self.tracker = self.create_tracker()
+            self.tracker.init(frame, tuple(int(v) for v in state['bbox']))
+            if self.redetector is not None:
+                self.redetector.start(state['bbox'])
+            self.tracking = True
+            print(f"✓ 체크포인트에서 재개: Frame {frame_index + 1}, "
+                  f"Rally {self.rally_count} 추적 계속 ({len(self.current_trajectory)} 프레임)")
+        else:
+            self.paused = True
+            print(f"✓ 체크포인트에서 재개: Frame {frame_index + 1} (랠리 {self.rally_count}개)")
+        return True
+    
     def run(self):
         """
         메인 루프
@@ -103,34 +273,39 @@ class InteractiveTracker:
         print("  SPACE: 일시정지/재생")
         print("  R: 새 랠리 시작 (일시정지 상태에서)")
         print("  S: 현재 랠리 저장 및 종료")
+        print("  B: 다음 랠리 추적기 바꾸기")
         print("  Q: 전체 종료")
         print("  →: 10프레임 앞으로")
-        print("  ←: 10프레임 뒤로")
+        print("  ←: 10프레임 뒤로 (일시정지 중에는 링 버퍼 안에서 이동, 디코딩 없음)")
         print("=" * 50)
         
         delay = int(1000 / self.fps)
+        finished = False
         
         while True:
             if not self.paused:
+                self.timer.next_frame(int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)))
                 ret, frame = self.cap.read()
+                self.timer.lap('decode')
                 if not ret:
                     print("\n영상 끝")
+                    finished = True
                     break
                 
                 current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
                 
+                # 그리기 전에 원본 보관
+                self.ring.push(self.cap.frame_index, frame)
+                self.view_index = self.cap.frame_index
+                
                 # 추적 중이면 업데이트
                 if self.tracking and self.tracker:
-                    success, bbox = self.tracker.update(frame)
+                    success, bbox = self.track_frame(frame, current_frame)
+                    self.timer.lap('tracker')
                     
                     if success:
                         x, y, w, h = [int(v) for v in bbox]
                         
-                        # 데이터 저장
-                        self.current_trajectory.append([
-                            current_frame, x, y, w, h, 1
-                        ])
-                        
                         # 시각화
                         cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
                         cx, cy = x + w//2, y + h//2
@@ -142,14 +317,16 @@ class InteractiveTracker:
                                    0.6, (0, 255, 0), 2)
                     else:
                         # 추적 실패
-                        self.current_trajectory.append([
-                            current_frame, -1, -1, -1, -1, 0
-                        ])
-                        
                         cv2.putText(frame, f"Rally {self.rally_count}: Lost", 
                                    (50, 80), cv2.FONT_HERSHEY_SIMPLEX, 
                                    1, (0, 0, 255), 3)
                 
+                # 주기적 체크포인트 (중간에 죽어도 여기부터 재개)
+                self.since_checkpoint += 1
+                if self.checkpoint_every and self.since_checkpoint >= self.checkpoint_every:
+                    self.write_checkpoint()
+                    self.timer.lap('checkpoint')
+                
                 # 정보 표시
                 cv2.putText(frame, f"Frame: {current_frame}/{self.total_frames}", 
                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
@@ -161,23 +338,33 @@ class InteractiveTracker:
                     cv2.putText(frame, f"Success: {success_rate:.1f}%", 
                                (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
             else:
-                # 일시정지 상태
-                ret, frame = self.cap.read()
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 
-                            self.cap.get(cv2.CAP_PROP_POS_FRAMES) - 1)
-                
-                if not ret:
-                    break
+                # 일시정지 상태 (⭐ 링 버퍼에서 복사 - 디코더 안 건드림)
+                if self.view_index not in self.ring:
+                    # 링 버퍼 밖으로 이동한 경우만 디코딩
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, max(self.view_index, 0))
+                    ret, decoded = self.cap.read()
+                    if not ret:
+                        break
+                    self.ring.push(self.cap.frame_index, decoded)
+                    self.view_index = self.cap.frame_index
                 
+                np.copyto(self.display, self.ring.get(self.view_index))
+                frame = self.display
+                behind = self.ring.latest - self.view_index
+                cv2.putText(frame, f"Frame: {self.view_index + 1}/{self.total_frames}"
+                           + (f" (-{behind})" if behind > 0 else ""),
+                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                 cv2.putText(frame, "PAUSED - Press R to start rally", 
                            (50, self.height//2), cv2.FONT_HERSHEY_SIMPLEX, 
                            1, (0, 255, 255), 3)
             
             # 화면 표시
+            self.timer.lap('draw')
             cv2.imshow('Interactive Tracking', frame)
             
             # 키 입력
             key = cv2.waitKey(delay if not self.paused else 100) & 0xFF
+            self.timer.lap('display')
 
             if key != 255:  # ⭐ 키가 눌리면 출력
                 print(f"[DEBUG] Key pressed: {key} ('{chr(key) if 32 <= key <= 126 else '?'}')")
@@ -186,12 +373,19 @@ class InteractiveTracker:
                 # 종료
                 if self.tracking and self.current_trajectory:
                     self.save_rally()
+                self.tracking = False
+                if self.checkpoint_every:
+                    self.write_checkpoint()
                 break
             elif key == ord(' '):
                 # 일시정지/재생
                 self.paused = not self.paused
                 status = "일시정지" if self.paused else "재생"
                 print(f"\n[{status}]")
+                
+                # 뒤로 돌려 보던 중이면 그 다음 프레임부터 재생
+                if not self.paused and self.view_index != self.cap.frame_index:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.view_index + 1)
             elif key == ord('r'):
                 print(f"[DEBUG] R key detected, paused={self.paused}")
                 
@@ -201,39 +395,53 @@ class InteractiveTracker:
                     self.save_rally()
                     self.tracking = False
                 
-                # ⭐ 현재 프레임 가져오기 (더 확실하게)
-                current_frame_num = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+                # ⭐ 보고 있는 프레임 원본 (링 버퍼 - 그리기 전 상태, 디코딩 없음)
+                start_index = self.view_index
+                start_frame = self.ring.get(start_index)
                 
-                # ⭐ 이미 읽은 프레임 사용 (일시정지 상태에서 저장된 것)
-                # 또는 새로 읽기
-                if 'frame' not in locals() or frame is None:
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame_num - 1)
-                    ret, frame = self.cap.read()
-                else:
-                    ret = True
+                print(f"[DEBUG] Current frame: {start_index + 1}, ret={start_frame is not None}")
                 
-                print(f"[DEBUG] Current frame: {current_frame_num}, ret={ret}")
-                
-                if ret and frame is not None:
+                if start_frame is not None:
                     print("[DEBUG] Calling init_tracker...")
                     # ⭐ 박스 그리기 전에 창 확인
                     cv2.destroyAllWindows()  # 기존 창 닫기
-                    success = self.init_tracker(frame)
+                    success = self.init_tracker(start_frame, start_index)
                     if success:
+                        # 뒤로 돌려 고른 프레임이면 최신 프레임까지 따라잡기
+                        caught_up = self.catch_up(start_index)
+                        if caught_up > 0:
+                            print(f"✓ 링 버퍼로 {caught_up} 프레임 따라잡음")
                         self.paused = False
+                        if self.checkpoint_every:
+                            self.write_checkpoint()
                 else:
                     print("[DEBUG] Failed to read frame")
-
+            elif key == ord('b'):
+                # 다음 랠리 추적기 (지금 랠리는 그대로)
+                print(f"\n다음 랠리 추적기: {self.selector.cycle()}")
+            elif key == ord('s'):
                 # 현재 랠리 저장 및 종료
                 if self.tracking and self.current_trajectory:
                     self.save_rally()
                     self.tracking = False
+                    if self.checkpoint_every:
+                        self.write_checkpoint()
                     print("\n현재 랠리 저장 완료")
+            elif key == 83 and self.paused:  # 오른쪽 화살표 (일시정지)
+                # 10프레임 앞으로 (링 버퍼 안이면 디코딩 없음)
+                self.view_index = min(self.view_index + 10, self.total_frames - 1)
+                source = "링 버퍼" if self.view_index in self.ring else "디코딩"
+                print(f"\n→ Frame {self.view_index + 1} ({source})")
             elif key == 83:  # 오른쪽 화살표
                 # 10프레임 앞으로
                 current = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
                 self.cap.set(cv2.CAP_PROP_POS_FRAMES, min(current + 10, self.total_frames))
                 print(f"\n→ Frame {int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))}")
+            elif key == 81 and self.paused:  # 왼쪽 화살표 (일시정지)
+                # 10프레임 뒤로 (링 버퍼 안이면 디코딩 없음)
+                self.view_index = max(self.view_index - 10, 0)
+                source = "링 버퍼" if self.view_index in self.ring else "디코딩"
+                print(f"\n← Frame {self.view_index + 1} ({source})")
             elif key == 81:  # 왼쪽 화살표
                 # 10프레임 뒤로
                 current = self.cap.get(cv2.CAP_PROP_POS_FRAMES)
@@ -243,6 +451,10 @@ class InteractiveTracker:
         self.cap.release()
         cv2.destroyAllWindows()
         
+        # 영상 끝까지 봤으면 체크포인트 필요 없음
+        if finished and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        
         # 최종 요약
         self.print_summary()
     
@@ -254,6 +466,14 @@ class InteractiveTracker:
         print("추적 완료")
         print("=" * 50)
         print(f"총 랠리: {self.rally_count}")
+        self.cap.print_stats()
+        self.seeker.print_stats()
+        self.selector.print_stats()
+        if self.redetector is not None:
+            self.redetector.print_stats()
+        self.timer.print_stats()
+        if self.timer.enabled:
+            self.timer.dump_timeline(os.path.join(self.output_dir, 'timeline.csv'))
         
         if self.all_trajectories:
             total_frames = sum(r['num_frames'] for r in self.all_trajectories)
@@ -267,7 +487,8 @@ class InteractiveTracker:
                       f"({rally['num_frames']} 프레임)")
         
         print("=" * 50)
-        print(f"✓ 데이터 저장: {self.output_dir}")
+        print(f"✓ 데이터 저장: {self.store.path}")
+        print(f"✓ 세션: {self.session.path} (python src/rally_session.py로 재추적)")
         
         # 통합 CSV 생성
         if self.all_trajectories:
@@ -275,17 +496,12 @@ class InteractiveTracker:
     
     def create_merged_csv(self):
         """
-        모든 랠리 데이터 통합 CSV
+        모든 랠리 데이터 통합 CSV (저장소에서 내보내기 - 사람이 보는 용도)
         """
         filepath = os.path.join(self.output_dir, 'all_rallies.csv')
-        
-        with open(filepath, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['rally_id', 'frame', 'x', 'y', 'width', 'height', 'success'])
-            
-            for rally in self.all_trajectories:
-                for point in rally['trajectory']:
-                    writer.writerow([rally['rally_id']] + point)
+        rally_ids = [rally['rally_id'] for rally in self.all_trajectories]
+        rows = self.store.rows()
+        export_csv(rows[np.isin(rows['rally_id'], rally_ids)], filepath)
         
         print(f"✓ 통합 CSV: {filepath}")
 
@@ -299,7 +515,8 @@ if __name__ == "__main__":
         print(f"✗ 영상을 찾을 수 없습니다: {video_path}")
     else:
         try:
-            tracker = InteractiveTracker(video_path)
+            # python test_interactive_tracking.py --resume → 마지막 체크포인트부터
+            tracker = InteractiveTracker(video_path, resume='--resume' in sys.argv)
             tracker.run()
         except Exception as e:
             print(f"✗ 에러: {e}")
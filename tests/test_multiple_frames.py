@@ -1,12 +1,18 @@
 import cv2
 import numpy as np
 import os
+import sys
+
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from seek_cache import SeekableCapture
 
 def extract_multiple_frames(video_path, num_frames=10):
     """
     영상에서 여러 프레임 추출해서 공 찾기
     """
-    cap = cv2.VideoCapture(video_path)
+    # ⭐ 키프레임 인덱스로 이동 (같은 GOP 안이면 다시 탐색하지 않고 앞으로 grab)
+    cap = SeekableCapture(video_path, cache_size=0)
     
     if not cap.isOpened():
         print("✗ 영상을 열 수 없습니다.")
@@ -74,6 +80,7 @@ def extract_multiple_frames(video_path, num_frames=10):
             
             print(f"Frame {i:02d} (#{frame_idx}): {best_count:5d} 노란색 픽셀 ({best_range_name})")
     
+    cap.print_stats()
     cap.release()
     print("=" * 50)
     print(f"✓ 완료! 이미지 저장 위치: {output_dir}")
@@ -1,12 +1,41 @@
 import cv2
-import csv
+import numpy as np
 import os
+import sys
 
-def rally_tracker_v2(video_path):
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from frame_reader import FrameReader
+from frame_ring import FrameRing
+from trajectory_store import TrajectoryStore
+from stage_timer import StageTimer
+from tracker_factory import SwitchingTracker
+from redetect import Redetector, update_with_recovery
+from rally_session import RallySession, session_path_for
+
+
+def trajectory_row(frame_number, success, bbox):
+    """궤적 1행 [frame, x, y, w, h, success]"""
+    if not success:
+        return [frame_number, -1, -1, -1, -1, 0]
+    x, y, w, h = [int(v) for v in bbox]
+    return [frame_number, x, y, w, h, 1]
+
+def rally_tracker_v2(video_path, profile=False, ring_budget_mb=256, window=True, backend='csrt',
+                     auto_switch=False, redetect=True):
     """
     개선된 랠리 추적 (반응성 향상)
+
+    Args:
+        profile: True면 단계별 시간 측정 + timeline.csv 저장
+        ring_budget_mb: 최근 프레임 링 버퍼 메모리 (일시정지 후 뒤로 보기용)
+        window: True면 CSRT에 마지막 bbox 주변 창만 넘김 (WindowedTracker), False면 전체 프레임
+        backend: 랠리 시작 추적기 ('csrt', 'kcf', 'mil', 'mosse', 'detector' - B 키로 변경)
+        auto_switch: True면 추적기가 재생 속도를 못 따라갈 때 더 빠른 추적기로 자동 전환
+                     (기본 꺼짐 - 전환하면 정확도가 떨어지므로 느려도 고른 추적기 유지)
+        redetect: True면 추적 실패 시 마지막 위치 주변에서 공 재검출 → 재초기화 (method 'redetect')
     """
-    cap = cv2.VideoCapture(video_path)
+    cap = FrameReader(video_path)  # ⭐ 디코딩은 백그라운드 스레드
     
     if not cap.isOpened():
         print("영상 열기 실패")
@@ -18,7 +47,9 @@ def rally_tracker_v2(video_path):
     print("조작:")
     print("  SPACE: 일시정지/재생")
     print("  R: 랠리 추적 시작 (일시정지 시)")
+    print("  ←/→ (또는 ,/.): 1프레임 뒤로/앞으로 (일시정지 시, 디코딩 없음)")
     print("  S: 현재 랠리 저장")
+    print("  B: 다음 랠리 추적기 바꾸기")
     print("  Q 또는 ESC: 종료")
     print("=" * 50)
     
@@ -30,43 +61,75 @@ def rally_tracker_v2(video_path):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
+    # ⭐ 랠리별 CSV 대신 컬럼 저장소 1개 (rally_id로 구분)
+    store = TrajectoryStore(os.path.join(output_dir, 'trajectories.npz'))
+    # ⭐ ROI 선택 기록 (src/rally_session.py로 GUI 없이 다시 추적)
+    session = RallySession(session_path_for(store.path), video_path)
+    
     rally_count = 0
     paused = False
     tracking = False
     tracker = None
     trajectory = []
+    methods = []  # 행별 추적기 이름 (자동 전환 기록)
+    
+    # ⭐ 랠리마다 init()으로 재사용 (예산 = 프레임 간격의 절반, 나머지는 디코딩/그리기)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    selector = SwitchingTracker(preferred=backend, auto=auto_switch, budget_ms=500 / fps,
+                                window=window)
+    # ⭐ 놓치면 주변 창 재검출 (수동 ROI 선택 대신)
+    redetector = Redetector() if redetect else None
     window_name = 'Rally Tracker - Press Q to Quit'
+    timer = StageTimer(enabled=profile)
+    
+    # ⭐ 최근 프레임 링 버퍼 (미리 할당) + 화면용 버퍼
+    frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                   int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    ring = FrameRing(frame_shape, budget_mb=ring_budget_mb)
+    display = np.empty(frame_shape, dtype=np.uint8)
+    view_index = -1  # 일시정지 중 보고 있는 프레임 번호
+    print(f"링 버퍼: 최근 {ring.capacity} 프레임 ({ring.nbytes / 1024 / 1024:.0f} MB)")
     
     # 창 생성
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     
     while True:
         if not paused:
+            timer.next_frame(int(cap.get(cv2.CAP_PROP_POS_FRAMES)))
             ret, frame = cap.read()
+            timer.lap('decode')
             if not ret:
                 print("\n영상 끝")
                 break
             
             current_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
             
+            # 그리기 전에 원본 보관
+            ring.push(cap.frame_index, frame)
+            view_index = cap.frame_index
+            
             # 추적 중이면
             if tracking and tracker:
-                success, bbox = tracker.update(frame)
+                success, bbox, method = update_with_recovery(
+                    tracker, redetector, frame, ring.get(cap.frame_index - 1),
+                    ring.get(cap.frame_index - 2))
+                timer.lap('tracker')
+                trajectory.append(trajectory_row(current_frame, success, bbox))
+                methods.append(method)
                 
                 if success:
                     x, y, w, h = [int(v) for v in bbox]
-                    trajectory.append([current_frame, x, y, w, h, 1])
                     
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
                     cx, cy = x+w//2, y+h//2
                     cv2.circle(frame, (cx, cy), 3, (0, 0, 255), -1)
                     
                     # 상태
-                    status_text = f"Rally {rally_count}: Tracking"
+                    status_text = f"Rally {rally_count}: " + \
+                        ("Redetected" if method == 'redetect' else "Tracking")
                     cv2.putText(frame, status_text, (x, y-10),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                 else:
-                    trajectory.append([current_frame, -1, -1, -1, -1, 0])
                     cv2.putText(frame, f"Rally {rally_count}: Lost", (50, 120),
                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
             
@@ -81,7 +144,12 @@ def rally_tracker_v2(video_path):
                 cv2.putText(frame, f"Success: {rate:.1f}%", (10, 90),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         else:
-            # 일시정지
+            # 일시정지 (⭐ 링 버퍼에서 복사 - 디코더 안 건드림)
+            np.copyto(display, ring.get(view_index))
+            frame = display
+            behind = ring.latest - view_index
+            cv2.putText(frame, f"Frame: {view_index + 1}" + (f" (-{behind})" if behind else ""),
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
             cv2.putText(frame, "PAUSED", (50, 50),
                        cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 255), 3)
             cv2.putText(frame, "Press R to start tracking", 
@@ -89,10 +157,12 @@ def rally_tracker_v2(video_path):
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
         
         # 화면 표시
+        timer.lap('draw')
         cv2.imshow(window_name, frame)
         
         # ⭐ 키 입력 (더 짧은 대기)
         key = cv2.waitKey(1) & 0xFF
+        timer.lap('display')
         
         # ⭐ Q 또는 ESC로 종료
         if key == ord('q') or key == ord('Q') or key == 27:
@@ -100,11 +170,9 @@ def rally_tracker_v2(video_path):
             
             # 추적 중이면 저장
             if tracking and trajectory:
-                csv_path = os.path.join(output_dir, f'rally_{rally_count:02d}.csv')
-                with open(csv_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['frame', 'x', 'y', 'width', 'height', 'success'])
-                    writer.writerows(trajectory)
+                store.append_rally(rally_count, trajectory, method=methods)
+                store.flush()
+                session.end(rally_count, trajectory[-1][0] - 1)
                 print(f"✓ Rally {rally_count} 자동 저장: {len(trajectory)} 프레임")
             
             break
@@ -123,8 +191,8 @@ def rally_tracker_v2(video_path):
             # 랠리 추적 시작
             print("\n공 주변에 박스를 그리세요...")
             
-            # 현재 프레임 저장
-            saved_frame = frame.copy()
+            # 보고 있는 프레임 원본 (링 버퍼 뷰 - 복사 없음)
+            saved_frame = ring.get(view_index)
             
             # ⭐ 기존 창 잠시 숨기기
             cv2.destroyWindow(window_name)
@@ -140,36 +208,62 @@ def rally_tracker_v2(video_path):
             if bbox[2] > 0 and bbox[3] > 0:
                 # 이전 랠리 저장
                 if tracking and trajectory:
-                    csv_path = os.path.join(output_dir, f'rally_{rally_count:02d}.csv')
-                    with open(csv_path, 'w', newline='') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(['frame', 'x', 'y', 'width', 'height', 'success'])
-                        writer.writerows(trajectory)
+                    store.append_rally(rally_count, trajectory, method=methods)
+                    store.flush()
+                    session.end(rally_count, trajectory[-1][0] - 1)
                     print(f"✓ Rally {rally_count} 저장: {len(trajectory)} 프레임")
                 
                 # 새 추적 시작
                 rally_count += 1
-                tracker = cv2.TrackerCSRT.create()
+                tracker = selector
                 tracker.init(saved_frame, bbox)
+                session.start(rally_count, view_index, bbox, tracker.backend)
+                if redetector is not None:
+                    redetector.start(bbox)
                 tracking = True
                 trajectory = []
+                methods = []
                 paused = False
                 
-                print(f"✓ Rally {rally_count} 시작!")
+                # ⭐ 뒤로 돌려 고른 프레임이면 최신 프레임까지 링 버퍼로 따라잡기 (디코딩 없음)
+                for index in range(view_index + 1, ring.latest + 1):
+                    success, bbox, method = update_with_recovery(
+                        tracker, redetector, ring.get(index), ring.get(index - 1),
+                        ring.get(index - 2))
+                    trajectory.append(trajectory_row(index + 1, success, bbox))
+                    methods.append(method)
+                
+                print(f"✓ Rally {rally_count} 시작! ({tracker.backend}, Frame {view_index + 1}"
+                      f"{f', {len(trajectory)} 프레임 따라잡음' if trajectory else ''})")
             else:
                 print("✗ 취소됨")
         
+        elif paused and key in (81, ord(',')):
+            # 1프레임 뒤로 (링 버퍼 안에서만)
+            if view_index - 1 in ring:
+                view_index -= 1
+            else:
+                print("\n[링 버퍼 끝]")
+        
+        elif paused and key in (83, ord('.')):
+            # 1프레임 앞으로 (최신 프레임까지)
+            if view_index < ring.latest:
+                view_index += 1
+        
+        elif key == ord('b') or key == ord('B'):
+            # 다음 랠리 추적기 (지금 랠리는 그대로)
+            print(f"\n다음 랠리 추적기: {selector.cycle()}")
+        
         elif key == ord('s') or key == ord('S'):
             # 현재 랠리 저장
             if tracking and trajectory:
-                csv_path = os.path.join(output_dir, f'rally_{rally_count:02d}.csv')
-                with open(csv_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['frame', 'x', 'y', 'width', 'height', 'success'])
-                    writer.writerows(trajectory)
+                store.append_rally(rally_count, trajectory, method=methods)
+                store.flush()
+                session.end(rally_count, trajectory[-1][0] - 1)
                 print(f"\n✓ Rally {rally_count} 수동 저장: {len(trajectory)} 프레임")
                 tracking = False
                 trajectory = []
+                methods = []
             else:
                 print("\n저장할 랠리가 없습니다")
     
@@ -184,7 +278,16 @@ def rally_tracker_v2(video_path):
     # 최종 요약
     print("\n" + "=" * 50)
     print(f"총 {rally_count}개 랠리 추적 완료")
-    print(f"저장 위치: {output_dir}")
+    print(f"저장 위치: {store.path} ({len(store)} 행)")
+    print(f"세션: {session.path} (랠리 {len(session)}개 - python src/rally_session.py로 재추적)")
+    print("-" * 50)
+    cap.print_stats()
+    selector.print_stats()
+    if redetector is not None:
+        redetector.print_stats()
+    timer.print_stats()
+    if profile:
+        timer.dump_timeline(os.path.join(output_dir, 'timeline.csv'))
     print("=" * 50)
 
 if __name__ == "__main__":
@@ -1,5 +1,10 @@
 import cv2
 import os
+import sys
+
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from tracker_factory import create_tracker
 
 def simple_test():
     """간단한 테스트"""
@@ -31,7 +36,7 @@ def simple_test():
     print(f"선택 완료: {bbox}")
     
     # Tracker
-    tracker = cv2.TrackerCSRT.create()
+    tracker = create_tracker('csrt')
     tracker.init(frame, bbox)
     
     frame_count = 0
@@ -1,12 +1,18 @@
 import cv2
 import os
+import sys
 
-def test_manual_tracking(video_path, start_frame=500):
+# src/ 모듈 (공용 엔진)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from tracker_factory import create_tracker
+
+def test_manual_tracking(video_path, start_frame=500, backend='csrt'):
     """
     수동 초기화 + 자동 추적 테스트
     
     Args:
         start_frame: 시작 프레임 번호 (기본 500)
+        backend: 추적기 ('csrt', 'kcf', 'mil', 'mosse', 'detector')
     """
     cap = cv2.VideoCapture(video_path)
     
@@ -46,17 +52,8 @@ def test_manual_tracking(video_path, start_frame=500):
     x, y, w, h = [int(v) for v in bbox]
     print(f"✓ 선택 완료: 위치({x}, {y}), 크기({w}x{h})")
     
-    # ⭐ CSRT Tracker 생성 (버전 호환)
-    try:
-        # OpenCV 4.5.1 이상
-        tracker = cv2.TrackerCSRT.create()
-    except AttributeError:
-        try:
-            # OpenCV 3.x ~ 4.5.0
-            tracker = cv2.TrackerCSRT_create()
-        except AttributeError:
-            # Legacy
-            tracker = cv2.legacy.TrackerCSRT_create()
+    # ⭐ Tracker 생성 (버전 호환은 tracker_factory에서)
+    tracker = create_tracker(backend)
     
     # 초기화
     tracker.init(frame, bbox)